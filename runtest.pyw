@@ -1,7 +1,6 @@
 import sys
 import argparse
 sys.path.append('./src')
-from TestGUI import *
 from Exceptions import TestError
 
 
@@ -21,8 +20,41 @@ def main():
                             help='enable this if working on continues integration environment (default: off)')
         parser.add_argument('--ins', action="store_true",
                             help='enable this to record instrumented history file (default: off)')
+        parser.add_argument('--dry-run', action="store_true",
+                            help='validate the test workbook (or every test if no test name is given) without '
+                                 'connecting to the rig (default: off)')
+        parser.add_argument('--suite', type=str, nargs='+', metavar='TEST',
+                            help='run every test matching the names or glob patterns in one rig session and print an '
+                                 'aggregated summary')
+        parser.add_argument('--rigs', type=str, nargs='+', metavar='RIG',
+                            help='rig profiles (RIGS in ConnectionsConfig.xml) the suite is run on, in parallel when '
+                                 'there are several (default: the default rig)')
         args = parser.parse_args()
 
+        if args.dry_run:
+            # Imported lazily so that no rig interface is loaded for a dry run
+            from TestLinter import TestLinter
+            linter = TestLinter()
+            if args.test_name is not None:
+                errors = linter.lint(args.test_name)
+            else:
+                errors = linter.lint_all()
+            for error in errors:
+                print(error)
+            print(f'Dry run: {len(linter.linted_tests)} tests checked, {len(errors)} errors found.')
+            sys.exit(1 if len(errors) > 0 else 0)
+
+        if args.suite is not None:
+            from TestSuite import TestSuite
+            suite = TestSuite(args.suite, args.svn_download, args.svn_commit, host_env=args.host_env, ci=args.ci,
+                              instrumented=args.ins, rigs=args.rigs)
+            try:
+                sys.exit(0 if suite.run() else 1)
+            except TestError as error:
+                print(error.message)
+                sys.exit(1)
+
+        from TestClass import TestClass
         try:
             test = TestClass(args.test_name, args.svn_download, args.svn_commit, _executed=True, _host_env=args.host_env
                              , _ci=args.ci, _instrumented=args.ins)
@@ -31,7 +63,13 @@ def main():
             test.run_test()
         except TestError as error:
             print(error.message)
+
+        # The results are uploaded in the background
+        from ResultsPublisher import results_publisher
+        for error in results_publisher().drain():
+            print(error)
     else:
+        from TestGUI import run_with_gui
         run_with_gui()
 
 
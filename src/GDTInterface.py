@@ -1,16 +1,39 @@
 import sys
 import os
+import time
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor, Future
 import clr
 from clr import System
 
 from Utilities import Utilities
+from GDTTypeRegistry import GDTTypeRegistry
 from Exceptions import ParameterError, GDTConnectionError
 from enum import Enum
 
-clr.AddReference(Utilities.get_gdt_interface_lib_path())
+# The GDT library and its native dependencies are loaded from the library directory through the DLL search path, set
+# once with absolute paths. The working directory is process wide and is never changed for a GDT call.
+gdt_interface_lib_dir = os.path.abspath(Utilities.get_gdt_interface_lib_dir())
+gdt_configuration_file = os.path.abspath(Utilities.get_configuration_file())
+os.environ['PATH'] = f'{gdt_interface_lib_dir}{os.pathsep}{os.environ.get("PATH", "")}'
+if hasattr(os, 'add_dll_directory'):
+    os.add_dll_directory(gdt_interface_lib_dir)
+
+clr.AddReference(os.path.abspath(Utilities.get_gdt_interface_lib_path()))
 from GdtInterface import GdtClient
 
 
+def gdt_worker_call(method):
+    """Runs the GDTInterface method on the GDT worker thread of its connection and waits for its result"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.is_worker_thread():
+            return method(self, *args, **kwargs)
+        return self._worker.submit(method, self, *args, **kwargs).result()
+    return wrapper
+
+
 class GDTInterface:
     class GDTInterfaceDataType(Enum):
         FLAG = 0
@@ -21,49 +44,99 @@ class GDTInterface:
     def __init__(self, connection: str):
         self.connection = connection
         self.is_connected = False
+        self.type_registry = GDTTypeRegistry.for_project(Utilities.get_gdt_project_file(connection))
+        # Last snapshot of every struct read: {struct_name: (read time, struct)}
+        self._struct_snapshots = dict()
+        # Every GdtClient call of the connection runs on this single thread, callers may overlap with it through submit
+        # (the worker must not hold a reference to self, else the interface is never deleted nor disconnected)
+        self._worker_thread_ids = list()
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'GDT_{connection}',
+                                          initializer=GDTInterface._register_worker_thread,
+                                          initargs=(self._worker_thread_ids,))
         try:
-            self.gdt_client = GdtClient(Utilities.get_configuration_file(), self.connection)
+            self.gdt_client = self._worker.submit(GdtClient, gdt_configuration_file, self.connection).result()
         except:
+            self._worker.shutdown(wait=False)
             raise ParameterError('configuration_file or connection', f'Either the configuration file path ({Utilities.get_configuration_file()}) or the required connection ({self.connection}) is not valid.')
 
+    @staticmethod
+    def _register_worker_thread(worker_thread_ids: list):
+        worker_thread_ids.append(threading.get_ident())
+
+    def is_worker_thread(self) -> bool:
+        return threading.get_ident() in self._worker_thread_ids
+
+    def submit(self, function, *args, **kwargs) -> Future:
+        """
+        Queues function (usually a method of this interface, e.g. write_many) on the GDT worker thread
+        :return: Future of its result, exceptions are raised by Future.result()
+        """
+        if self.is_worker_thread():
+            future = Future()
+            try:
+                future.set_result(function(*args, **kwargs))
+            except Exception as error:
+                future.set_exception(error)
+            return future
+        return self._worker.submit(function, *args, **kwargs)
+
+    @gdt_worker_call
     def connect(self):
-        current_path = os.getcwd()
         try:
-            os.chdir(Utilities.get_gdt_interface_lib_dir())
             self.is_connected = self.gdt_client.Connect(True, 10)
         except:
             raise GDTConnectionError('Connection failed. Please check the configuration file and ensure that the application is running on target.')
-        finally:
-            os.chdir(current_path)
 
     def __del__(self):
-        current_path = os.getcwd()
         try:
-            if self.is_connected is True:
-                os.chdir(Utilities.get_gdt_interface_lib_dir())
-                self.gdt_client.Disconnet()
-                self.is_connected = False
-            else:
-                raise GDTConnectionError('GDT Interface is not connected yet.')
+            self.disconnect()
         except:
             pass
         finally:
-            os.chdir(current_path)
+            if hasattr(self, '_worker'):
+                self._worker.shutdown(wait=False)
 
+    @gdt_worker_call
     def disconnect(self):
-        current_path = os.getcwd()
         try:
             if self.is_connected is True:
-                os.chdir(Utilities.get_gdt_interface_lib_dir())
                 self.gdt_client.Disconnet()
                 self.is_connected = False
             else:
                 raise GDTConnectionError('GDT Interface is not connected yet.')
         except:
             pass
-        finally:
-            os.chdir(current_path)
 
+    @gdt_worker_call
+    def probe_data_item(self, data_item_name: str, operation, is_success):
+        """
+        Runs operation(data_item_type) with the registered buffer type of the data item. Every other type is only
+        probed when the data item is not registered yet (or the registered type failed), and the first type for which
+        is_success(result) holds is registered.
+        :return: The last type that did not raise and its result, (None, None) if every type raised
+        """
+        last_type, last_result = None, None
+        registered_type = self.type_registry.get(data_item_name)
+        data_item_types = list(GDTInterface.GDTInterfaceDataType)
+        if registered_type in GDTInterface.GDTInterfaceDataType.__members__:
+            registered_type = GDTInterface.GDTInterfaceDataType[registered_type]
+            data_item_types.remove(registered_type)
+            data_item_types.insert(0, registered_type)
+
+        for data_item_type in data_item_types:
+            try:
+                result = operation(data_item_type)
+            except:
+                continue
+
+            last_type, last_result = data_item_type, result
+            if is_success(result):
+                self.type_registry.set(data_item_name, data_item_type.name)
+                break
+
+        return last_type, last_result
+
+    @gdt_worker_call
     def write_data_item(self, data_item_type: GDTInterfaceDataType, data_item_name: str, value, validity, override) -> bool:
         if self.is_connected is True:
             # Necessary for CLR function parameters compatibility.
@@ -82,6 +155,7 @@ class GDTInterface:
         else:
             raise GDTConnectionError('GDT Interface is not connected yet.')
 
+    @gdt_worker_call
     def inject_data_item(self, data_item_type: GDTInterfaceDataType, data_item_name: str, value) -> bool:
         if self.is_connected is True:
             try:
@@ -96,6 +170,7 @@ class GDTInterface:
         else:
             raise GDTConnectionError('GDT Interface is not connected yet.')
 
+    @gdt_worker_call
     def inject_data_item_validity(self, data_item_type: GDTInterfaceDataType, data_item_name: str, validity: bool) -> bool:
         if self.is_connected is True:
             try:
@@ -110,6 +185,7 @@ class GDTInterface:
         else:
             raise GDTConnectionError('GDT Interface is not connected yet.')
 
+    @gdt_worker_call
     def inject_data_item_override(self, data_item_type: GDTInterfaceDataType, data_item_name: str, override: bool) -> bool:
         if self.is_connected is True:
             try:
@@ -124,6 +200,42 @@ class GDTInterface:
         else:
             raise GDTConnectionError('GDT Interface is not connected yet.')
 
+    @gdt_worker_call
+    def write_many(self, writes: list) -> list:
+        """
+        Injects several data items in one call, each with its registered buffer type
+        :param writes: [(method, data_item_name, value)] with method 'value', 'validity' or 'override'
+        :return: [(data_item_type, is_injected)]
+        """
+        if self.is_connected is False:
+            raise GDTConnectionError('GDT Interface is not connected yet.')
+
+        writers = {
+            "value": self.inject_data_item,
+            "validity": self.inject_data_item_validity,
+            "override": self.inject_data_item_override
+        }
+        return [self.probe_data_item(data_item_name,
+                                     lambda data_item_type: writers[method](data_item_type, data_item_name, value),
+                                     lambda is_injected: is_injected)
+                for method, data_item_name, value in writes]
+
+    @gdt_worker_call
+    def read_many(self, reads: list) -> list:
+        """
+        Reads several data items in one call, each with its registered buffer type
+        :param reads: [(data_item_name, field)] with field 'value', 'validity' or 'override'
+        :return: [(data_item_type, field value)], (None, None) for data items that could not be read
+        """
+        if self.is_connected is False:
+            raise GDTConnectionError('GDT Interface is not connected yet.')
+
+        return [self.probe_data_item(data_item_name,
+                                     lambda data_item_type: self.read_data_item(data_item_type, data_item_name)[field],
+                                     lambda value: value is not None)
+                for data_item_name, field in reads]
+
+    @gdt_worker_call
     def read_data_item(self, data_item_type: GDTInterfaceDataType, data_item_name: str):
         if self.is_connected is True:
             try:
@@ -145,51 +257,76 @@ class GDTInterface:
         else:
             raise GDTConnectionError('GDT Interface is not connected yet.')
 
+    @gdt_worker_call
     def inject_struct(self, struct_name: str, struct_field: str, value) -> bool:
-        current_path = os.getcwd()
         if self.is_connected is True:
             try:
-                os.chdir(Utilities.get_gdt_interface_lib_dir())
+                self._struct_snapshots.pop(struct_name, None)
                 is_injected = self.gdt_client.WriteStructField(struct_name, struct_field, value)
                 return is_injected
             except:
                 raise ParameterError('struct_name, struct_field or value', f'Either the struct name ({struct_name}), the struct field ({struct_field}) or the value ({value}) is not valid.')
-            finally:
-                os.chdir(current_path)
         else:
             raise GDTConnectionError('GDT Interface is not connected yet.')
 
-    def read_struct(self, struct_name: str, struct_field: str):
-        current_path = os.getcwd()
+    @gdt_worker_call
+    def write_struct_fields(self, struct_name: str, fields: list) -> bool:
+        """
+        Injects several fields of a struct in one call
+        :param fields: [(struct_field, value)]
+        """
         if self.is_connected is True:
             try:
-                os.chdir(Utilities.get_gdt_interface_lib_dir())
-                struct = self.gdt_client.ReadStruct(struct_name, None, 50)
-                if struct is None:
-                    raise StopIteration
-
-                field_value = struct.TryGetValue(struct_field, None)
-                if field_value[0] is False:
-                    raise StopIteration
+                self._struct_snapshots.pop(struct_name, None)
+                is_injected = True
+                for struct_field, value in fields:
+                    is_injected = self.gdt_client.WriteStructField(struct_name, struct_field, value) and is_injected
+                return is_injected
+            except:
+                raise ParameterError('struct_name, struct_field or value', f'Either the struct name ({struct_name}) or one of the fields ({fields}) is not valid.')
+        else:
+            raise GDTConnectionError('GDT Interface is not connected yet.')
 
-                return field_value[1].Value
+    def read_struct(self, struct_name: str, struct_field: str):
+        return self.read_struct_fields(struct_name, [struct_field])[struct_field]
+
+    @gdt_worker_call
+    def read_struct_fields(self, struct_name: str, struct_fields: list, max_age=0.0) -> dict:
+        """
+        Reads several fields from a single snapshot of the struct
+        :param max_age: Seconds a previous snapshot of the struct may be reused (default: always read it again)
+        :return: {struct_field: value}
+        """
+        if self.is_connected is True:
+            try:
+                snapshot = self._struct_snapshots.get(struct_name)
+                if snapshot is not None and time.monotonic() - snapshot[0] <= max_age:
+                    struct = snapshot[1]
+                else:
+                    struct = self.gdt_client.ReadStruct(struct_name, None, 50)
+                    if struct is None:
+                        raise StopIteration
+                    self._struct_snapshots[struct_name] = time.monotonic(), struct
+
+                fields = dict()
+                for struct_field in struct_fields:
+                    field_value = struct.TryGetValue(struct_field, None)
+                    if field_value[0] is False:
+                        raise StopIteration
+                    fields[struct_field] = field_value[1].Value
+                return fields
             except:
-                raise ParameterError('struct_name or struct_field', f'Either the struct name ({struct_name}) or the struct field ({struct_field}) is not valid.')
-            finally:
-                os.chdir(current_path)
+                raise ParameterError('struct_name or struct_field', f'Either the struct name ({struct_name}) or the struct fields ({", ".join(struct_fields)}) are not valid.')
         else:
             raise GDTConnectionError('GDT Interface is not connected yet.')
 
+    @gdt_worker_call
     def read_buffer(self, buffer_name: str, buffer_field: str, element_field: str):
-        current_path = os.getcwd()
         if self.is_connected is True:
             try:
-                os.chdir(Utilities.get_gdt_interface_lib_dir())
                 return self.gdt_client.ReadBufferElement(buffer_name, buffer_field, element_field, None, True, 50)
             except System.Collections.Generic.KeyNotFoundException:
                 raise ParameterError('buffer_name or buffer_field', f'Either the buffer name ({buffer_name}) or the buffer field ({buffer_field}) is not valid.')
-            finally:
-                os.chdir(current_path)
         else:
             raise GDTConnectionError('GDT Interface is not connected yet.')
 
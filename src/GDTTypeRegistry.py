@@ -0,0 +1,70 @@
+import os
+import json
+import tempfile
+import threading
+
+from Utilities import Utilities
+
+
+class GDTTypeRegistry:
+    """Buffer type (FLAG, STRING, NUMBER or DOUBLE) of every data item already resolved on a GDT project. Persisted as
+    JSON per project, so that data items are probed only the first time they are ever used."""
+    _registries = dict()
+    _registries_lock = threading.Lock()
+
+    def __init__(self, registry_file: str):
+        self.registry_file = registry_file
+        self._types = dict()
+        self._lock = threading.Lock()
+        try:
+            with open(self.registry_file, 'r') as f:
+                self._types = json.load(f)
+        except (OSError, ValueError):
+            # Missing or unreadable registry: data items are probed again
+            self._types = dict()
+
+    @staticmethod
+    def for_project(gdt_project_file: str):
+        """:return: The registry shared by every connection of the GDT project (e.g. PHX.gdt)"""
+        project_name = os.path.splitext(os.path.basename(gdt_project_file))[0]
+        registry_file = os.path.abspath(f'{Utilities.get_gdt_type_registry_folder()}/{project_name}.json')
+        with GDTTypeRegistry._registries_lock:
+            if registry_file not in GDTTypeRegistry._registries:
+                GDTTypeRegistry._registries[registry_file] = GDTTypeRegistry(registry_file)
+            return GDTTypeRegistry._registries[registry_file]
+
+    def get(self, data_item_name: str):
+        """:return: Name of the registered buffer type, None if the data item was never resolved"""
+        with self._lock:
+            return self._types.get(data_item_name)
+
+    def set(self, data_item_name: str, type_name: str):
+        with self._lock:
+            if self._types.get(data_item_name) == type_name:
+                return
+            self._types[data_item_name] = type_name
+            self._save()
+
+    def _save(self):
+        temp_file = None
+        try:
+            registry_folder = os.path.dirname(self.registry_file)
+            os.makedirs(registry_folder, exist_ok=True)
+            # The rig processes of a suite share the registry file, keep the types they registered meanwhile
+            try:
+                with open(self.registry_file, 'r') as f:
+                    self._types = {**json.load(f), **self._types}
+            except (OSError, ValueError):
+                pass
+
+            # Written to a temporary file of this process next to the registry and swapped, so a crash or another
+            # process saving at the same time never leaves a truncated file
+            file_descriptor, temp_file = tempfile.mkstemp(suffix='.tmp', prefix=os.path.basename(self.registry_file),
+                                                          dir=registry_folder)
+            with os.fdopen(file_descriptor, 'w') as f:
+                json.dump(self._types, f, indent=1, sort_keys=True)
+            os.replace(temp_file, self.registry_file)
+        except OSError:
+            # The registry only saves probing, the test goes on without it
+            if temp_file is not None and os.path.exists(temp_file):
+                os.remove(temp_file)
@@ -1,9 +1,63 @@
 import os
+import threading
+from collections import OrderedDict
 import cv2 as cv
 import numpy as np
 from Exceptions import ImageComparatorError
 from PKLGenerator import PKLGenerator
 
+transparent_color = (0, 0, 255)
+golden_image_cache_max_bytes = 256 * 1024 * 1024
+
+
+class GoldenTemplate:
+    def __init__(self, image, mask, rp_offset):
+        self.image = image
+        self.mask = mask
+        self.rp_offset = rp_offset
+        self.nbytes = image.nbytes + mask.nbytes
+
+
+class GoldenImageCache:
+    """Process-wide LRU cache of decoded golden templates (BGR image, mask and RP offset), keyed by path and
+    modification time and bounded by the total size of the cached arrays."""
+
+    def __init__(self, max_bytes=golden_image_cache_max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str, loader) -> GoldenTemplate:
+        key = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        template = loader(path)
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1].nbytes
+            self._entries[key] = (mtime, template)
+            self._bytes += template.nbytes
+            # Evict least recently used templates, but always keep the one just loaded
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._bytes -= self._entries.popitem(last=False)[1][1].nbytes
+
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+golden_image_cache = GoldenImageCache()
+
 
 class ImageComparator:
     def __init__(self, reference_image_path: str, golden_image_path: str, output_result_image_path: str, is_absence_match: bool, log_callback=None, threshold=0.98):
@@ -27,7 +81,8 @@ class ImageComparator:
         self._threshold = threshold
         self._threshold_epsilon = 1e-5
 
-        self._transparent_color = (0, 0, 255)
+        self._transparent_color = transparent_color
+        self._golden_template = None
 
         golden_image_name, golden_image_ext = os.path.splitext(self._golden_image_path)
         if golden_image_ext == '.pkl':
@@ -69,7 +124,7 @@ class ImageComparator:
         golden_image = self._open_golden_image_file()
         result_image = reference_image.copy()
 
-        is_match, max_loc = self._compare_images(reference_image_cropped, golden_image)
+        is_match, max_loc = self._compare_images(reference_image_cropped, golden_image, self._golden_template.mask)
         if not self._is_numpy_img:
             self._draw_rectangles(result_image, golden_image, is_match, max_loc, reference_top_left, reference_bottom_right)
         return is_match
@@ -89,10 +144,11 @@ class ImageComparator:
         golden_image_bottom_right = (golden_image_bottom_right[0] + tolerance, golden_image_bottom_right[1] + tolerance)
         self._check_crop_bounds(golden_image, self._golden_image_path, golden_image_top_left, golden_image_bottom_right)
         golden_image_cropped = golden_image[golden_image_top_left[1]:golden_image_bottom_right[1], golden_image_top_left[0]:golden_image_bottom_right[0]].copy()
+        golden_mask_cropped = self._golden_template.mask[golden_image_top_left[1]:golden_image_bottom_right[1], golden_image_top_left[0]:golden_image_bottom_right[0]].copy()
 
         result_image = reference_image.copy()
 
-        is_match, max_loc = self._compare_images(reference_image_cropped, golden_image_cropped)
+        is_match, max_loc = self._compare_images(reference_image_cropped, golden_image_cropped, golden_mask_cropped)
         self._draw_rectangles(result_image, golden_image_cropped, is_match, max_loc, reference_top_left, reference_bottom_right)
 
         self._log_callback(f'\t\t\tSearch box top left: X = {reference_top_left[0]} px; Y = {reference_top_left[1]} px.')
@@ -164,12 +220,11 @@ class ImageComparator:
         is_match = self.compare_pattern(top_left, bottom_right, tolerance)
         return is_match
 
-    def _compare_images(self, reference_image, golden_image):
+    def _compare_images(self, reference_image, golden_image, mask=None):
         self._check_golden_image_fits(reference_image, golden_image)
 
-        mask = cv.inRange(golden_image, self._transparent_color, self._transparent_color)
-        mask = cv.bitwise_not(mask)
-        mask = cv.cvtColor(mask, cv.COLOR_GRAY2BGR)
+        if mask is None:
+            mask = ImageComparator._get_mask(golden_image)
 
         # Apply template Matching.
         res = cv.matchTemplate(reference_image, golden_image, cv.TM_CCORR_NORMED, mask=mask)
@@ -245,25 +300,43 @@ class ImageComparator:
                 f'Invalid golden image size {self._golden_image_path}: golden image height ({str(golden_w)}) is greater than reference image height ({str(reference_w)}).')
 
     def _open_golden_image_file(self):
+        # Templates are decoded once per process and shared through the golden image cache
+        if self._golden_template is None:
+            self._golden_template = golden_image_cache.get(self._golden_image_path, self._load_golden_template)
+
+        if self._golden_template.rp_offset is not None:
+            self.RP_Offset = self._golden_template.rp_offset
+
+        return self._golden_template.image
+
+    def _load_golden_template(self, golden_image_path):
+        rp_offset = None
         if self._is_pkl is True:
-            img_result, dic_pattern = PKLGenerator.pkl_to_image(self._golden_image_path)
-            self.RP_Offset = dic_pattern['RP_Offset']
+            # Reads both the compact and the legacy pattern format; copy out of the memory map so the file is released
+            rgba, mask, dic_pattern = PKLGenerator.load_pattern(golden_image_path)
+            rp_offset = dic_pattern['RP_Offset']
 
-            open_cv_img = np.array(img_result)
+            open_cv_img = np.array(rgba)
 
             try:
                 r_channel, g_channel, b_channel, a_channel = cv.split(open_cv_img)
 
             except:
-                raise ImageComparatorError(f'Image in .pkl file does not have 4 channels: {self._golden_image_path}')
+                raise ImageComparatorError(f'Image in .pkl file does not have 4 channels: {golden_image_path}')
 
             a_channel = cv.bitwise_not(a_channel)
             open_cv_img = cv.merge((b_channel, g_channel, a_channel))
 
-            return open_cv_img
-
         else:
-            return self._open_image_file(self._golden_image_path)
+            open_cv_img = self._open_image_file(golden_image_path)
+
+        return GoldenTemplate(open_cv_img, ImageComparator._get_mask(open_cv_img), rp_offset)
+
+    @staticmethod
+    def _get_mask(golden_image):
+        mask = cv.inRange(golden_image, transparent_color, transparent_color)
+        mask = cv.bitwise_not(mask)
+        return cv.cvtColor(mask, cv.COLOR_GRAY2BGR)
 
     def _open_image_file(self, image_path):
         image = cv.imread(image_path)
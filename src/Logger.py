@@ -32,7 +32,6 @@ class Logger:
         print(f'[{self.log_name}] {message}')
 
     def __del__(self):
-        handlers = self.logger.handlers
-        for handler in handlers:
-            handler.close()
-            self.logger.removeHandler(handler)
+        # Only this logger's handler, a called test logs through the same logger name as its caller
+        self.handler.close()
+        self.logger.removeHandler(self.handler)
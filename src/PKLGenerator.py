@@ -1,36 +1,130 @@
 import os
 import sys
+import json
+import struct
 import colorsys
 import pickle
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image
 from Exceptions import ImageComparatorError
 
+# Compact golden pattern layout: magic, version and header length, a JSON header (Box, Size, RP_Offset), then the raw
+# RGBA array and the pattern mask (one byte per pixel) of the cropped pattern. The files keep the .pkl extension used
+# by the tests and the GUI; legacy pickled patterns are recognised by the missing magic.
+pattern_magic = b'GPAT'
+pattern_version = 1
+pattern_header_format = '<BI'
+
 
 class PKLGenerator:
     @staticmethod
     def pkl_to_image(pkl_file):
+        rgba, mask, dic_pattern = PKLGenerator.load_pattern(pkl_file)
+        # Copy, so the image does not keep the file mapped
+        return Image.fromarray(np.array(rgba), 'RGBA'), dic_pattern
+
+    @staticmethod
+    def load_pattern(pkl_file, mmap=True):
+        """
+        :param pkl_file: Golden pattern file (compact or legacy pickle format)
+        :param mmap: memory-map the arrays of a compact pattern instead of reading them (default: on)
+        :return: RGBA array, pattern mask and pattern dictionary (Box, Size, RP_Offset)
+        """
         try:
             with open(pkl_file, 'rb') as f:
-                dic_pattern = pickle.load(f)
+                if f.read(len(pattern_magic)) != pattern_magic:
+                    f.seek(0)
+                    dic_pattern = pickle.load(f)
+                    rgba, mask = PKLGenerator.draw_array(dic_pattern)
+                    return rgba, mask, dic_pattern
+
+                version, header_length = struct.unpack(pattern_header_format,
+                                                       f.read(struct.calcsize(pattern_header_format)))
+                if version != pattern_version:
+                    raise ImageComparatorError(f'Unsupported golden pattern version {version}: {pkl_file}')
+
+                header = json.loads(f.read(header_length).decode('utf-8'))
+                dic_pattern = {
+                    'Box': tuple(header['Box']),
+                    'Size': tuple(header['Size']),
+                    'RP_Offset': tuple(header['RP_Offset'])
+                }
+                width, height = dic_pattern['Size']
+                offset = f.tell()
+
+                if mmap:
+                    rgba = np.memmap(pkl_file, dtype=np.uint8, mode='r', offset=offset, shape=(height, width, 4))
+                    mask = np.memmap(pkl_file, dtype=np.uint8, mode='r', offset=offset + rgba.size,
+                                     shape=(height, width))
+                else:
+                    rgba = np.frombuffer(f.read(height * width * 4), dtype=np.uint8).reshape((height, width, 4))
+                    mask = np.frombuffer(f.read(height * width), dtype=np.uint8).reshape((height, width))
+
+        except (EOFError, KeyError, ValueError, struct.error, pickle.UnpicklingError):
+            raise ImageComparatorError(f'Invalid .pkl file: {pkl_file}')
 
-            img_result = PKLGenerator.draw_image(dic_pattern)
+        return rgba, mask.view(np.bool_), dic_pattern
 
-        except EOFError:
-            raise ImageComparatorError(f'Invalid .pkl file: {pkl_file}')
+    @staticmethod
+    def save_pattern(pkl_file, rgba, mask, dic_pattern):
+        header = json.dumps({
+            'Box': list(dic_pattern['Box']),
+            'Size': list(dic_pattern['Size']),
+            'RP_Offset': list(dic_pattern['RP_Offset'])
+        }).encode('utf-8')
+
+        # Write next to the target and swap, so readers never see a partially written pattern
+        temp_file = f'{pkl_file}.tmp'
+        with open(temp_file, 'wb') as f:
+            f.write(pattern_magic)
+            f.write(struct.pack(pattern_header_format, pattern_version, len(header)))
+            f.write(header)
+            f.write(np.ascontiguousarray(rgba, dtype=np.uint8).tobytes())
+            f.write(np.ascontiguousarray(mask, dtype=np.uint8).tobytes())
+        os.replace(temp_file, pkl_file)
 
-        return img_result, dic_pattern
+    @staticmethod
+    def is_compact_pattern(pkl_file) -> bool:
+        with open(pkl_file, 'rb') as f:
+            return f.read(len(pattern_magic)) == pattern_magic
 
     @staticmethod
-    def draw_image(dic_pattern):
-        img_result = Image.new(size=dic_pattern['Size'], mode='RGBA')
-        draw = ImageDraw.Draw(img_result)
-        for pixel in dic_pattern['Data']:
-            int_x = pixel['X']
-            int_y = pixel['Y']
-            tpl_rgba = pixel['RGBA']
+    def convert_folder(folder) -> int:
+        """
+        Converts every legacy pickled pattern under folder (e.g. the Tests folder or a GoldenImage folder) in place
+        :param folder: Folder to search recursively
+        :return: Number of converted files
+        """
+        converted = 0
+        for root, dirs, files in os.walk(folder):
+            for file in files:
+                pkl_file = os.path.join(root, file)
+                if file.lower().endswith('.pkl') and not PKLGenerator.is_compact_pattern(pkl_file):
+                    rgba, mask, dic_pattern = PKLGenerator.load_pattern(pkl_file)
+                    PKLGenerator.save_pattern(pkl_file, rgba, mask, dic_pattern)
+                    print(f"Converted: {pkl_file}")
+                    converted += 1
+        return converted
+
+    @staticmethod
+    def draw_array(dic_pattern):
+        width, height = dic_pattern['Size']
+        data = dic_pattern['Data']
+
+        xs = np.fromiter((pixel['X'] for pixel in data), dtype=np.intp, count=len(data))
+        ys = np.fromiter((pixel['Y'] for pixel in data), dtype=np.intp, count=len(data))
+        rgba = np.array([pixel['RGBA'] for pixel in data], dtype=np.uint8).reshape(-1, 4)
 
-            draw.point((int_x, int_y), tpl_rgba)
-        return img_result
+        # Unset pixels stay transparent black, as with Image.new(mode='RGBA')
+        arr_image = np.zeros((height, width, 4), dtype=np.uint8)
+        arr_image[ys, xs] = rgba
+        mask = np.zeros((height, width), dtype=np.bool_)
+        mask[ys, xs] = True
+        return arr_image, mask
+
+    @staticmethod
+    def draw_image(dic_pattern):
+        return Image.fromarray(PKLGenerator.draw_array(dic_pattern)[0], 'RGBA')
 
     @staticmethod
     def generate(png_file, r, g, b, a, rp_x, rp_y, pkl_file, show=True):
@@ -47,15 +141,14 @@ class PKLGenerator:
         :return: PKL File
         """
         rgba_image = Image.open(png_file)
-        dic_pattern = PKLGenerator.get_pattern(rgba_image.convert('RGBA'), (r, g, b, a), (rp_x, rp_y))
+        rgba, mask, dic_pattern = PKLGenerator.get_pattern_array(rgba_image.convert('RGBA'), (r, g, b, a), (rp_x, rp_y))
 
         # Save pkl
-        with open(pkl_file, 'wb') as f:
-            pickle.dump(dic_pattern, f, pickle.HIGHEST_PROTOCOL)
+        PKLGenerator.save_pattern(pkl_file, rgba, mask, dic_pattern)
 
         # Draw image and show if asked to
         if show:
-            PKLGenerator.draw_image(dic_pattern).show()
+            Image.fromarray(rgba, 'RGBA').show()
 
     @staticmethod
     def show(pkl_file):
@@ -79,61 +172,76 @@ class PKLGenerator:
 
     @staticmethod
     def get_pattern(imgRGBAImage, tplTransRGBA, tplRP=()):
+        """Legacy pattern dictionary, with one 'Data' entry per non transparent pixel"""
+        arr_image = np.asarray(imgRGBAImage)
+        ys, xs, dicTransparentImage = PKLGenerator._find_pattern(arr_image, tplTransRGBA, tplRP)
+        startX, startY = dicTransparentImage['Box'][0:2]
+
+        arr_pixels = arr_image[ys, xs]
+        lst_rgba = arr_pixels.tolist()
+        lst_hls = PKLGenerator.rgb_to_hls_array(arr_pixels).tolist()
 
-        dicTransparentImage = {}
-        lstMaskArry = []
-        dicPixData = {}
-        intXstart = 0
-        intYstart = 0
+        # Crop Pattern to match BOX (Set Pattern 0,0 to BOX upper left)
+        # Every pixel gets its own tuples, as pickle output depends on object identity
+        lstMaskArry = [{'X': x, 'Y': y, 'RGBA': tuple(rgba), 'HLS': tuple(hls)}
+                       for x, y, rgba, hls in zip((xs - startX).tolist(), (ys - startY).tolist(), lst_rgba, lst_hls)]
+
+        return {
+            'Data': lstMaskArry,
+            'Box': dicTransparentImage['Box'],
+            'Size': dicTransparentImage['Size'],
+            'RP_Offset': dicTransparentImage['RP_Offset']
+        }
+
+    @staticmethod
+    def get_pattern_array(imgRGBAImage, tplTransRGBA, tplRP=()):
+        """
+        :return: RGBA array and mask of the pattern cropped to its box, and the pattern dictionary (Box, Size, RP_Offset)
+        """
+        arr_image = np.asarray(imgRGBAImage)
+        ys, xs, dic_pattern = PKLGenerator._find_pattern(arr_image, tplTransRGBA, tplRP)
+        startX, startY, EndX, EndY = dic_pattern['Box']
+
+        mask = np.zeros(arr_image.shape[0:2], dtype=np.bool_)
+        mask[ys, xs] = True
+        mask = mask[startY:EndY + 1, startX:EndX + 1]
+
+        rgba = arr_image[startY:EndY + 1, startX:EndX + 1].copy()
+        rgba[~mask] = 0
+        return rgba, mask, dic_pattern
 
+    @staticmethod
+    def _find_pattern(arr_image, tplTransRGBA, tplRP):
         RPxOffset = None
         RPyOffset = None
 
-        pixdata = imgRGBAImage.load()
-        width, height = imgRGBAImage.size
-        for y in range(height):
-            for x in range(width):
-                # print(pixdata[x, y])
-                if pixdata[x, y] != tplTransRGBA:
-                    dicPixData['X'] = x
-                    dicPixData['Y'] = y
-                    dicPixData['RGBA'] = pixdata[x, y]
-                    dicPixData['HLS'] = PKLGenerator.GetPixelHSL(dicPixData['RGBA'])
-
-                    lstMaskArry.append(dicPixData)
-                    dicPixData = {}
-
-        startX = min(lstMaskArry, key=lambda x: x['X'])
-        startY = min(lstMaskArry, key=lambda x: x['Y'])
-        EndX = max(lstMaskArry, key=lambda x: x['X'])
-        EndY = max(lstMaskArry, key=lambda x: x['Y'])
-
-        if (tplRP != None):
-            print(tplRP)
-            RPxOffset = tplRP[0] - startX['X']
-            RPyOffset = tplRP[1] - startY['Y']
+        # Non transparent pixels, in the same row by row order as a per pixel scan
+        mask = np.any(arr_image != np.array(tplTransRGBA, dtype=arr_image.dtype), axis=2)
+        ys, xs = np.nonzero(mask)
+        if xs.size == 0:
+            raise ImageComparatorError('Image does not contain any non transparent pixel.')
 
-            print("RP Offset: " + str((RPxOffset, RPyOffset)))
-
-        tplObjectBox = (startX['X'], startY['Y'], EndX['X'], EndY['Y'])
-        tplObjectSize = ((EndX['X'] - startX['X']) + 1, (EndY['Y'] - startY['Y']) + 1)
+        startX = int(xs.min())
+        startY = int(ys.min())
+        EndX = int(xs.max())
+        EndY = int(ys.max())
 
-        dicTransparentImage['Data'] = lstMaskArry
-        dicTransparentImage['Box'] = tplObjectBox
-        dicTransparentImage['Size'] = tplObjectSize
-        dicTransparentImage['RP_Offset'] = (RPxOffset, RPyOffset)
+        if tplRP:
+            print(tplRP)
+            RPxOffset = tplRP[0] - startX
+            RPyOffset = tplRP[1] - startY
 
-        # Crop Pattern to match BOX (Set Pattern 0,0 to BOX upper left)
-        for pixel in dicTransparentImage['Data']:
-            pixel['X'] = pixel['X'] - dicTransparentImage['Box'][0]
-            pixel['Y'] = pixel['Y'] - dicTransparentImage['Box'][1]
+            print("RP Offset: " + str((RPxOffset, RPyOffset)))
 
-        print(dicTransparentImage['Size'])
+        dic_pattern = {
+            'Box': (startX, startY, EndX, EndY),
+            'Size': ((EndX - startX) + 1, (EndY - startY) + 1),
+            'RP_Offset': (RPxOffset, RPyOffset)
+        }
 
-        ##    for dicData in dicTransparentImage['Data']:
-        ##        print(str(dicData["HLS"]))
+        print(dic_pattern['Size'])
 
-        return dicTransparentImage
+        return ys, xs, dic_pattern
 
     @staticmethod
     def GetPixelHSL(tplRGBA):
@@ -147,12 +255,48 @@ class PKLGenerator:
 
         return (h * 240, l * 240, s * 240)
 
+    @staticmethod
+    def rgb_to_hls_array(arr_rgba):
+        """
+        GetPixelHSL over a whole array of pixels, following colorsys.rgb_to_hls step by step so every value is the
+        same float
+        :param arr_rgba: (N, 3) or (N, 4) array of 0..255 pixels
+        :return: (N, 3) float array of H, L, S scaled to 0..240
+        """
+        rgb = np.asarray(arr_rgba)[:, 0:3] / 255.
+        r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+
+        maxc = rgb.max(axis=1)
+        minc = rgb.min(axis=1)
+        sumc = maxc + minc
+        rangec = maxc - minc
+        l = sumc / 2.0
+        gray = minc == maxc
+
+        # Gray pixels divide by zero here, their H and S are set to 0 below like colorsys does
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = np.where(l <= 0.5, rangec / sumc, rangec / (2.0 - maxc - minc))
+            rc = (maxc - r) / rangec
+            gc = (maxc - g) / rangec
+            bc = (maxc - b) / rangec
+            h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+            h = np.mod(h / 6.0, 1.0)
+        h[gray] = 0.0
+        s[gray] = 0.0
+
+        return np.stack((h * 240, l * 240, s * 240), axis=1)
+
     @staticmethod
     def cmd_execute():
         lst_arguments = sys.argv
         script_name = lst_arguments[0]
         if len(lst_arguments) < 2:
             print(f"Usage: python {script_name} [filename.png]")
+        elif len(lst_arguments) == 3 and lst_arguments[1] == "--convert":
+            if os.path.isdir(lst_arguments[2]) is False:
+                return print("Could not find folder to convert.")
+            converted = PKLGenerator.convert_folder(lst_arguments[2])
+            print(f"Converted {converted} PKL files.")
         elif len(lst_arguments) == 2:
             PKLGenerator.show(lst_arguments[1])
         elif len(lst_arguments) == 9:
@@ -169,6 +313,7 @@ class PKLGenerator:
             PKLGenerator.generate(png_file, color_r, color_g, color_b, color_a, rp_x, rp_y, pkl_file)
         else:
             print(f"Usage: python {script_name} [filename.png] [R] [G] [B] [A] [RPx] [RPy] [filename.pkl]")
+            print(f"       python {script_name} --convert [folder]")
 
 
 if __name__ == "__main__":
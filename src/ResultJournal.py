@@ -0,0 +1,181 @@
+import os
+import re
+import sys
+import json
+import time
+from copy import copy
+import openpyxl
+
+from Utilities import Utilities
+
+journal_sync_interval = 1.0  # Seconds between two fsync of the journal
+
+
+class ResultJournal:
+    """Append-only journal of every result written to a test workbook, one JSON record per line. Results survive a
+    crash of the run, and the styled result workbook is materialised from the journal at the end of the run or on
+    demand for a partial run."""
+
+    def __init__(self, journal_file: str, excel_file: str):
+        self.journal_file = journal_file
+        self._journal = open(journal_file, 'w', encoding='utf-8')
+        self._last_sync = time.monotonic()
+        self.append("start", excel_file=os.path.abspath(excel_file))
+
+    def append(self, event: str, **record):
+        record["event"] = event
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        if time.monotonic() - self._last_sync >= journal_sync_interval:
+            os.fsync(self._journal.fileno())
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        if not self._journal.closed:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+
+    @staticmethod
+    def read(journal_file: str) -> list:
+        records = list()
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Last record cut by a crash
+                    break
+        return records
+
+    @staticmethod
+    def materialise(journal_file: str, result_file: str):
+        """Replays the journal on the test workbook and saves it as result_file"""
+        records = ResultJournal.read(journal_file)
+        if len(records) == 0 or records[0]["event"] != "start":
+            raise ValueError(f'{journal_file} is not a result journal.')
+
+        wb = openpyxl.load_workbook(records[0]["excel_file"], data_only=True)
+        # A test called several times is read once
+        source_wbs = dict()
+        for record in records[1:]:
+            event = record["event"]
+            if event == "create_sheet":
+                if record["sheet"] not in wb.sheetnames:
+                    wb.create_sheet(record["sheet"])
+            elif event == "copy_sheet":
+                if record["source"] not in source_wbs:
+                    source_wbs[record["source"]] = openpyxl.load_workbook(record["source"], data_only=True)
+                ResultJournal.copy_sheet(source_wbs[record["source"]][record["source_sheet"]], wb[record["sheet"]])
+            elif event == "line":
+                ResultJournal.write_line(wb[record["sheet"]], record["row"], record["col"], record["value"])
+            elif event == "actual":
+                ResultJournal.write_actual(wb[record["sheet"]], record["row"], record["col"], record["value"],
+                                           record["scenario_id"], record["current_sheet"])
+            elif event == "footer":
+                ws = wb[record["sheet"]]
+                ws.cell(row=ws.max_row + 2, column=1, value=record["value"])
+        for source_wb in source_wbs.values():
+            source_wb.close()
+
+        # Saved next to the result and swapped, so a partial result never replaces a complete one halfway
+        temp_file = f'{result_file}.tmp'
+        wb.save(temp_file)
+        os.replace(temp_file, result_file)
+
+    @staticmethod
+    def copy_sheet(ws, copy_ws):
+        for idx, cd in ws.column_dimensions.items():
+            copy_ws.column_dimensions[idx].width = cd.width
+        for idx, rd in ws.row_dimensions.items():
+            copy_ws.row_dimensions[idx].height = rd.height
+
+        # Style ids of the source workbook: {source style: copied style}, every distinct style is copied once
+        styles = dict()
+        for row in ws.rows:
+            for cell in row:
+                new_cell = copy_ws.cell(row=cell.row, column=cell.col_idx, value=cell.value)
+                if cell.has_style:
+                    style = tuple(cell._style)
+                    if style in styles:
+                        new_cell._style = copy(styles[style])
+                        continue
+                    new_cell.font = copy(cell.font)
+                    new_cell.border = copy(cell.border)
+                    new_cell.fill = copy(cell.fill)
+                    new_cell.number_format = copy(cell.number_format)
+                    new_cell.protection = copy(cell.protection)
+                    new_cell.alignment = copy(cell.alignment)
+                    styles[style] = new_cell._style
+
+    @staticmethod
+    def write_line(ws, row, col, value):
+        color = openpyxl.styles.colors.WHITE
+        if "FAILED" in value:
+            color = "FF0000"
+        elif "PASSED" in value:
+            color = "00b050"
+        elif "No Auto Run" in value:
+            color = "808080"
+        # elif "Pass/Fail" or "Actual" in value: color = "bfbfbf" #4472c4
+        elif "NO VALID LOG" in value:
+            color = "FFFF8A"
+        if "Empty" in value:
+            value = None
+
+        pass_fail = ws.cell(row=row, column=col, value=value)
+        copy_style = ws.cell(row=row, column=col - 1)
+        if copy_style.has_style:
+            pass_fail._style = copy(copy_style._style)
+
+        if color != openpyxl.styles.colors.WHITE:
+            pass_fail.fill = openpyxl.styles.PatternFill('solid', color)
+
+    @staticmethod
+    def write_actual(ws, row, col, value, scenario_id, current_sheet):
+        # Actual column
+        actual = ws.cell(row=row, column=col, value="")
+        copy_style = ws.cell(row=row, column=col - 2)
+        if copy_style.has_style:
+            actual._style = copy(copy_style._style)
+
+        if re.findall("^(!?)FRAMECOMPARE", value.upper()):
+            actual.value = "Step %d.png" % scenario_id
+            actual.hyperlink = "./Output/%s/Step %d.png" % (current_sheet, scenario_id)
+        elif re.findall("^VIDEOPROCESS", value.upper()):
+            actual.value = "Step %d.avi" % scenario_id
+            actual.hyperlink = "./Output/%s/Step %d.avi" % (current_sheet, scenario_id)
+        elif re.findall("^VIDEO", value.upper()):
+            actual.value = "Scenario_%d.mp4" % scenario_id
+            actual.hyperlink = "./Results/%s/Scenario_%d.mp4" % (current_sheet, scenario_id)
+        elif re.findall("^SIMVALUES:", value.upper()):
+            values = value[value.index(':') + 1:].replace(';', '\n').replace('\t', '')
+            actual.value = "SIMValues: " + values
+        elif re.findall("^GDTVALUES:", value.upper()):
+            values = value[value.index(':') + 1:].replace(';', '\n').replace('\t', '')
+            actual.value = "GDTVALUES: " + values
+        elif re.findall("^TEST_CALL", value.upper()):
+            values = value[value.index(':') + 1:]
+            actual.hyperlink = f"#{values}!A1"
+            actual.value = f"Sheet: \"{values}\""
+        else:
+            actual.value = value
+
+    @staticmethod
+    def cmd_execute():
+        lst_arguments = sys.argv
+        script_name = lst_arguments[0]
+        if len(lst_arguments) != 2:
+            return print(f"Usage: python {script_name} [test name]")
+
+        test_name = lst_arguments[1]
+        test_path = f'{Utilities.get_tests_folder()}/{test_name}'
+        journal_file = f'{test_path}/{test_name}_Result.jsonl'
+        if os.path.isfile(journal_file) is False:
+            return print(f"Could not find the result journal of {test_name}.")
+        ResultJournal.materialise(journal_file, f'{test_path}/{test_name}_Result.xlsx')
+        print(f"Results of {test_name} were written to {test_path}/{test_name}_Result.xlsx")
+
+
+if __name__ == "__main__":
+    ResultJournal.cmd_execute()
@@ -0,0 +1,162 @@
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import svn.exception
+from Exceptions import SVNError
+
+publish_attempts = 4
+publish_backoff = 2.0  # Seconds before the first retry, doubled after every failed attempt
+
+
+class ResultsPublisher:
+    """Uploads the results of finished tests to the SVN on a background thread, so the next test starts while the
+    previous results are uploaded. The artifacts of a test are staged in a single folder and imported in one commit,
+    the local test folder is only removed once the commit is confirmed."""
+
+    def __init__(self, attempts=publish_attempts, backoff=publish_backoff):
+        self._attempts = attempts
+        self._backoff = backoff
+
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._errors = list()
+        self._lock = threading.Lock()
+
+        self._worker = threading.Thread(target=self._run, name="ResultsPublisher", daemon=True)
+        self._worker.start()
+
+    def submit(self, svn_interface, artifacts: dict, target: str, folder=None, report=None):
+        """
+        Queues the upload of a test's results
+        :param svn_interface: SVNInterface of the test
+        :param artifacts: {name in the commit: local file or folder}
+        :param target: Folder of the commit under the test's result path
+        :param folder: Local test folder, removed once the commit is confirmed
+        :param report: Called with the progress messages of the upload
+        """
+        if report is None:
+            report = print
+
+        with self._lock:
+            self._pending.add(folder)
+        self._queue.put((svn_interface, artifacts, target, folder, report))
+
+    def is_pending(self, folder) -> bool:
+        with self._lock:
+            return folder in self._pending
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def drain(self, wait_function=None) -> list:
+        """
+        Waits for every queued upload
+        :return: Error messages of the failed uploads
+        """
+        if wait_function is None:
+            wait_function = ResultsPublisher._sleep
+
+        while self.pending_count() > 0:
+            wait_function(500)
+
+        with self._lock:
+            errors, self._errors = self._errors, list()
+        return errors
+
+    def _run(self):
+        while True:
+            svn_interface, artifacts, target, folder, report = self._queue.get()
+            try:
+                self._publish(svn_interface, artifacts, target, folder, report)
+            except Exception as error:
+                # Any failure ends this upload only, the worker goes on with the next one
+                message = error.message if isinstance(error, SVNError) else str(error)
+                try:
+                    self._error(f'Could not upload the results of {svn_interface.testname}: {message}', report)
+                except Exception:
+                    pass
+            finally:
+                with self._lock:
+                    self._pending.discard(folder)
+                self._queue.task_done()
+
+    def _publish(self, svn_interface, artifacts: dict, target: str, folder, report):
+        staging_folder = tempfile.mkdtemp(prefix=f'{svn_interface.testname}_')
+        try:
+            names = ResultsPublisher.stage(artifacts, staging_folder)
+            if len(names) == 0:
+                raise SVNError("SVN", "There are no results to upload.")
+
+            # Results found after a failed attempt were committed by it unless they were already there before
+            uploaded = svn_interface.results_exist(target, names)
+            for attempt in range(1, self._attempts + 1):
+                report(f'SVN: Uploading the results of {svn_interface.testname} ({attempt}/{self._attempts})..')
+                try:
+                    svn_interface.upload(staging_folder, target)
+                    break
+                except svn.exception.SvnException as error:
+                    if not uploaded and svn_interface.results_exist(target, names):
+                        break
+                    if attempt == self._attempts:
+                        raise SVNError("SVN", str(error))
+                    ResultsPublisher._sleep(self._backoff * 2 ** (attempt - 1) * 1000)
+            report(f'SVN: The results of {svn_interface.testname} were uploaded to {target}.')
+        finally:
+            shutil.rmtree(staging_folder, ignore_errors=True)
+
+        if folder is not None and os.path.exists(folder):
+            try:
+                shutil.rmtree(folder)
+            except OSError as error:
+                self._error(f'Could not remove {folder} after its upload: {error}', report)
+
+    def _error(self, message, report):
+        with self._lock:
+            self._errors.append(message)
+        report(message)
+
+    @staticmethod
+    def stage(artifacts: dict, staging_folder: str) -> list:
+        """
+        Links (or copies, across drives) the artifacts into the staging folder under their name in the commit
+        :return: Names of the staged artifacts, missing artifacts are skipped
+        """
+        names = list()
+        for name, path in artifacts.items():
+            if os.path.isdir(path):
+                shutil.copytree(path, f'{staging_folder}/{name}', copy_function=ResultsPublisher._link)
+            elif os.path.isfile(path):
+                ResultsPublisher._link(path, f'{staging_folder}/{name}')
+            else:
+                continue
+            names.append(name)
+        return names
+
+    @staticmethod
+    def _link(source, destination):
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+        return destination
+
+    @staticmethod
+    def _sleep(milliseconds):
+        time.sleep(milliseconds / 1000)
+
+
+_results_publisher = None
+_results_publisher_lock = threading.Lock()
+
+
+def results_publisher() -> ResultsPublisher:
+    """:return: The results publisher of the process, started on first use"""
+    global _results_publisher
+    with _results_publisher_lock:
+        if _results_publisher is None:
+            _results_publisher = ResultsPublisher()
+        return _results_publisher
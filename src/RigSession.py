@@ -0,0 +1,39 @@
+from Utilities import Utilities
+from Exceptions import TestError, SimEngineConnectionError
+from GDTInterface import GDTInterface
+from SimEngineInterface import SimEngineInterface
+from PCSIMSocketInterface import PCSIMSocketInterface
+
+
+class RigSession:
+    """Rig connections shared by every test of a suite: the GDT connections, the SimEngine COM instance and the
+    PC-SIM socket of a host environment. Tests run on a session only clear their injections at the end, the
+    connections are closed once by close()."""
+
+    def __init__(self, host_env=False, test=None):
+        self.host_env = host_env
+        self.socket_interface = None
+        if test is not None:
+            # Session of the connections already opened by a test, shared with the tests it calls
+            if self.host_env is True:
+                self.socket_interface = test.socket_interface
+            self.GDTInterfaces = test.GDTInterfaces
+            self.SimEngineInterface = test.SimEngineInterface
+            return
+
+        if self.host_env is True:
+            self.socket_interface = PCSIMSocketInterface()
+
+        self.GDTInterfaces = [GDTInterface(interface) for interface in Utilities.get_gdt_interface_connection()]
+        try:
+            self.SimEngineInterface = SimEngineInterface()
+        except SimEngineConnectionError as error:
+            raise TestError("Rig session", error.message)
+
+    def close(self):
+        for gdt_interface in self.GDTInterfaces:
+            gdt_interface.disconnect()
+        self.GDTInterfaces = list()
+        # SimEngine unapplies its values when deleted
+        self.SimEngineInterface = None
+        self.socket_interface = None
@@ -1,7 +1,13 @@
+import os
+import shutil
+import svn.local
 import svn.remote
 from Utilities import *
 from Exceptions import SVNError
 
+# Working copies of the downloaded tests
+svn_cache_folder = os.path.abspath('./SVNCache')
+
 
 class SVNInterface:
     def __init__(self, _testname, ci=False):
@@ -21,6 +27,41 @@ class SVNInterface:
             raise SVNError("SVN", "Could not export test's folder.")
         self.client.export(folder)
 
+    def export_cached(self, folder) -> bool:
+        """
+        Materialises the test in folder from its working copy in the SVN cache. The working copy is only updated, or
+        switched when the test was moved, when the last changed revision of the test in the SVN differs from it
+        :return: Whether the working copy was fetched from the SVN
+        """
+        try:
+            remote_info = self.client.info()
+        except svn.exception.SvnException:
+            raise SVNError("SVN", "Could not export test's folder.")
+
+        working_copy = f'{svn_cache_folder}/{self.testname}'
+        fetched = True
+        if os.path.isdir(f'{working_copy}/.svn'):
+            local_client = svn.local.LocalClient(working_copy)
+            try:
+                local_info = local_client.info()
+                if local_info['url'] != remote_info['url']:
+                    local_client.run_command('switch', [remote_info['url'], working_copy])
+                elif local_info['commit_revision'] != remote_info['commit_revision']:
+                    local_client.update()
+                else:
+                    fetched = False
+            except svn.exception.SvnException:
+                # Broken working copy, checked out again
+                shutil.rmtree(working_copy)
+                self.client.checkout(working_copy)
+        else:
+            if os.path.exists(working_copy):
+                shutil.rmtree(working_copy)
+            self.client.checkout(working_copy)
+
+        shutil.copytree(working_copy, folder, ignore=shutil.ignore_patterns('.svn'))
+        return fetched
+
     def upload(self, folder, file_name, message="AutoTester commit"):
         cmd = [f"-m {message}", "--username", self.user, "--password", self.password, folder,
                f'{self.result_path}/{file_name}', "--no-auth-cache", "--non-interactive"]
@@ -31,6 +72,17 @@ class SVNInterface:
                f'{self.result_path}/{file_name}', "--no-auth-cache", "--non-interactive"]
         self.client.run_command('import', cmd)
 
+    def results_exist(self, target, names) -> bool:
+        """:return: Whether every one of the names is in the target folder of the test's result path"""
+        cmd = ["--username", self.user, "--password", self.password]
+        cmd += [f'{self.result_path}/{target}/{name}' for name in names]
+        cmd += ["--no-auth-cache", "--non-interactive"]
+        try:
+            self.client.run_command('info', cmd)
+            return True
+        except svn.exception.SvnException:
+            return False
+
     def exists(self):
         try:
             self.client.info()
@@ -0,0 +1,613 @@
+import re
+import operator
+from enum import Enum
+
+from Utilities import Utilities
+from Exceptions import TestError, ParameterError
+
+gdt_operators = {
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '=': operator.eq
+}
+
+reference_inject_regex = re.compile("^GDT_STRUCT_PSP2|^GDT_STRUCT|^GDT_PSP2|^GDT|^SIM")
+heading_inject_regex = re.compile("INJECT*")
+expected_split_regex = re.compile(r',\s*(?![^()]*\))')
+unit_regex = re.compile(r"(.*)(\[.*\])$")
+noise_regex = re.compile(r"^(noise_)(.*)\((.*)\)$", re.IGNORECASE)
+box_regex = re.compile("([0-9]+),([0-9]+),([0-9]+),([0-9]+)")
+position_regex = re.compile("([a-zA-Z]+),([0-9.]+),([a-zA-Z]+),([0-9.]+)")
+frame_compare_regex = re.compile('^(!?)FRAMECOMPARE')
+gdt_method_regex = re.compile(r"(GDT_STRUCT|GDT)(_PSP2)?\((.*)\)", re.IGNORECASE)
+# The data item ends and the value starts with a character that is not part of an operator, so that e.g. a=>3 is not
+# read as the data item "a=" compared with '>'
+gdt_condition_regex = re.compile("^(.*[^!<>=])(!=|<=|>=|<|>|=)([^!<>=].*|)$")
+operator_regex = re.compile("[!<>=]+")
+wait_regex = re.compile(r"^WAIT_(GDT_PSP2|GDT|SIM)\((.*)\)$", re.IGNORECASE)
+default_wait_timeout = 10.0  # seconds
+# VIDEOPROCESS verbs and the unit of their expected value
+video_process_units = {"flashing": "flashes", "frequency": "Hz", "dutycycle": "%", "latency": "s"}
+noise_arguments = {
+    "steps": 4,
+    "sine": 3,
+    "constant": 2,
+    "pulse": 5
+}
+
+
+class Step:
+    class StepType(Enum):
+        INJECT = 0
+        ACTION = 1
+        EXPECTED = 2
+        CALL_TEST = 3
+
+    def __init__(self, step_type: StepType, column: int, raw):
+        self.step_type = step_type
+        self.column = column
+        self.raw = raw
+
+
+class SimInjection(Step):
+    def __init__(self, column: int, raw, label: str, unit: str, value, noise_type=None, noise_args=()):
+        super(SimInjection, self).__init__(Step.StepType.INJECT, column, raw)
+        self.label = label
+        self.unit = unit
+        self.value = value
+        self.noise_type = noise_type
+        self.noise_args = noise_args
+
+
+class GDTInjection(Step):
+    def __init__(self, column: int, raw, ofp: int, data_item: str, data_item_name: str, method: str, value):
+        super(GDTInjection, self).__init__(Step.StepType.INJECT, column, raw)
+        self.ofp = ofp
+        self.data_item = data_item
+        self.data_item_name = data_item_name
+        self.method = method
+        self.value = value
+
+
+class Action(Step):
+    def __init__(self, column: int, raw, name: str, argument=None):
+        step_type = Step.StepType.CALL_TEST if name == "CALL_TEST" else Step.StepType.ACTION
+        super(Action, self).__init__(step_type, column, raw)
+        self.name = name
+        self.argument = argument
+
+
+class WaitCondition:
+    def __init__(self, source: str, ofp: int, items: list, timeout: float):
+        self.source = source  # GDT or SIM
+        self.ofp = ofp
+        self.items = items  # [(dataitem or label, unit, operator, expected value)]
+        self.timeout = timeout
+
+
+class Expected(Step):
+    def __init__(self, column: int, raw, checks: list):
+        super(Expected, self).__init__(Step.StepType.EXPECTED, column, raw)
+        self.checks = checks
+
+
+class FrameCompareCheck:
+    def __init__(self, raw: str, is_absence: bool, golden_image: str, method: str, tolerance: int, search_box=None,
+                 grab_box=None, position=None):
+        self.raw = raw
+        self.is_absence = is_absence
+        self.golden_image = golden_image
+        self.method = method
+        self.tolerance = tolerance
+        self.search_box = search_box
+        self.grab_box = grab_box
+        self.position = position
+
+
+class VideoProcessCheck:
+    def __init__(self, raw: str, method: str, count: int, steady_image: str, flashing_image: str, top_left: tuple,
+                 bottom_right: tuple, tolerance: int, expected_range=None):
+        self.raw = raw
+        self.method = method
+        self.count = count
+        self.expected_range = expected_range  # (minimum, maximum) for the frequency, dutycycle and latency verbs
+        self.steady_image = steady_image
+        self.flashing_image = flashing_image
+        self.top_left = top_left
+        self.bottom_right = bottom_right
+        self.tolerance = tolerance
+
+
+class SimCheck:
+    def __init__(self, raw: str, items: list):
+        self.raw = raw
+        self.items = items  # [(label, unit, expected_value), ...]
+
+
+class GDTCheck:
+    def __init__(self, raw: str, method: str, ofp: int, items: list, struct_name=None):
+        self.raw = raw
+        self.method = method
+        self.ofp = ofp
+        self.items = items  # [(dataitem, operator_sign, expected_value), ...]
+        self.struct_name = struct_name
+
+
+class NoAutoRunCheck:
+    def __init__(self, raw: str):
+        self.raw = raw
+
+
+class CompiledRow:
+    def __init__(self, row: int, scenario, steps: list, is_scenario: bool):
+        self.row = row
+        self.scenario = scenario
+        self.steps = steps
+        self.is_scenario = is_scenario
+
+
+class CompiledSheet:
+    def __init__(self, ws, hash_tag, reference=(), headings=(), free_text=(), rows=(), gdt_ofps=()):
+        self.ws = ws
+        self.title = ws.title
+        self.hash_tag = hash_tag
+        self.reference = reference
+        self.headings = headings
+        self.free_text = free_text
+        self.rows = rows
+        self.gdt_ofps = gdt_ofps
+
+    def find_scenario(self, scenario) -> int:
+        for compiled_row in self.rows:
+            if str(scenario) == str(compiled_row.scenario):
+                return compiled_row.row
+        return 0
+
+
+class ScenarioCompiler:
+    """Turns a '#'-anchored sheet (reference row, headings row, free text row, scenario rows) into a list of typed
+    steps, so that syntax errors are reported before the test touches the rig."""
+
+    def __init__(self, actions=None):
+        if actions is None:
+            actions = dict()
+        self.actions = actions
+        self.errors = list()
+
+    def compile_sheet(self, ws) -> CompiledSheet:
+        hash_tag = ScenarioCompiler.find_hash_tag(ws)
+        if hash_tag == [0, 0]:
+            return CompiledSheet(ws, hash_tag)
+
+        scenario_col = hash_tag[1]
+        rows = ws.iter_rows(min_row=hash_tag[0] - 1, max_row=hash_tag[0] + 1)
+        reference = [c.value for c in next(rows)]
+        headings = [c.value for c in next(rows)]
+        free_text = [c.value for c in next(rows)]
+
+        gdt_ofps = set()
+        for reference_name in reference:
+            if reference_name is None:
+                continue
+            if str(reference_name).upper() == "GDT":
+                gdt_ofps.add(0)
+            if str(reference_name).upper() == "GDT_PSP2":
+                gdt_ofps.add(1)
+
+        compiled_rows = list()
+        for row, line in enumerate(ws.iter_rows(min_row=hash_tag[0] + 2, max_row=ws.max_row + 1), hash_tag[0] + 2):
+            steps = list()
+            is_scenario = False
+            scenario = line[scenario_col - 1].value if len(line) >= scenario_col else None
+            for column, cell in enumerate(line):
+                value = cell.value
+                reference_name = reference[column] if column < len(reference) else None
+                if value == 'N\\A':
+                    value = 'N/A'
+                if value is None or reference_name is None or scenario is None:
+                    continue
+                reference_name = str(reference_name).upper()
+                if value == 'N/A' and reference_name != 'EXPECTED':
+                    continue
+                is_scenario = True
+                try:
+                    steps += self.compile_cell(reference_name, headings[column], value, column)
+                except TestError as error:
+                    self.errors.append(f'{ws.title}!{cell.coordinate}: {error.message}')
+            compiled_rows.append(CompiledRow(row, scenario, steps, is_scenario))
+
+        return CompiledSheet(ws, hash_tag, reference, headings, free_text, compiled_rows, sorted(gdt_ofps))
+
+    @staticmethod
+    def find_hash_tag(ws):
+        # Row iteration instead of ws.cell() keeps this fast on read-only workbooks
+        for row, line in enumerate(ws.iter_rows(min_row=1, max_row=ws.max_row - 1), 1):
+            for col, cell in enumerate(line[:ws.max_column - 1], 1):
+                if '#' in str(cell.value):
+                    return [row, col]
+        return [0, 0]
+
+    @staticmethod
+    def read_actions(ws) -> dict:
+        actions = dict()
+        for line in ws.iter_rows(min_row=1, max_row=ws.max_row):
+            for cell in line:
+                data = cell.value
+                if isinstance(data, str) and data.count('=') == 1:
+                    shortcut, real_action = data.split('=')
+                    actions[shortcut.lower()] = real_action
+        return actions
+
+    def compile_cell(self, reference_name: str, heading, value, column: int) -> list:
+        # Handle column by referring to header data
+        if reference_inject_regex.match(reference_name):
+            if heading is None:
+                raise TestError(str(value), f'Missing data item or label heading for {reference_name} column.')
+            if heading_inject_regex.search(str(heading)):
+                return self.compile_inject_cell(reference_name, value, column)
+            if reference_name == "SIM":
+                return [self.compile_sim_injection(str(heading), value, column)]
+            if reference_name == "GDT" or reference_name == "GDT_PSP2":
+                return [ScenarioCompiler.compile_gdt_injection(reference_name, str(heading), value, column)]
+
+        if reference_name == "ACTION":
+            return [ScenarioCompiler.compile_action(str(value), column)]
+
+        if reference_name == "EXPECTED":
+            return [ScenarioCompiler.compile_expected(str(value), column)]
+
+        return []
+
+    def compile_inject_cell(self, inject_type: str, values, column: int) -> list:
+        steps = list()
+        if inject_type != "GDT" and inject_type != "GDT_PSP2" and inject_type != "SIM":
+            return steps
+
+        for data in str(values).split(':'):  # Split dataitems/labels by ':'
+            try:
+                name, inject_value = data.split('=')  # Split dataitem/label and value
+            except ValueError:
+                raise TestError(str(values), f'Invalid injection "{data}", please follow the format: name=value:name=value')
+            if inject_type == "SIM":
+                steps.append(self.compile_sim_injection(name, inject_value, column))
+            else:
+                steps.append(ScenarioCompiler.compile_gdt_injection(inject_type, name, inject_value, column))
+        return steps
+
+    def compile_sim_injection(self, label: str, value, column=0) -> SimInjection:
+        raw = value
+        label, unit = ScenarioCompiler.split_unit(label)
+
+        if type(value) == str:
+            if value.lower() in self.actions:
+                value = self.actions[value.lower()]
+
+        if str(value).lower().startswith("noise_"):
+            noise_data = noise_regex.search(str(value))  # Split the string
+            if noise_data is None:
+                raise TestError(str(value), f"Cannot read {value}\nMake sure to follow the format!")
+
+            noise_type = noise_data.group(2).lower()  # Noise type
+            new_value = noise_data.group(3)  # Noise value
+            x = new_value.split(',')  # Split values by ','
+            try:
+                if noise_type == "manhattan":
+                    repeat_count = int(x[len(x) - 1])  # Repeat count shall be the last number
+                    values = new_value[0:new_value.rindex(',')]  # Remove repeat count
+                    noise_args = (values, repeat_count)
+                elif noise_type in noise_arguments:
+                    if len(x) < noise_arguments[noise_type]:
+                        raise IndexError
+                    noise_args = tuple(x)
+                    if noise_type == "constant":
+                        noise_args = (x[0], int(x[1]))
+                    if noise_type == "pulse":
+                        noise_args = (x[0], int(x[1]), x[2], int(x[3]), int(x[4]))
+                else:
+                    raise TestError(str(value), f"Unknown noise type \"{noise_type}\" in {value}")
+            except (IndexError, ValueError):
+                raise TestError(str(value), "Incorrect usage of noise!!")
+
+            return SimInjection(column, raw, label, unit, value, noise_type, noise_args)
+
+        if type(value) == str:
+            if value.lower() == "true":
+                value = "True"
+            if value.lower() == "false":
+                value = "False"
+        return SimInjection(column, raw, label, unit, value)
+
+    @staticmethod
+    def compile_gdt_injection(header: str, data_item: str, value, column=0) -> GDTInjection:
+        ofp = 1 if header == "GDT_PSP2" else 0
+
+        if data_item.lower() == "visor" and str(value).lower() == "true":
+            # Shortcut word for VISOR_COEFFICIENTS injection to straighten the screen
+            return GDTInjection(column, value, ofp, data_item, data_item, "visor", value)
+
+        if ".validity" in data_item.lower():
+            try:
+                converted_value = Utilities.validity_or_number_to_bool(value)
+            except (ParameterError, AttributeError):
+                raise TestError(str(value), f"{data_item}: \"{value}\" cannot be used for validity injection! value has to be Valid or Invalid.")
+
+            data_item_name = data_item[:data_item.index('.')]  # Remove .Validity from dataitem string
+            return GDTInjection(column, value, ofp, data_item, data_item_name, "validity", converted_value)
+
+        if ".override" in data_item.lower():
+            data_item_name = data_item[:data_item.index('.')]  # Remove .override from dataitem string
+            return GDTInjection(column, value, ofp, data_item, data_item_name, "override", value)
+
+        return GDTInjection(column, value, ofp, data_item, data_item, "value", value)
+
+    @staticmethod
+    def compile_action(value: str, column=0) -> Action:
+        function_name = value.upper()
+        if function_name.startswith("WAIT_"):
+            return Action(column, value, "WAIT", ScenarioCompiler.compile_wait(value))
+
+        if re.match("^SLEEP|^DELAY", function_name):
+            try:
+                delay = float(ScenarioCompiler.get_arguments(value))
+            except ValueError:
+                raise TestError(value, "Wrong usage of delay, try delay(seconds)")
+            return Action(column, value, "SLEEP", delay)
+
+        if function_name.startswith("MSG"):
+            try:
+                text = ScenarioCompiler.get_arguments(value)
+            except ValueError:
+                text = ""
+            return Action(column, value, "MSG", text)
+
+        if function_name.startswith("CALL_TEST"):
+            try:
+                test = ScenarioCompiler.get_arguments(value)
+            except ValueError:
+                test = ""
+            return Action(column, value, "CALL_TEST", test)
+
+        if function_name.startswith("SCREENSHOT"):
+            return Action(column, value, "SCREENSHOT")
+
+        if function_name.startswith("VIDEO") or function_name.startswith("BVIDEO"):
+            try:
+                calc_time = float(ScenarioCompiler.get_arguments(value))
+            except ValueError:
+                raise TestError(value, "Wrong usage of video, try video(seconds)")
+            return Action(column, value, "BVIDEO" if function_name.startswith("BVIDEO") else "VIDEO", calc_time)
+
+        if function_name.startswith("GDT_DISCONNECT"):
+            return Action(column, value, "GDT_DISCONNECT")
+
+        raise TestError(value, f"Unknown action: {value}")
+
+    @staticmethod
+    def compile_wait(value: str) -> WaitCondition:
+        wait_data = wait_regex.search(value)
+        usage = "Wrong usage of wait, try WAIT_GDT(dataitem=value,timeout) or WAIT_SIM(label=value:label2>value,timeout)"
+        if wait_data is None:
+            raise TestError(value, usage)
+
+        source = wait_data.group(1).upper()
+        ofp = 1 if source == "GDT_PSP2" else 0
+        conditions = wait_data.group(2)
+        timeout = default_wait_timeout
+        if ',' in conditions:
+            conditions, timeout_text = conditions.rsplit(',', 1)
+            try:
+                timeout = float(timeout_text)
+            except ValueError:
+                raise TestError(value, usage)
+
+        items = list()
+        for data in conditions.split(':'):
+            name, operator_sign, expected_value = ScenarioCompiler.split_condition(data, value, usage)
+            if source == "SIM":
+                label, unit = ScenarioCompiler.split_unit(name)
+            else:
+                label, unit = name, None
+            items.append((label, unit, operator_sign, expected_value))
+
+        return WaitCondition("SIM" if source == "SIM" else "GDT", ofp, items, timeout)
+
+    @staticmethod
+    def compile_expected(value: str, column=0) -> Expected:
+        if (' ' in value) or ('\n' in value) or ('\t' in value):
+            raise TestError(value, f'Expected commands shall not have whitespaces, new lines or tabulations: {value}')
+
+        # Split expected data by ',' to handle multiple data
+        checks = [ScenarioCompiler.compile_check(data) for data in expected_split_regex.split(value)]
+        return Expected(column, value, checks)
+
+    @staticmethod
+    def compile_check(function_name: str):
+        frame_compare_data = frame_compare_regex.search(function_name.upper())
+        if frame_compare_data is not None:
+            return ScenarioCompiler.compile_frame_compare(function_name, frame_compare_data.group(1) != '')
+
+        if function_name.upper().startswith("VIDEOPROCESS"):
+            return ScenarioCompiler.compile_video_process(function_name)
+
+        if function_name.upper().startswith("SIM"):
+            return ScenarioCompiler.compile_sim_check(function_name)
+
+        if re.match("^(GDT_STRUCT|GDT)(_PSP2)?(.*)", function_name.upper()):
+            return ScenarioCompiler.compile_gdt_check(function_name)
+
+        if "N/A" in function_name.upper():
+            return NoAutoRunCheck(function_name)
+
+        raise TestError(function_name, f"Unknown expected command: {function_name}")
+
+    @staticmethod
+    def compile_frame_compare(function_name: str, is_absence: bool) -> FrameCompareCheck:
+        try:
+            data = ScenarioCompiler.get_arguments(function_name).split(':')
+        except ValueError:
+            raise TestError(function_name, "Wrong usage of framecompare, please follow the format.")
+
+        try:
+            golden_image_name = data[0]
+            method = data[1].upper()
+            if method == 'SUB_IMAGE':
+                search_box = ScenarioCompiler.get_box(data[2], function_name)
+                grab_box = ScenarioCompiler.get_box(data[3], function_name)
+                tolerance = ScenarioCompiler.get_int(data[4], function_name)
+                return FrameCompareCheck(function_name, is_absence, golden_image_name, method, tolerance,
+                                         search_box=search_box, grab_box=grab_box)
+
+            elif method == 'PATTERN':
+                search_box = ScenarioCompiler.get_box(data[2], function_name)
+                tolerance = ScenarioCompiler.get_int(data[3], function_name)
+                return FrameCompareCheck(function_name, is_absence, golden_image_name, method, tolerance,
+                                         search_box=search_box)
+
+            elif method == 'PATTERN_RDP':
+                position_data = position_regex.search(data[2])
+                if position_data is None:
+                    raise TestError(function_name, f'Invalid position: {data[2]}, expected direction,degrees,direction,degrees.')
+                position = (position_data.group(1), float(position_data.group(2)),
+                            position_data.group(3), float(position_data.group(4)))
+                tolerance = ScenarioCompiler.get_int(data[3], function_name)
+                return FrameCompareCheck(function_name, is_absence, golden_image_name, method, tolerance,
+                                         position=position)
+
+            else:
+                raise TestError(function_name, f'Invalid command: {data[1]}.')
+
+        except (IndexError, ValueError):
+            msg = "Invalid Format! FrameCompare(source_file:element_type:position:tolerance)\n"
+            if len(data) > 1:
+                if data[1].lower() == "sub_image":
+                    msg = "Invalid Format! FrameCompare(source_file:element_type:search_box:grab_box:tolerance)\n"
+                if data[1].lower() == "pattern":
+                    msg = "Invalid Format! FrameCompare(source_file:element_type:search_box:tolerance)\n"
+                if data[1].lower() == "pattern_rdp":
+                    msg = "Invalid Format! FrameCompare(source_file:element_type:position:tolerance)\n"
+            raise TestError(function_name, msg)
+
+    @staticmethod
+    def compile_video_process(function_name: str) -> VideoProcessCheck:
+        try:
+            data = ScenarioCompiler.get_arguments(function_name).split(':')
+        except ValueError:
+            raise TestError(function_name, "Wrong usage of videoprocess, please follow the format.")
+
+        method = data[0].lower()
+        if method not in video_process_units:
+            raise TestError(function_name, f"Unknown videoprocess command: {data[0]}")
+
+        try:
+            search_box = data[4].split(',')
+            top_left = (int(search_box[0]), int(search_box[1]))
+            bottom_right = (int(search_box[2]), int(search_box[3]))
+            tolerance = int(data[5])
+            if method == "flashing":
+                return VideoProcessCheck(function_name, method, int(data[1]), data[2], data[3], top_left, bottom_right,
+                                         tolerance)
+
+            # Expected measurement range: min-max, e.g. frequency:1.8-2.2 (Hz)
+            expected_range = tuple(float(value) for value in data[1].split('-'))
+            if len(expected_range) != 2 or expected_range[0] > expected_range[1]:
+                raise ValueError
+        except (IndexError, ValueError):
+            if method == "flashing":
+                raise TestError(function_name, "Wrong usage of videoprocess(flashing:count:steady_img:flashing_img:search_box:tolerance")
+            raise TestError(function_name, f"Wrong usage of videoprocess({method}:min-max:steady_img:flashing_img:"
+                                           f"search_box:tolerance), range in {video_process_units[method]}")
+
+        return VideoProcessCheck(function_name, method, 0, data[2], data[3], top_left, bottom_right, tolerance,
+                                 expected_range)
+
+    @staticmethod
+    def compile_sim_check(function_name: str) -> SimCheck:
+        try:
+            # Remove the SIM() string
+            new_value = ScenarioCompiler.get_arguments(function_name)
+        except ValueError:
+            raise TestError(function_name, "Wrong usage of SIM data read, please follow the format:\n"
+                                           "SIM(Label=value:Label2=value)")
+        items = list()
+        for data in new_value.split(':'):  # Split labels by ':'
+            try:
+                label, expected_value = data.split('=')  # Split label and value [label,value]
+            except ValueError:
+                raise TestError(function_name, "Wrong usage of SIM data read, please follow the format:\n"
+                                               "SIM(Label=value:Label2=value)")
+            label, unit = ScenarioCompiler.split_unit(label)
+            items.append((label, unit, expected_value))
+        return SimCheck(function_name, items)
+
+    @staticmethod
+    def compile_gdt_check(function_name: str) -> GDTCheck:
+        method_data = gdt_method_regex.search(function_name)
+        if method_data is None:
+            raise TestError(function_name, "Wrong usage of GDT struct read, please follow the format:\nGDT(dataitem=value)")
+
+        method = method_data.group(1).upper()
+        ofp = 1 if method_data.group(2) is not None else 0
+        data_items = method_data.group(3).split(':')  # Split dataitems by ':'
+
+        struct_name = None
+        if method == "GDT_STRUCT":
+            struct_name = data_items[0]
+            data_items = data_items[1:]
+
+        items = list()
+        for data in data_items:
+            items.append(ScenarioCompiler.split_condition(
+                data, function_name, f"Invalid condition \"{data}\", please follow the format: dataitem=value"))
+
+        return GDTCheck(function_name, method, ofp, items, struct_name)
+
+    @staticmethod
+    def split_condition(data: str, function_name: str, usage: str) -> tuple:
+        """:return: Data item (or label), operator and expected value of a GDT/WAIT condition"""
+        condition_data = gdt_condition_regex.search(data)
+        if condition_data is None:
+            for operator_sign in operator_regex.findall(data):
+                if operator_sign not in gdt_operators:
+                    raise TestError(function_name, f"\'{operator_sign}\' is not a valid operator and cannot be used!\nValid operators are: !=, <= ,< ,>= ,>, =")
+            raise TestError(function_name, usage)
+
+        name, operator_sign, expected_value = condition_data.groups()
+        if operator_sign not in ('=', '!=') and ScenarioCompiler.is_number(expected_value) is False:
+            raise TestError(function_name, f"\'{operator_sign}\' compares numbers, \"{expected_value}\" is not a number.")
+        return name, operator_sign, expected_value
+
+    @staticmethod
+    def is_number(text: str) -> bool:
+        try:
+            float(text)
+            return True
+        except ValueError:
+            return False
+
+    @staticmethod
+    def get_arguments(function_name: str) -> str:
+        return function_name[function_name.index('(') + 1:function_name.rindex(')')]
+
+    @staticmethod
+    def get_box(box_text: str, function_name: str):
+        box_data = box_regex.search(box_text)
+        if box_data is None:
+            raise TestError(function_name, f'Invalid box: {box_text}, expected x1,y1,x2,y2.')
+        return (int(box_data.group(1)), int(box_data.group(2))), (int(box_data.group(3)), int(box_data.group(4)))
+
+    @staticmethod
+    def get_int(text: str, function_name: str) -> int:
+        try:
+            return int(text)
+        except ValueError:
+            raise TestError(function_name, f'Invalid number: {text}.')
+
+    @staticmethod
+    def split_unit(label: str):
+        unit_data = unit_regex.search(label)
+        if unit_data is None:
+            return label, "N/A"
+        return unit_data.group(1), unit_data.group(2)
@@ -1,4 +1,5 @@
 import time
+from Utilities import Utilities
 from Exceptions import SimEngineConnectionError, SimEngineInjectionError
 
 import win32com.client
@@ -10,7 +11,7 @@ class SimEngineInterface:
         self.is_connected = False
         self.last_error = ''
         try:
-            self.sim_stu_instance = win32com.client.Dispatch("SimControl.SimScript")
+            self.sim_stu_instance = win32com.client.Dispatch(Utilities.get_sim_engine_prog_id())
             self.is_connected = True
 
             self.unapply_values()
@@ -44,6 +45,27 @@ class SimEngineInterface:
         self.sim_stu_instance.SetElementValue(label, unit, value)
         self.__check_error()
 
+    def apply_batch(self, values: list) -> list:
+        """
+        Injects several values with a single error check. Only when the batch reports an error, the values are injected
+        again one by one to find the ones that failed.
+        :param values: [(label, unit, value)]
+        :return: [(label, error message)] of the values that failed
+        """
+        self.__check_connected()
+        for label, unit, value in values:
+            self.sim_stu_instance.SetElementValue(label, unit, value)
+        if self.update_last_error() == '':
+            return list()
+
+        failures = list()
+        for label, unit, value in values:
+            try:
+                self.inject_value(label, unit, value)
+            except SimEngineInjectionError as error:
+                failures.append((label, error.message))
+        return failures
+
     def inject_noise_steps(self, label: str, unit: str, value: str, frequency: str, start_value: str, end_value: str):
         self.__check_connected()
         self.sim_stu_instance.NoiseSteps(label, unit, value, frequency, start_value, end_value, 0, 1)
@@ -54,19 +76,21 @@ class SimEngineInterface:
         self.sim_stu_instance.NoiseSine(label, unit, bias, amplitude, frequency, 0, 1)
         self.__check_error()
 
-    def inject_noise_constant(self, label: str, unit: str, value: str, duration: int, override: int):
+    # Finite noises run in SimEngine, they return right away with the time.time() at which the noise ends
+
+    def inject_noise_constant(self, label: str, unit: str, value: str, duration: int, override: int) -> float:
         self.__check_connected()
         self.sim_stu_instance.NoiseConstant(label, unit, value, duration, override)
-        time.sleep(duration / 1000.0)
         self.__check_error()
+        return time.time() + duration / 1000.0
 
-    def inject_noise_pulse(self, label: str, unit: str, first_value: str, first_duration: int, second_value: str, second_duration: int, repetitions: int):
+    def inject_noise_pulse(self, label: str, unit: str, first_value: str, first_duration: int, second_value: str, second_duration: int, repetitions: int) -> float:
         self.__check_connected()
         self.sim_stu_instance.NoisePulse(label, unit, first_value, first_duration, second_value, second_duration, repetitions, 1)
-        time.sleep((repetitions * (first_duration + second_duration)) / 1000.0)
         self.__check_error()
+        return time.time() + (repetitions * (first_duration + second_duration)) / 1000.0
 
-    def inject_noise_manhattan(self, label: str, unit: str, values: str, repetitions: int):
+    def inject_noise_manhattan(self, label: str, unit: str, values: str, repetitions: int) -> float:
         self.__check_connected()
 
         split_values = values.split(',')
@@ -83,6 +107,7 @@ class SimEngineInterface:
 
         self.sim_stu_instance.NoiseManhattan(label, unit, values, repetitions, 1)
         self.__check_error()
+        return time.time() + (repetitions * sleep_count_ms) / 1000.0
 
     def get_element_value(self, label: str, unit: str) -> str:
         self.__check_connected()
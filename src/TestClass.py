@@ -1,5 +1,4 @@
 import os
-from copy import copy
 import datetime
 import subprocess
 import shutil
@@ -9,7 +8,6 @@ import re
 import time
 from PyQt5.QtWidgets import *
 from PyQt5 import QtTest
-import operator
 
 from Utilities import Utilities
 from Logger import *
@@ -21,19 +19,30 @@ from SVNInterface import SVNInterface
 from SimEngineInterface import SimEngineInterface
 from ImageComparator import ImageComparator, ImageComparatorError
 from VideoComparator import VideoComparator
+from VideoCompressor import VideoCompressor
+from ResultJournal import ResultJournal
+from RigSession import RigSession
+from ResultsPublisher import results_publisher
+from ScenarioCompiler import ScenarioCompiler, Step, SimInjection, FrameCompareCheck, VideoProcessCheck, SimCheck, \
+    GDTCheck, gdt_operators, video_process_units
 
 # Global Defines
 simulation = True
-SLEEP_TIME = 100  # default sleep time im ms
+SLEEP_TIME = 100  # default sleep time im ms, also the settle time after an injection
+CHECK_TIMEOUT = 1000  # max time in ms for a GDT expected value to be reached
+STRUCT_CACHE_TTL = 0.5  # time in s a struct snapshot may be reused by the next GDT_STRUCT expectation
+SCREENSHOT_SETTLE_TIME = 1000  # time in ms for the display to render the last injection before a screenshot
+POLL_MIN_TIME = 20  # first poll interval of a condition based wait in ms, doubled up to POLL_MAX_TIME
+POLL_MAX_TIME = 500
 
 
 class TestClass(object):
     def __init__(self, _test_name, _svn_download, _svn_results, _executed, _host_env=False, _menu=None, _ci=False,
-                 _instrumented=False, _called=False):
+                 _instrumented=False, _called=False, _session=None):
         super(TestClass, self).__init__()
 
         self.test_name = _test_name
-        self.test_path = Utilities.get_tests_folder()
+        self.test_path = os.path.abspath(Utilities.get_tests_folder())
 
         self.test_path = f'{self.test_path}/{self.test_name}'
         self.output_path = f'{self.test_path}/Output'
@@ -41,6 +50,8 @@ class TestClass(object):
         self.golden_images_path = f'{self.test_path}/GoldenImage'
         self.excel_file = f'{self.test_path}/{self.test_name}.xlsx'
         self.excel_result_file = f'{self.test_path}/{self.test_name}_Result.xlsx'
+        self.result_journal_file = f'{self.test_path}/{self.test_name}_Result.jsonl'
+        self.result_journal = None
         self.host_env = _host_env
         self.executed = _executed
         self.menu = _menu
@@ -81,14 +92,22 @@ class TestClass(object):
                 raise TestError(self.test_name,
                                 f"There are no tests corresponding to the specified test name parameter: {self.test_name}")
 
-        if self.host_env is True:
-            self.socket_interface = PCSIMSocketInterface()
+        # A test run on a rig session (suite) reuses its connections instead of opening its own
+        self.session = _session
+        if self.session is not None:
+            if self.host_env is True:
+                self.socket_interface = self.session.socket_interface
+            self.GDTInterfaces = self.session.GDTInterfaces
+            self.SimEngineInterface = self.session.SimEngineInterface
+        else:
+            if self.host_env is True:
+                self.socket_interface = PCSIMSocketInterface()
 
-        self.GDTInterfaces = [GDTInterface(interface) for interface in Utilities.get_gdt_interface_connection()]
-        try:
-            self.SimEngineInterface = SimEngineInterface()
-        except SimEngineConnectionError as error:
-            raise TestError(self.test_name, error.message)
+            self.GDTInterfaces = [GDTInterface(interface) for interface in Utilities.get_gdt_interface_connection()]
+            try:
+                self.SimEngineInterface = SimEngineInterface()
+            except SimEngineConnectionError as error:
+                raise TestError(self.test_name, error.message)
 
         self.error_log_file = f'{self.test_path}/Error.txt'
         self.normal_log_file = f'{self.test_path}/Log.txt'
@@ -104,6 +123,8 @@ class TestClass(object):
         self.current_status = "N/A"
 
         self.manualRun = False
+        # Number of scenarios per result (PASSED, FAILED, No Auto Run)
+        self.scenario_results = dict()
 
         self.gdt_injections = [dict(), dict()]
         self.sim_injections = dict()
@@ -112,7 +133,14 @@ class TestClass(object):
         self.error_logger = None
 
         self.actions = dict()
+        # Tests called during the run, read and compiled once: {test name: (workbook, actions, compiled sheets)}
+        self.test_cache = dict()
         self.video_end_time = None
+        self.video_timelines = dict()
+        # End time of every finite SIM noise still running: {label: time.time()}
+        self.noise_end_times = dict()
+        self.video_compressor = None
+        self.last_injection_time = None
         self.instrumented = _instrumented
         self.instrumented_port = None
         if self.instrumented:
@@ -129,6 +157,30 @@ class TestClass(object):
     def sleep(milliseconds):
         QtTest.QTest.qWait(milliseconds)
 
+    def wait_until(self, read, is_met, timeout_ms):
+        """
+        Polls read() until is_met(value) or timeout_ms elapsed. The poll interval starts at POLL_MIN_TIME and doubles
+        up to POLL_MAX_TIME, so conditions that are already met return at once without hammering the rig.
+        :return: Last value read
+        """
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        poll_ms = POLL_MIN_TIME
+        while True:
+            value = read()
+            remaining_ms = (deadline - time.monotonic()) * 1000.0
+            if is_met(value) or remaining_ms <= 0:
+                return value
+            self.sleep(max(1, int(min(poll_ms, remaining_ms))))
+            poll_ms = min(poll_ms * 2, POLL_MAX_TIME)
+
+    def wait_for_settle(self, settle_ms=SLEEP_TIME):
+        """Waits until settle_ms elapsed since the last injection"""
+        if self.last_injection_time is None:
+            return
+        remaining_ms = settle_ms - (time.monotonic() - self.last_injection_time) * 1000.0
+        if remaining_ms > 0:
+            self.sleep(int(remaining_ms))
+
     def run_test(self):
         try:
             if self.called and self.menu is not None:
@@ -139,11 +191,20 @@ class TestClass(object):
             if self.SVNDownload:
                 if self.svn_interface.exists() is False:
                     raise TestError(self.test_name, "Could not find test folder in the SVN.")
+                # The results of the previous run of the test may still be uploading from its folder
+                if results_publisher().is_pending(self.test_path):
+                    self.consoleprint("Waiting for the results of the previous run to be uploaded..")
+                    while results_publisher().is_pending(self.test_path):
+                        self.sleep(500)
                 if os.path.exists(self.test_path):
                     self.consoleprint("Overriding test data..")
                     shutil.rmtree(self.test_path)
-                    self.sleep(1000)
-                self.svn_interface.export(self.test_path)
+                    self.wait_until(lambda: os.path.exists(self.test_path), lambda exists: not exists, 1000)
+                # Only fetched from the SVN when the test changed since the last download
+                if self.svn_interface.export_cached(self.test_path):
+                    self.consoleprint("Test data was downloaded from the SVN.")
+                else:
+                    self.consoleprint("Test data is unchanged in the SVN, using the local copy.")
 
             # Logging file
             if os.path.isfile(self.normal_log_file):
@@ -159,13 +220,23 @@ class TestClass(object):
             if os.path.isfile(self.video_compression_log_file):
                 os.remove(self.video_compression_log_file)
             self.video_compression_log = open(self.video_compression_log_file, 'a')
+            self.video_compressor = VideoCompressor(self.video_compression_log,
+                                                    Utilities.get_video_compression_preset())
 
-            # Open the excel
-            try:
-                self.wb = openpyxl.load_workbook(self.excel_file, data_only=True)  # Open with readonly
-            except FileNotFoundError:
-                raise TestError(self.test_name, "There is no excel file inside the test folder "
-                                               "or excel file does not match test folder name.")
+            # Results are journaled as they are written, called tests write to the journal of the caller
+            if not self.called:
+                self.result_journal = ResultJournal(self.result_journal_file, self.excel_file)
+
+            # Open the excel, a test called several times is only read and compiled the first time
+            cached_test = self.test_cache.get(self.test_name) if self.called else None
+            if cached_test is not None:
+                self.wb, self.actions, compiled_sheets = cached_test
+            else:
+                try:
+                    self.wb = openpyxl.load_workbook(self.excel_file, data_only=True)  # Open with readonly
+                except FileNotFoundError:
+                    raise TestError(self.test_name, "There is no excel file inside the test folder "
+                                                   "or excel file does not match test folder name.")
 
             sheetnames = self.wb.sheetnames
             self.ws = self.wb.active
@@ -179,11 +250,25 @@ class TestClass(object):
                     raise TestError(self.test_name, "Sheet 'Scenarios' was not found, please check your excel\n"
                                                    f"Sheet names: {sheetnames}")
 
+            if cached_test is None:
+                if "Actions" in sheetnames:
+                    self.consoleprint("\nSpecial Actions:")
+                    self.action_sheet(self.wb["Actions"])
+
+                # Compile every sheet before touching the rig, so syntax errors are reported up front
+                compiled_sheets = self.compile_sheets(sheetnames)
+                if self.called:
+                    self.test_cache[self.test_name] = (self.wb, self.actions, compiled_sheets)
+
+            # Both OFP connections are opened in parallel, while the result folders are prepared
+            gdt_ofps = sorted(set(ofp for compiled_sheet in compiled_sheets.values() for ofp in compiled_sheet.gdt_ofps))
+            gdt_connections = self.gdt_connect_async(gdt_ofps)
+
             # Remove Output folder
             if os.path.exists(self.output_path):
                 try:
                     shutil.rmtree(self.output_path)
-                    self.sleep(1500)
+                    self.wait_until(lambda: os.path.exists(self.output_path), lambda exists: not exists, 1500)
                 except PermissionError and OSError:
                     raise TestError(self.test_name, "Output folder is in use!\nPlease close any open files in it")
             os.mkdir(self.output_path)
@@ -193,7 +278,7 @@ class TestClass(object):
                 if os.path.exists(self.result_path):
                     try:
                         shutil.rmtree(self.result_path)
-                        self.sleep(1000)
+                        self.wait_until(lambda: os.path.exists(self.result_path), lambda exists: not exists, 1000)
                     except PermissionError and OSError:
                         raise TestError(self.test_name, "Results folder is in use!\nPlease close any open files in it")
                 os.mkdir(self.result_path)
@@ -204,9 +289,7 @@ class TestClass(object):
                     os.remove(self.excel_result_file)
                 except PermissionError:
                     raise TestError(self.test_name, "Results excel is in use!\nPlease close before trying to run.")
-                self.sleep(1000)
-
-            self.sleep(2000)
+                self.wait_until(lambda: os.path.isfile(self.excel_result_file), lambda exists: not exists, 1000)
 
             # If manual run and local run
             if self.SVNResults and self.menu is not None:
@@ -223,34 +306,15 @@ class TestClass(object):
             # ws = wb.active
             if self.called:
                 # If test is called copy worksheet to the caller's workbook
-                ws = self.ws
-                copy_ws = self.caller.wb[self.test_name]
-
-                for idx, cd in ws.column_dimensions.items():
-                    copy_ws.column_dimensions[idx].width = cd.width
-                for idx, rd in ws.row_dimensions.items():
-                    copy_ws.row_dimensions[idx].height = rd.height
-
-                for row in ws.rows:
-                    for cell in row:
-                        new_cell = copy_ws.cell(row=cell.row, column=cell.col_idx, value=cell.value)
-                        if cell.has_style:
-                            new_cell.font = copy(cell.font)
-                            new_cell.border = copy(cell.border)
-                            new_cell.fill = copy(cell.fill)
-                            new_cell.number_format = copy(cell.number_format)
-                            new_cell.protection = copy(cell.protection)
-                            new_cell.alignment = copy(cell.alignment)
-
-                self.caller.wb.save(self.caller.excel_result_file)
-
-            if "Actions" in sheetnames:
-                self.consoleprint("\nSpecial Actions:")
-                self.action_sheet(self.wb["Actions"])
+                ResultJournal.copy_sheet(self.ws, self.caller.wb[self.test_name])
+                self.results_journal().append("copy_sheet", source=os.path.abspath(self.excel_file),
+                                              source_sheet=self.ws.title, sheet=self.test_name)
+
+            self.gdt_connect_join(gdt_connections)
 
             if "Preconditions" in sheetnames:
                 self.consoleprint("\nPreconditions:")
-                self.run_sheet(self.wb["Preconditions"], True)
+                self.run_sheet(compiled_sheets["Preconditions"], True)
 
             self.consoleprint("\nTest Scenarios:")
             self.ws = self.wb.active
@@ -275,7 +339,7 @@ class TestClass(object):
                     if self.menu is not None:
                         self.menu.setWindowTitle(
                             f"{Utilities.get_current_version()} - Running Test: {self.test_name} - Sheet: {sheet}")
-                    self.run_sheet(self.ws, False, self.startfrom)
+                    self.run_sheet(compiled_sheets[sheet], False, self.startfrom)
 
         except KeyboardInterrupt:
             self.error_log("Test run cancelled by user.")
@@ -296,19 +360,25 @@ class TestClass(object):
     def test_end(self, passed):
         if self.instrumented_port is not None:
             if passed:
-                self.gdt_inject("ifSCAStartDataDownloadOFP", 1, "GDT")
+                self.gdt_inject(ScenarioCompiler.compile_gdt_injection("GDT", "ifSCAStartDataDownloadOFP", 1))
                 self.instrumented_port.wait()
             else:
                 self.consoleprint("Could not download instrumented history file due to test failure.")
 
         if self.menu is not None:
-            self.menu.setWindowTitle(Utilities.get_current_version())
-            self.menu.pauseButton.setEnabled(False)
-            # Re-enable menu buttons
-            self.menu.backButton.setEnabled(True)
+            self.menu.testEnded()
+
+        # Clear SIM & GDT Injections, a called test shares the injections of its caller which clears them at its end
+        if not self.called:
+            self.clear_injections()
 
-        # Clear SIM & GDT Injections
-        self.clear_injections()
+        # Wait for the background video compressions, the results are uploaded below
+        if self.video_compressor is not None:
+            if self.video_compressor.pending_count() > 0:
+                self.consoleprint("Waiting for video compression to end...")
+            for error in self.video_compressor.drain(self.sleep):
+                self.consoleprint(error, "#FF0000")
+                self.error_logger.log_error(error)
 
         # Remove Logging
         del self.normal_logger
@@ -319,31 +389,32 @@ class TestClass(object):
         if self.host_env:
             del self.socket_interface
 
-        # Print AutoTester version in the excel
-        self.ws.cell(row=self.ws.max_row + 2, column=1,
-                     value=f'Test was executed with {Utilities.get_current_version()}')
-
-        # Save results excel
+        # Print AutoTester version in the excel, the workbook of a called test is kept for its next call
         if not self.called:
-            self.wb.save(self.excel_result_file)
+            self.ws.cell(row=self.ws.max_row + 2, column=1,
+                         value=f'Test was executed with {Utilities.get_current_version()}')
+
+        # Save results excel, materialised from the journal
+        if not self.called and self.result_journal is not None:
+            self.result_journal.append("footer", sheet=self.ws.title,
+                                       value=f'Test was executed with {Utilities.get_current_version()}')
+            self.result_journal.close()
+            ResultJournal.materialise(self.result_journal_file, self.excel_result_file)
 
         # Test end
         if passed:
             # If upload results to SVN was checked, upload results
             if self.SVNResults and self.SVNDownload and self.called is False:
-                self.consoleprint("\nUploading results to svn..")
+                # Uploaded in one commit in the background, the tests folder is removed once the commit is confirmed
+                self.consoleprint("\nUploading results to svn in the background..")
                 date = time.strftime("%d_%m_%Y")
-                self.svn_interface.upload_file(f"{self.test_path}/Log.txt", f"{date}/Log.txt")
-                self.svn_interface.upload_file(f"{self.test_path}/Error.txt", f"{date}/Error.txt")
-                self.svn_interface.upload_file(f"{self.test_path}/Results", f"{date}/Results")
-                self.svn_interface.upload_file(f"{self.test_path}/Output", f"{date}/Output")
-                self.svn_interface.upload_file(f"{self.excel_result_file}", f"{date}/{self.test_name}_Result.xlsx")
-
-                # Remove tests folder
-                Utilities.remove_folder(self.test_path)
-
-                self.sleep(1500)
-                self.consoleprint("\n..Done")
+                results_publisher().submit(self.svn_interface, {
+                    "Log.txt": f"{self.test_path}/Log.txt",
+                    "Error.txt": f"{self.test_path}/Error.txt",
+                    "Results": f"{self.test_path}/Results",
+                    "Output": f"{self.test_path}/Output",
+                    f"{self.test_name}_Result.xlsx": self.excel_result_file
+                }, date, self.test_path, self.consoleprint)
 
             if self.menu is not None and self.called is False:
                 self.menu.popup(Utilities.get_current_version(), "Test run was done!", 1)
@@ -362,14 +433,15 @@ class TestClass(object):
                     self.SimEngineInterface.inject_value(label, 'N/A', '')
                 except SimEngineInjectionError:
                     pass
+            # Wait for the cleared labels to read back empty, at most the former fixed 1.2 seconds
+            self.wait_until(self.sim_injections_cleared, lambda cleared: cleared, 1200)
         self.sim_injections = dict()
 
-        self.sleep(1200)
-
         self.SimEngineInterface.unapply_values_on_exit()
         self.SimEngineInterface.unapply_values()
         self.SimEngineInterface.set_noise(False)
         self.consoleprint("SIM: Noise has been disabled.", "#3CB371")
+        self.noise_end_times = dict()
 
         if hasattr(self, 'GDTInterfaces'):
             for ofp, interface in enumerate(self.GDTInterfaces):
@@ -379,46 +451,50 @@ class TestClass(object):
                         # print(value[1], key, False)
                         self.GDTInterfaces[ofp].inject_data_item_override(value[1], key, False)
                     self.gdt_injections[ofp] = dict()
-                    self.consoleprint(f"GDT: {self.GDTInterfaces[ofp].connection} disconnected successfully.", "#3CB371")
-                    del self.GDTInterfaces[ofp]
+                    # The connections of a rig session stay open for the next test
+                    if self.session is None:
+                        self.consoleprint(f"GDT: {self.GDTInterfaces[ofp].connection} disconnected successfully.", "#3CB371")
+                        del self.GDTInterfaces[ofp]
 
         if self.instrumented_port is not None:
             self.instrumented_port.terminate()
 
     def action_sheet(self, ws):
-        for row in range(1, int(ws.max_row) + 1):
-            rows = ws.iter_rows(min_row=row, max_row=row)
-            first_row = next(rows)
-            line = [c.value for c in first_row]
-            for data in line:
-                if data is not None:
-                    try:
-                        shortcut, real_action = data.split('=')
-                        self.actions[shortcut.lower()] = real_action
-                        self.consoleprint(f"{shortcut} = {real_action}")
-                    except AttributeError and IndexError:
-                        pass
-        # self.consoleprint(self.actions)
+        self.actions = ScenarioCompiler.read_actions(ws)
+        for shortcut, real_action in self.actions.items():
+            self.consoleprint(f"{shortcut} = {real_action}")
 
-    def run_sheet(self, ws, preconditions=False, startfrom=0):
-        """Input: Sheet Object, and is it a precondition sheet or not"""
+    def compile_sheets(self, sheetnames):
+        """Compiles the preconditions and scenario sheets, raising a single error listing every syntax error"""
+        compiler = ScenarioCompiler(self.actions)
+        compiled_sheets = dict()
+        for sheet in sheetnames:
+            if sheet == "Preconditions" or "Scenarios" in sheet or len(sheetnames) == 1:
+                compiled_sheets[sheet] = compiler.compile_sheet(self.wb[sheet])
 
+        if len(compiler.errors) > 0:
+            raise TestError(self.test_name, "Invalid test scenarios:\n" + "\n".join(compiler.errors))
+
+        return compiled_sheets
+
+    def run_sheet(self, compiled_sheet, preconditions=False, startfrom=0):
+        """Input: Compiled sheet, and is it a precondition sheet or not"""
+
+        ws = compiled_sheet.ws
         self.ws = ws
-        hash_tag = self.find_hash_tag()
+        hash_tag = compiled_sheet.hash_tag
         if hash_tag == [0, 0]:
             self.consoleprint("Cannot find the symbol '#' to determinate where to read excel", "#FF0000")
             return None
         _startFromScenario = 0
         if startfrom != 0:
-            _startFromScenario = self.find_scenario(startfrom, hash_tag[1])
+            _startFromScenario = compiled_sheet.find_scenario(startfrom)
             if _startFromScenario == 0 and startfrom != 0:
                 self.consoleprint("Could not found the requested scenario, running from start.", "#FAFAFA")
-        # print("scenario_find in: row: %d, col: %d"%(_startFromScenario,hash_tag[1]))
         if _startFromScenario == 0:
             start = hash_tag[0]
         else:
             start = _startFromScenario - 2
-        scenario_col = hash_tag[1]
 
         # Create new columns
         if preconditions is False:
@@ -430,46 +506,30 @@ class TestClass(object):
             self.write_line(start, column + 2, "PR")
             self.write_line(start + 1, column + 2, "Empty")
 
-        # Get the first 3 rows
-        rows = ws.iter_rows(min_row=hash_tag[0] - 1, max_row=hash_tag[0] + 1)
-
-        # define first row as reference (GDT/SIM/ACTION/EXPECTED)
-        reference = [c.value for c in next(rows)]
-
-        # define second row as dataitem/labels
-        headings = [c.value for c in next(rows)]
-
-        # define third row as free text
-        free_text = [c.value for c in next(rows)]
-
         self.SimEngineInterface.set_noise(True)
         self.consoleprint("SIM: Noise has been enabled.", "#3CB371")
 
-        for x in reference:
-            if x is None:
-                continue
-            if x.upper() == "GDT":
-                self.gdt_connect(0)
-            if x.upper() == "GDT_PSP2":
-                self.gdt_connect(1)
+        self.gdt_connect_join(self.gdt_connect_async(compiled_sheet.gdt_ofps))
 
         # +(startfrom-1)
         if _startFromScenario != 0:
             self.scenario_id = 0 + (startfrom - 1)
         else:
             self.scenario_id = 0
-        new_line = False
         if self.menu is not None:
             self.steps = (ws.max_row + 1) - start - 2
             self.progressSteps = 0
-            self.menu.progressBar.setRange(0, self.steps)
+            self.menu.setProgressRange(0, self.steps)
             if preconditions:
                 self.update_current_test_status("PRECONDITION")
             else:
                 self.update_current_test_status("PASSED")
         try:
-            # Start running on the execl
-            for row, line in enumerate(ws.iter_rows(min_row=start+2, max_row=ws.max_row+1), start+2):
+            # Start running on the compiled rows
+            for compiled_row in compiled_sheet.rows:
+                row = compiled_row.row
+                if row < start + 2:
+                    continue
                 if self.called:
                     wsx = self.caller.wb[self.test_name]
                 else:
@@ -478,117 +538,119 @@ class TestClass(object):
                     self.write_line(row, wsx.max_column - 2, "Empty")  # PASS/FAIL
                     self.write_actual(row, wsx.max_column - 1, " ")  # ACTUAL
                     self.write_line(row, wsx.max_column, "Empty")  # PR
-                for column, cell in enumerate(line):
-                    value = cell.value
-                    if self.menu is not None:
-                        pause = self.menu.pauseButton.isChecked()
-                        while pause is False:
-                            pause = self.menu.pauseButton.isChecked()
-                            self.sleep(1000)
-                    reference_name = reference[column]
-                    if value == 'N\A':
-                        value = 'N/A'
-                    if value is not None and reference_name is not None and line[scenario_col - 1].value is not None:
-                        if value == 'N/A' and reference_name.upper() != 'EXPECTED':
-                            continue
-                        if preconditions is False:
-                            if new_line is False:
-                                self.scenario_id += 1
-                                new_line = True
-                                self.consoleprint("\nScenario: %d" % self.scenario_id, "#ff6f61")
-                                self.log_write("")
-                                self.log_write("\t" + "=" * 60)
-                                self.log_write("\tScenario %d:" % self.scenario_id)
-                                self.log_write("\t" + "=" * 60)
-                        # Handle column by referring to header data
-                        if re.findall("^GDT_STRUCT_PSP2|^GDT_STRUCT|^GDT_PSP2|^GDT|^SIM", reference_name.upper()):
-                            if re.findall("INJECT*", headings[column]):
-                                self.handle_inject(reference_name.upper(), value)
-                            else:
-                                if reference_name.upper() == "SIM":
-                                    self.sim_inject(headings[column], value)
-                                if reference_name.upper() == "GDT" or reference_name.upper() == "GDT_PSP2":
-                                    self.gdt_inject(headings[column], value, reference_name.upper())
-                        if reference_name.upper() == "ACTION":
-                            if re.findall("^VIDEO|^BVIDEO", value.upper()):
-                                self.write_actual(row, wsx.max_column - 1, "Video")
-
-                            if re.findall("^CALL_TEST", value.upper()):
-                                self.handle_action(value, row, wsx.max_column)
+                self.wait_while_paused()
+
+                new_line = compiled_row.is_scenario and preconditions is False
+                if new_line:
+                    self.scenario_id += 1
+                    self.consoleprint("\nScenario: %d" % self.scenario_id, "#ff6f61")
+                    self.log_write("")
+                    self.log_write("\t" + "=" * 60)
+                    self.log_write("\tScenario %d:" % self.scenario_id)
+                    self.log_write("\t" + "=" * 60)
+
+                # SIM values and GDT injections of the row are sent in one batch (per OFP for GDT), before the next
+                # action or expected step
+                pending_sim_injections = list()
+                pending_gdt_injections = [list(), list()]
+                for step in compiled_row.steps:
+                    self.wait_while_paused()
+                    if step.step_type != Step.StepType.INJECT:
+                        self.sim_inject_pending(pending_sim_injections)
+                        self.gdt_inject_pending(pending_gdt_injections)
+
+                    if step.step_type == Step.StepType.INJECT:
+                        if isinstance(step, SimInjection):
+                            if step.noise_type is None:
+                                pending_sim_injections.append(step)
                             else:
-                                self.handle_action(value)
-
-                        if reference_name.upper() == "EXPECTED":
-                            # Wait for background video to end before running expected column
-                            if self.video_end_time is not None:
-                                self.consoleprint("Waiting for video to end...")
-                                while time.time() < self.video_end_time:
-                                    self.sleep(1000)
-                                self.consoleprint("...Done")
-                                self.video_end_time = None
-
-                                uncompressed_video_path = f'{self.result_path}/{self.currentsheet}/' \
-                                                          f'Scenario_{self.scenario_id}.avi'
-                                compressed_video_path = uncompressed_video_path.replace(".avi", ".mp4")
-                                self.compress_video(uncompressed_video_path, compressed_video_path)
-                            # Expected method
-                            try:
-                                if (' ' in value) or ('\n' in value) or ('\t' in value):
-                                    raise TestError(self.test_name,
-                                                    f'Expected commands shall not have whitespaces, new lines or tabulations: {value}')
-
-                                # Split expected data by ',' to handle multiple data
-                                expected_data = re.split(r',\s*(?![^()]*\))', str(value))
-                                pass_fail = "PASSED"
-                                result_string = ""
-                                results_string_failed = ''
-                                results_string_passed = ''
-                                for i in expected_data:
-                                    result = self.handle_expected(i)
-                                    result_string += result[1]
-                                    if result[0] == "FAILED":
-                                        pass_fail = "FAILED"
-                                        if len(result) > 3:
-                                            if result[3] is not '':
-                                                results_string_failed += result[3]
-                                    if result[0] == "PASSED":
-                                        if len(result) > 2:
-                                            if result[2] is not '':
-                                                results_string_passed += result[2]
-
-                                result = [pass_fail, result_string, results_string_passed, results_string_failed]
-                                if result is not None:
-                                    if self.menu is not None and self.manualRun is False:
-                                        self.menu.updateScenario(result[0], self.scenario_id, self.called)
-                                        if result[0] == "FAILED":
-                                            self.update_current_test_status("FAILED")
-
-                                    self.write_line(row, wsx.max_column - 2, result[0])
-                                    if result[0] != "No Auto Run":
-                                        if self.manualRun is False:
-                                            self.write_actual(row, wsx.max_column - 1, result[1])
-                                        else:
-                                            self.write_actual(row, wsx.max_column - 1, "x")
+                                # Noises start after the values before them
+                                self.sim_inject_pending(pending_sim_injections)
+                                self.sim_inject(step)
+                        else:
+                            pending_gdt_injections[step.ofp].append(step)
+
+                    if step.step_type == Step.StepType.ACTION:
+                        if step.name == "VIDEO" or step.name == "BVIDEO":
+                            self.write_actual(row, wsx.max_column - 1, "Video")
+                        self.handle_action(step)
+
+                    if step.step_type == Step.StepType.CALL_TEST:
+                        self.handle_action(step, row, wsx.max_column)
+
+                    if step.step_type == Step.StepType.EXPECTED:
+                        self.wait_for_noises()
+                        # Wait for background video to end before running expected column
+                        if self.video_end_time is not None:
+                            self.consoleprint("Waiting for video to end...")
+                            while time.time() < self.video_end_time:
+                                self.sleep(1000)
+                            self.consoleprint("...Done")
+                            self.video_end_time = None
+
+                            uncompressed_video_path = f'{self.result_path}/{self.currentsheet}/' \
+                                                      f'Scenario_{self.scenario_id}.avi'
+                            compressed_video_path = uncompressed_video_path.replace(".avi", ".mp4")
+                            self.compress_video(uncompressed_video_path, compressed_video_path)
+                        # Expected method
+                        try:
+                            pass_fail = "PASSED"
+                            result_string = ""
+                            results_string_failed = ''
+                            results_string_passed = ''
+                            # GDT values of both OFPs are read concurrently, each check joins its own reading
+                            gdt_readings = self.gdt_read_checks_async(step.checks)
+                            for check in step.checks:
+                                result = self.handle_expected(check, gdt_readings.get(id(check)))
+                                result_string += result[1]
+                                if result[0] == "FAILED":
+                                    pass_fail = "FAILED"
+                                    if len(result) > 3:
+                                        if result[3] != '':
+                                            results_string_failed += result[3]
+                                if result[0] == "PASSED":
+                                    if len(result) > 2:
+                                        if result[2] != '':
+                                            results_string_passed += result[2]
+
+                            result = [pass_fail, result_string, results_string_passed, results_string_failed]
+                            if preconditions is False:
+                                self.scenario_results[pass_fail] = self.scenario_results.get(pass_fail, 0) + 1
+                            if result is not None:
+                                if self.menu is not None and self.manualRun is False:
+                                    self.menu.updateScenario(result[0], self.scenario_id, self.called)
                                     if result[0] == "FAILED":
-                                        color = "#FF0000"
-                                    elif result[0] == "PASSED":
-                                        color = "#90EE90"
-                                    else:
-                                        color = "#D3D3D3"
+                                        self.update_current_test_status("FAILED")
 
-                                    self.log_write('')
-                                    self.log_write(f'\tScenario result: {result[0]}.')
-                                    # self.consoleprint("Scenario Result: %s\n%s" % (result[0], result[1]), color)
+                                self.write_line(row, wsx.max_column - 2, result[0])
+                                if result[0] != "No Auto Run":
+                                    if self.manualRun is False:
+                                        self.write_actual(row, wsx.max_column - 1, result[1])
+                                    else:
+                                        self.write_actual(row, wsx.max_column - 1, "x")
+                                if result[0] == "FAILED":
+                                    color = "#FF0000"
+                                elif result[0] == "PASSED":
+                                    color = "#90EE90"
+                                else:
+                                    color = "#D3D3D3"
+
+                                self.log_write('')
+                                self.log_write(f'\tScenario result: {result[0]}.')
+                                # self.consoleprint("Scenario Result: %s\n%s" % (result[0], result[1]), color)
+
+                                self.consoleprint("Scenario Result: %s" % result[0], color)
+                                if len(result) > 2:
+                                    if result[2] != '':
+                                        self.consoleprint("PASSED VALUES: %s" % result[2], "#90EE90")
+                                if len(result) > 3:
+                                    if result[3] != '':
+                                        self.consoleprint("FAILED VALUES: %s" % result[3], "#FF0000")
+                        except IndexError:
+                            raise StopIteration
+                self.sim_inject_pending(pending_sim_injections)
+                self.gdt_inject_pending(pending_gdt_injections)
 
-                                    self.consoleprint("Scenario Result: %s" % result[0], color)
-                                    if len(result) > 2:
-                                        if result[2] is not '':
-                                            self.consoleprint("PASSED VALUES: %s" % result[2], "#90EE90")
-                                    if len(result) > 3:
-                                        if result[3] is not '':
-                                            self.consoleprint("FAILED VALUES: %s" % result[3], "#FF0000")
-                            except IndexError:
-                                raise StopIteration
                 # Wait for background video to end before running next scenario
                 if self.video_end_time is not None:
                     self.consoleprint("Waiting for video to end...")
@@ -603,8 +665,8 @@ class TestClass(object):
                 if self.manualRun and self.scenario_id != 0 and new_line is True:
                     title = "Scenario %d" % self.scenario_id
                     col = 0
-                    reference_name = reference[column]
-                    for label in headings:
+                    reference_name = compiled_sheet.reference[-1]
+                    for label in compiled_sheet.headings:
                         col += 1
                         # run over table headers to find the expected results free text
                         if re.findall("^expected ", label.lower()) and reference_name is None:
@@ -630,245 +692,238 @@ class TestClass(object):
                         self.menu.updateScenario("FAILED", self.scenario_id)
                         self.update_current_test_status("FAILED")
 
-                new_line = False
                 if self.menu is not None:
                     self.progressSteps += 1
                     self.advance_progress_bar()
         except StopIteration:
             pass
 
-    def find_hash_tag(self):
-        ws = self.ws
-        for row in range(1, ws.max_row):
-            for col in range(1, ws.max_column):
-                if openpyxl.__version__ <= "2.5.0-a3":
-                    if '#' in str(ws.cell(None, row, col).value):
-                        return [row, col]
-                else:
-                    if '#' in str(ws.cell(row, col).value):
-                        return [row, col]
-        return [0, 0]
-
-    def find_scenario(self, scenario, column):
-        ws = self.ws
-        for row in range(1, ws.max_row):
-            if openpyxl.__version__ <= "2.5.0-a3":
-                if str(scenario) == str(ws.cell(None, row, column).value):
-                    return row
-            else:
-                if str(scenario) == str(ws.cell(row, column).value):
-                    return row
-        return 0
+    def wait_while_paused(self):
+        """Blocks while the test is paused from the menu, raises KeyboardInterrupt when it was stopped"""
+        if self.menu is not None:
+            self.menu.waitWhilePaused()
 
     def advance_progress_bar(self):
-        self.menu.progressBar.setValue(self.progressSteps + (self.steps - self.progressSteps) / 100)
+        self.menu.setProgress(self.progressSteps + (self.steps - self.progressSteps) / 100)
 
-    def sim_inject(self, label, value):
-        """Injection to SIM label and value
+    def sim_inject(self, injection):
+        """Injection of a compiled SIM label and value
         """
-        try:
-            unit_regex = re.search("(.*)(\[.*\])$", label)
+        label = injection.label
+        unit = injection.unit
+        value = injection.value
+        x = injection.noise_args
+
+        if injection.noise_type == "steps":
+            self.consoleprint(f"SimSTU.NoiseSteps({label},{unit},{x[0]},{x[1]},{x[2]},{x[3]},0,1)")
+
             try:
-                label = unit_regex.group(1)
-                unit = unit_regex.group(2)
-            except AttributeError:
-                unit = "N/A"
-
-            if type(value) == str:
-                if value.lower() in self.actions:
-                    value = self.actions[value.lower()]
-
-            if re.findall("^noise_", str(value).lower()):
-                noise_regex = re.search("^(?i)(noise_)(.*)\((.*)\)$", str(value))  # Split the string
-                if noise_regex is None:
-                    raise TestError(self.test_name, f"Cannot read {value}\nMake sure to follow the format!")
-
-                noise_type = noise_regex.group(2).lower()  # Noise type
-                new_value = noise_regex.group(3)  # Noise value
-                x = new_value.split(',')  # Split values by ','
-                if noise_type == "steps":
-                    self.consoleprint(f"SimSTU.NoiseSteps({label},{unit},{x[0]},{x[1]},{x[2]},{x[3]},0,1)")
+                self.SimEngineInterface.inject_noise_steps(label, unit, x[0], x[1], x[2], x[3])
 
-                    try:
-                        self.SimEngineInterface.inject_noise_steps(label, unit, x[0], x[1], x[2], x[3])
+            except SimEngineInjectionError as error:
+                self.consoleprint(error.message, "red")
+                # raise TestError(self.testname, error.message)
 
-                    except SimEngineInjectionError as error:
-                        self.consoleprint(error.message, "red")
-                        # raise TestError(self.testname, error.message)
+        elif injection.noise_type == "sine":
+            self.consoleprint(f"SimSTU.NoiseSine({label},{unit},{x[0]},{x[1]},{x[2]},0,1)")
 
-                if noise_type == "sine":
-                    self.consoleprint(f"SimSTU.NoiseSine({label},{unit},{x[0]},{x[1]},{x[2]},0,1)")
+            try:
+                self.SimEngineInterface.inject_noise_sine(label, unit, x[0], x[1], x[2])
 
-                    try:
-                        self.SimEngineInterface.inject_noise_sine(label, unit, x[0], x[1], x[2])
+            except SimEngineInjectionError as error:
+                self.consoleprint(error.message, "red")
+                # raise TestError(self.testname, error.message)
 
-                    except SimEngineInjectionError as error:
-                        self.consoleprint(error.message, "red")
-                        # raise TestError(self.testname, error.message)
+        elif injection.noise_type == "constant":
+            self.consoleprint(f"SimSTU.NoiseConstant({label},{unit},{x[0]},{x[1]},1)")
 
-                if noise_type == "constant":
-                    self.consoleprint(f"SimSTU.NoiseConstant({label},{unit},{x[0]},{x[1]},1)")
+            try:
+                self.noise_end_times[label] = self.SimEngineInterface.inject_noise_constant(label, unit, x[0], x[1], 1)
 
-                    try:
-                        self.SimEngineInterface.inject_noise_constant(label, unit, x[0], int(x[1]), 1)
+            except SimEngineInjectionError as error:
+                self.consoleprint(error.message, "red")
+                # raise TestError(self.testname, error.message)
 
-                    except SimEngineInjectionError as error:
-                        self.consoleprint(error.message, "red")
-                        # raise TestError(self.testname, error.message)
+        elif injection.noise_type == "pulse":
+            self.consoleprint(f"SimSTU.NoisePulse({label},{unit},{x[0]},{x[1]},{x[2]},{x[3]},{x[4]})")
 
-                if noise_type == "pulse":
-                    self.consoleprint(f"SimSTU.NoisePulse({label},{unit},{x[0]},{x[1]},{x[2]},{x[3]},{x[4]})")
-                    inject_value1 = x[0]
-                    delay_time1 = int(x[1])
-                    inject_value2 = x[2]
-                    delay_time2 = int(x[3])
-                    repeat_count = int(x[4])
+            try:
+                self.noise_end_times[label] = self.SimEngineInterface.inject_noise_pulse(label, unit, x[0], x[1], x[2], x[3], x[4])
 
-                    try:
-                        self.SimEngineInterface.inject_noise_pulse(label, unit, inject_value1, delay_time1,
-                                                                   inject_value2, delay_time2, repeat_count)
+            except SimEngineInjectionError as error:
+                self.consoleprint(error.message, "red")
+                # raise TestError(self.testname, error.message)
 
-                    except SimEngineInjectionError as error:
-                        self.consoleprint(error.message, "red")
-                        # raise TestError(self.testname, error.message)
+        elif injection.noise_type == "manhattan":
+            self.consoleprint(f"SimSTU.NoiseManhattan({label},{unit},{x[0]},{x[1]})")
+            try:
+                self.noise_end_times[label] = self.SimEngineInterface.inject_noise_manhattan(label, unit, x[0], x[1])
 
-                if noise_type == "manhattan":
-                    repeat_count = int(x[x.__len__()-1])  # Repeat count shall be the last number
-                    values = new_value[0:new_value.rindex(',')]  # Remove repeat count
-                    self.consoleprint(f"SimSTU.NoiseManhattan({label},{unit},{values},{repeat_count})")
-                    try:
-                        self.SimEngineInterface.inject_noise_manhattan(label, unit, values, repeat_count)
+            except SimEngineInjectionError as error:
+                self.consoleprint(error.message, "red")
+                # raise TestError(self.testname, error.message)
+        else:
+            self.consoleprint("SIM: %s = %s" % (label, value))
+            try:
+                self.SimEngineInterface.inject_value(label, unit, value)
+            except SimEngineInjectionError as error:
+                self.consoleprint(error.message, "red")
+                # raise TestError(self.testname, error.message)
 
-                    except SimEngineInjectionError as error:
-                        self.consoleprint(error.message, "red")
-                        # raise TestError(self.testname, error.message)
-            else:
-                if type(value) == str:
-                    if value.lower() == "true":
-                        value = "True"
-                    if value.lower() == "false":
-                        value = "False"
-                self.consoleprint("SIM: %s = %s" % (label, value))
-                try:
-                    self.SimEngineInterface.inject_value(label, unit, value)
-                except SimEngineInjectionError as error:
-                    self.consoleprint(error.message, "red")
-                    # raise TestError(self.testname, error.message)
+        self.sim_injections[label] = value
+        self.last_injection_time = time.monotonic()
 
-            self.sim_injections[label] = value
+    def sim_inject_pending(self, pending_injections):
+        """Injects the collected SIM values in a single batch
+        """
+        if len(pending_injections) == 0:
+            return
+
+        for injection in pending_injections:
+            self.consoleprint("SIM: %s = %s" % (injection.label, injection.value))
+        failures = self.SimEngineInterface.apply_batch([(injection.label, injection.unit, injection.value)
+                                                        for injection in pending_injections])
+        for label, message in failures:
+            self.consoleprint(message, "red")
+
+        for injection in pending_injections:
+            self.sim_injections[injection.label] = injection.value
+        self.last_injection_time = time.monotonic()
+        pending_injections.clear()
+
+    def wait_for_noises(self):
+        """Waits until the SIM noises still running have ended, noises run alongside the other steps of the row"""
+        now = time.time()
+        self.noise_end_times = {label: end_time for label, end_time in self.noise_end_times.items() if end_time > now}
+        if len(self.noise_end_times) > 0:
+            self.consoleprint(f"Waiting for noise to end ({', '.join(self.noise_end_times)})...")
+            self.sleep(int((max(self.noise_end_times.values()) - now) * 1000))
+            self.consoleprint("...Done")
+            self.noise_end_times = dict()
+
+    def sim_injections_cleared(self) -> bool:
+        for label in self.sim_injections:
+            try:
+                if self.SimEngineInterface.get_element_value(label, 'N/A') != '':
+                    return False
+            except SimEngineInjectionError:
+                return False
+        return True
+
+    def gdt_inject(self, injection):
+        """Injection of a compiled GDT dataitem and value
+        """
+        self.gdt_inject_many(injection.ofp, [injection])
 
-        except IndexError:
-            raise TestError(self.test_name, "Incorrect usage of noise!!")
+    def gdt_inject_pending(self, pending_injections):
+        """Injects the GDT injections collected per OFP, one batch per OFP, the batches of both OFPs concurrently
+        """
+        batches = [(ofp, injections, self.gdt_inject_async(ofp, injections))
+                   for ofp, injections in enumerate(pending_injections) if len(injections) > 0]
+        for ofp, injections, batch in batches:
+            self.gdt_inject_join(ofp, injections, batch)
+            injections.clear()
+
+    def gdt_inject_many(self, ofp, injections):
+        """Injection of compiled GDT dataitems and values of one OFP in a single batch
+        """
+        self.gdt_inject_join(ofp, injections, self.gdt_inject_async(ofp, injections))
 
-    def gdt_inject(self, dataitem, value, header):
-        """Injection to GDT dataitem and value
+    def gdt_inject_async(self, ofp, injections):
+        """Starts injecting a batch of one OFP on its GDT worker
+        :return: Future of the write_many results, to pass to gdt_inject_join
         """
         try:
-            ofp = 0
-            if header == "GDT_PSP2":
-                ofp = 1
             self.gdt_connect(ofp)
+            gdt_interface = self.GDTInterfaces[ofp]
+        except IndexError:
+            raise TestError(self.test_name, "Invalid value!")
+
+        def write_batch():
+            writes = list()
+            for injection in injections:
+                if injection.method != "visor":
+                    writes.append((injection.method, injection.data_item_name, injection.value))
+                    continue
 
-            injected = False
-            if dataitem.lower() == "visor" and str(value).lower() == "true":
                 # Shortcut word for VISOR_COEFFICIENTS injection to straighten the screen (Useful for symbology tests)
                 af32PilotPoly3 = [[0.0] * 10, [0.0] * 10]
                 af32PilotPoly3[0][4] = 1.0
                 af32PilotPoly3[1][1] = 1.0
-                for row in range(0, len(af32PilotPoly3)):
-                    for col in range(0, len(af32PilotPoly3[0])):
-                        injected = self.GDTInterfaces[ofp].inject_struct(
-                            "VISOR_COEFFICIENTS", f"af32PilotPoly3[{row},{col}]", af32PilotPoly3[row][col])
-                self.consoleprint(f"GDT_PSP{ofp+1}: VISOR_COEFFICIENTS = STRAIGHT")
-                return injected
+                gdt_interface.write_struct_fields("VISOR_COEFFICIENTS", [
+                    (f"af32PilotPoly3[{row},{col}]", af32PilotPoly3[row][col])
+                    for row in range(0, len(af32PilotPoly3)) for col in range(0, len(af32PilotPoly3[0]))])
 
-            # Inject data item
-            if ".validity" in dataitem.lower():
-                try:
-                    value = Utilities.validity_or_number_to_bool(value)
-                except ParameterError:
-                    raise TestError(self.test_name, f"{dataitem}: \"{value}\" cannot be used for validity injection! value has to be Valid or Invalid.")
-
-                dataitem_name = dataitem[:dataitem.index('.')]  # Remove .Validity from dataitem string
-                method = "validity"
-            elif ".override" in dataitem.lower():
-                dataitem_name = dataitem[:dataitem.index('.')]  # Remove .override from dataitem string
-                method = "override"
-            else:
-                dataitem_name = dataitem
-                method = "value"
+            # The buffer type of each data item comes from the type registry, types are only probed the first time
+            return gdt_interface.write_many(writes)
 
-            for ItemType in self.GDTInterfaces[ofp].GDTInterfaceDataType:
-                try:
-                    if method == "validity":
-                        is_injected = self.GDTInterfaces[ofp].inject_data_item_validity(ItemType, dataitem_name, value)
-                    elif method == "override":
-                        is_injected = self.GDTInterfaces[ofp].inject_data_item_override(ItemType, dataitem_name, value)
-                    else:
-                        is_injected = self.GDTInterfaces[ofp].inject_data_item(ItemType, dataitem, value)
-                    if is_injected:
-                        self.consoleprint(f"GDT_PSP{ofp+1}: %s = %s" % (dataitem, value))
-                        self.gdt_injections[ofp][dataitem_name] = value, ItemType
-                        injected = True
-                        break
-                except:
-                    pass
+        return gdt_interface.submit(write_batch)
 
-            if not injected:
-                raise TestError(self.test_name,
-                                f'GDT error: Failed to inject value {value} into data item {dataitem}. Please check if the value or dataitem is valid.')
+    def gdt_inject_join(self, ofp, injections, batch):
+        """Waits for a batch started by gdt_inject_async and reports its injections"""
+        try:
+            results = batch.result()
+            if any(injection.method == "visor" for injection in injections):
+                self.consoleprint(f"GDT_PSP{ofp+1}: VISOR_COEFFICIENTS = STRAIGHT")
+
+            writes = [injection for injection in injections if injection.method != "visor"]
+            for injection, (ItemType, is_injected) in zip(writes, results):
+                if not is_injected:
+                    raise TestError(self.test_name,
+                                    f'GDT error: Failed to inject value {injection.value} into data item {injection.data_item}. Please check if the value or dataitem is valid.')
+                self.consoleprint(f"GDT_PSP{ofp+1}: %s = %s" % (injection.data_item, injection.value))
+                self.gdt_injections[ofp][injection.data_item_name] = injection.value, ItemType
 
-            self.sleep(SLEEP_TIME)
+            # Reads wait for SLEEP_TIME after the last injection (wait_for_settle) instead of sleeping here
+            self.last_injection_time = time.monotonic()
         except IndexError:
             raise TestError(self.test_name, "Invalid value!")
 
-    def handle_action(self, *value):
-        """Input: label/dataitem and value
-        Returns array [PASS/FAIL, Actual]
+    def handle_action(self, action, row=None, column=None):
+        """Input: compiled action, and the result row/column for CALL_TEST
         """
-        function_name = value[0]
         step_counter = self.scenario_id
-        if re.findall("^SLEEP|^DELAY", function_name.upper()):
-            try:
-                new_value = float(function_name[function_name.index('(') + 1:function_name.rindex(')')])
-            except ValueError:
-                raise TestError(self.test_name, "Wrong usage of delay, try delay(seconds)")
-            self.consoleprint("delay (%d)" % new_value)
-            self.sleep(new_value * 1000)
-        if re.findall("^MSG", function_name.upper()):
-            try:
-                text = function_name[function_name.index('(') + 1:function_name.rindex(')')]
-            except ValueError:
-                text = ""
+        if action.name == "SLEEP":
+            self.consoleprint("delay (%d)" % action.argument)
+            self.sleep(action.argument * 1000)
+        if action.name == "MSG":
+            text = action.argument
             if self.executed is False:
                 self.menu.popup(Utilities.get_current_version(), text + "\n\nPress OK to continue test run", 1)
             else:
                 if self.ci is False:
                     input("\n\n" + text + "\n\nPress OK to continue test run")
-        if re.findall("^CALL_TEST", function_name.upper()):
-            try:
-                test = function_name[function_name.index('(') + 1:function_name.rindex(')')]
-            except ValueError:
-                test = ""
+        if action.name == "CALL_TEST":
+            test = action.argument
             self.consoleprint("Calling test: %s" % test)
             self.consoleprint("=" * 50)
-            self.wb.create_sheet(test)
-            call_test = TestClass(test, False, False, self.executed, True, self.menu, self.ci, False, True)
+            if test not in self.wb.sheetnames:
+                self.wb.create_sheet(test)
+                self.results_journal().append("create_sheet", sheet=test)
+            # The called test runs on the connections and injections of the caller
+            session = self.session if self.session is not None else RigSession(self.host_env, self)
+            call_test = TestClass(test, False, False, self.executed, self.host_env, self.menu, self.ci, False, True,
+                                  session)
             call_test.caller = self
+            call_test.gdt_injections = self.gdt_injections
+            call_test.sim_injections = self.sim_injections
+            call_test.noise_end_times = self.noise_end_times
+            call_test.test_cache = self.test_cache
+            call_test.last_injection_time = self.last_injection_time
 
             call_test.run_test()
+            self.last_injection_time = call_test.last_injection_time
 
             # Write call_test status
-            row = value[1]
-            column = value[2]
             status = self.current_status
             self.write_line(row, column-2, status)
             self.write_actual(row, column-1, f"TEST_CALL:{test}")
             # reset vars after calltest was done
             if self.executed is False:
-                self.menu.progressBar.setRange(0, self.steps)
-        if re.findall("^SCREENSHOT", function_name.upper()):
-            self.sleep(1000)
+                self.menu.setProgressRange(0, self.steps)
+        if action.name == "SCREENSHOT":
+            # Let the display render the last injection
+            self.wait_for_settle(SCREENSHOT_SETTLE_TIME)
             screenshot_path = f'{self.result_path}/{self.currentsheet}/Scenario_{step_counter}.png'
             cmd = f'\"{screenshot_path}\"'
             if simulation:
@@ -886,20 +941,15 @@ class TestClass(object):
                     else:
                         self.error_log('Failed saving screenshot. Unknown error.')
                 else:
-                    subprocess.Popen("v2u %s" % cmd, shell=True)
+                    v2u_process = subprocess.Popen("v2u %s" % cmd, shell=True)
+                    # Wait for v2u to save the screenshot, at most the former fixed second
+                    self.wait_until(v2u_process.poll, lambda return_code: return_code is not None, 1000)
 
-            self.sleep(1000)
             self.consoleprint("Success taking img -  %s" % cmd)
 
-        if re.findall("^VIDEO", function_name.upper()) or re.findall("^BVIDEO", function_name.upper()):
-            try:
-                calc_time = float(function_name[function_name.index('(') + 1:function_name.rindex(')')])
-            except ValueError:
-                raise TestError(self.test_name, "Wrong usage of video, try video(seconds)")
-
-            background_video = False
-            if re.findall("^BVIDEO", function_name.upper()):
-                background_video = True
+        if action.name == "VIDEO" or action.name == "BVIDEO":
+            calc_time = action.argument
+            background_video = action.name == "BVIDEO"
 
             self.log_write("")
             self.log_write("\tTest Category: Video")
@@ -909,7 +959,6 @@ class TestClass(object):
             if self.host_env:
                 self.consoleprint("Ignoring video recording (host environment).")
                 self.log_write("\t\tIgnored video recording (host environment).")
-                calc_time = float(function_name[function_name.index('(') + 1:function_name.rindex(')')])
                 self.sleep(calc_time * 1000)
             else:
                 calc_time_millisec = int(1000.0 * calc_time)
@@ -931,145 +980,203 @@ class TestClass(object):
 
                 self.log_write(f'\t\tRecorded {str(calc_time)} seconds of video to file: {compressed_video_path}.')
 
-        if re.findall("^GDT_DISCONNECT", function_name.upper()):
+        if action.name == "WAIT":
+            condition = action.argument
+            self.consoleprint(f"wait ({action.raw})")
+            self.wait_for_settle()
+            if condition.source == "GDT":
+                self.gdt_connect(condition.ofp)
+            is_met = self.wait_until(lambda: self.wait_condition_met(condition), lambda met: met,
+                                     condition.timeout * 1000)
+            if not is_met:
+                self.error_log(f'{action.raw}: condition was not met within {condition.timeout} seconds.')
+
+        if action.name == "GDT_DISCONNECT":
             for gdt_connection in self.GDTInterfaces:
                 gdt_connection.disconnect()
                 self.consoleprint(f"GDT: {gdt_connection.connection} Disconnected successfully.", "#3CB371")
 
-    def handle_inject(self, *value):
-        inject_type = value[0].upper()
-        values = value[1]
-        if inject_type == "GDT" or inject_type == "GDT_PSP2":
-            dataitems = values.split(':')  # Split dataitems by ':'
-            for data in dataitems:
-                dataitem, inject_value = data.split('=')  # Split dataitem and value [dataitem,value]
-                self.gdt_inject(dataitem, inject_value, inject_type)
-
-        if inject_type == "SIM":
-            sim_labels = values.split(':')  # Split labels by ':'
-            for data in sim_labels:
-                label, inject_value = data.split('=')  # Split label and value [label,value]
-                self.sim_inject(label, inject_value)
-
-    def handle_expected(self, *value):
-        """Input: label/dataitem and value
-        Returns array [PASS/FAIL, Actual]
-        """
-        function_name = value[0]
-        step_counter = self.scenario_id
+    def wait_condition_met(self, condition) -> bool:
+        if condition.source == "GDT":
+            items = [(name, operator_sign, expected_value) for name, unit, operator_sign, expected_value in condition.items]
+            return all(result[0] for result in self.compare_gdt_items(condition.ofp, "GDT", items))
 
-        frame_compare_regex = re.search('^(!?)FRAMECOMPARE', function_name.upper())
-        if frame_compare_regex is not None:
-            if frame_compare_regex.group(1) != '':
-                is_absence = True
-                is_absence_message = 'checking for absence'
+        for name, unit, operator_sign, expected_value in condition.items:
+            try:
+                sim_value = self.SimEngineInterface.get_element_value(name, unit)
+            except SimEngineInjectionError:
+                return False
+            if operator_sign == '=' or operator_sign == '!=':
+                # String comparison, as for SIM expected values
+                if gdt_operators[operator_sign](sim_value, expected_value) is False:
+                    return False
+            else:
+                try:
+                    if gdt_operators[operator_sign](float(sim_value), float(expected_value)) is False:
+                        return False
+                except (TypeError, ValueError):
+                    return False
+        return True
 
+    def read_gdt_items(self, ofp, method, dataitems, struct_name=None, max_age=0.0) -> list:
+        """
+        :param max_age: Seconds a previous snapshot of the struct may be reused (GDT_STRUCT only)
+        :return: Current value and buffer type of every GDT expected item, data items are read in one batch and
+        struct fields from one snapshot of the struct
+        """
+        return self.read_gdt_items_async(ofp, method, dataitems, struct_name, max_age).result()
+
+    def read_gdt_items_async(self, ofp, method, dataitems, struct_name=None, max_age=0.0):
+        """:return: Future of read_gdt_items, read on the GDT worker of the OFP"""
+        gdt_interface = self.GDTInterfaces[ofp]
+        if method == "GDT_STRUCT":
+            def read_struct():
+                fields = gdt_interface.read_struct_fields(struct_name, dataitems, max_age)
+                return [(fields[dataitem], None) for dataitem in dataitems]
+            return gdt_interface.submit(read_struct)
+
+        reads = list()
+        for dataitem in dataitems:
+            if ".validity" in dataitem.lower():
+                reads.append((dataitem[:dataitem.index('.')], "validity"))  # Remove .Validity from dataitem string
             else:
-                is_absence = False
-                is_absence_message = 'checking for presence'
+                reads.append((dataitem, "value"))
+        return gdt_interface.submit(
+            lambda: [(gdt_value, buffer) for buffer, gdt_value in gdt_interface.read_many(reads)])
 
+    def gdt_read_checks_async(self, checks) -> dict:
+        """
+        Starts the first reading of every GDT check of an expected step, the OFPs are read concurrently
+        :return: {id(check): future of the readings} to pass to handle_expected
+        """
+        gdt_checks = [check for check in checks if isinstance(check, GDTCheck)]
+        if len(gdt_checks) == 0:
+            return dict()
+
+        self.gdt_connect_join(self.gdt_connect_async(sorted(set(check.ofp for check in gdt_checks))))
+        # The first read may reuse a recent struct snapshot taken after the last injection (e.g. by the previous
+        # expectation in the row)
+        self.wait_for_settle()
+        max_age = STRUCT_CACHE_TTL
+        if self.last_injection_time is not None:
+            max_age = min(max_age, time.monotonic() - self.last_injection_time)
+        return {id(check): self.read_gdt_items_async(check.ofp, check.method,
+                                                     [dataitem for dataitem, operator_sign, expected_value in check.items],
+                                                     check.struct_name, max_age)
+                for check in gdt_checks}
+
+    def compare_gdt_items(self, ofp, method, items, struct_name=None, max_age=0.0) -> list:
+        """
+        :param items: [(dataitem, operator, expected value)]
+        :return: [(whether the expected value is met, value formatted for the results)]
+        """
+        readings = self.read_gdt_items(ofp, method, [dataitem for dataitem, operator_sign, expected_value in items],
+                                       struct_name, max_age)
+        return self.compare_gdt_readings(method, items, readings)
+
+    def compare_gdt_readings(self, method, items, readings) -> list:
+        return [self.compare_gdt_value(method, gdt_value, buffer, operator_sign, expected_value)
+                for (gdt_value, buffer), (dataitem, operator_sign, expected_value) in zip(readings, items)]
+
+    def compare_gdt_value(self, method, gdt_value, buffer, operator_sign, expected_value):
+        """:return: Whether the GDT value meets the expected value, and the value formatted for the results"""
+        is_passed = True
+        if isinstance(gdt_value, bool):
             try:
-                new_value = function_name[function_name.index('(') + 1:function_name.rindex(')')]
-            except ValueError:
-                raise TestError(self.test_name, "Wrong usage of framecompare, please follow the format.")
-            data = new_value.split(':')
+                expected_value = Utilities.validity_or_number_to_bool(expected_value)
+            except ParameterError:
+                raise TestError(self.test_name, f"The expected value: \"{expected_value}\" cannot be used for validity comparison! value has to be Valid or Invalid.")
+
+        if isinstance(gdt_value, (int, float)) and not isinstance(gdt_value, bool) \
+                and ScenarioCompiler.is_number(expected_value) is False:
+            # e.g. a text expected value for a numeric data item
+            return False, gdt_value
+
+        if isinstance(gdt_value, float):
+            expected_value = float(expected_value)
+            if method == "GDT":
+                digits_to_show = 0
+                if buffer == GDTInterface.GDTInterfaceDataType.DOUBLE:
+                    digits_to_show = 20
+                if buffer == GDTInterface.GDTInterfaceDataType.NUMBER:
+                    digits_to_show = 7
+
+                if digits_to_show != 0:
+                    digits = str(gdt_value).split(".")
+                    digits_before_decimal = len(digits[0])
+                    if "-" in digits[0]:
+                        digits_before_decimal -= 1
+                        expected_value = round(expected_value, digits_to_show - digits_before_decimal)
+
+        if isinstance(gdt_value, int):
             try:
-                self.log_write('')
-                self.log_write(f'\tTest Category: Golden Image Verification ({is_absence_message}).')
-
-                golden_image_name = data[0]
-                result_image_path = f'{self.result_path}/{self.currentsheet}/Scenario_{step_counter}.png'
-                golden_image_path = f'{self.golden_images_path}/{golden_image_name}'
-                output_image_path = f'{self.output_path}/{self.currentsheet}/Step {step_counter}'
-                count = 0
-                while os.path.isfile(output_image_path + ".png"):
-                    if count == 0:
-                        output_image_path = output_image_path + f"_{count}"
-                    count += 1
-                    output_image_path = output_image_path.replace("_" + str(count - 1), "_" + str(count))
-                output_image_path += ".png"
-
-                try:
-                    image_comparator = ImageComparator(result_image_path, golden_image_path, output_image_path,
-                                                       is_absence, self.log_write)
-
-                except ImageComparatorError as e:
-                    raise TestError(self.test_name, e.message)
-
-                function_name = data[1]
-
-                self.log_write(f'\t\tVerification method: {function_name.upper()}.')
-
-                if function_name.upper() == 'SUB_IMAGE':
-                    search_box_text = data[2]
-                    search_box_regex = re.search("([0-9]+),([0-9]+),([0-9]+),([0-9]+)", search_box_text)
-
-                    search_box_top_left = (int(search_box_regex.group(1)), int(search_box_regex.group(2)))
-                    search_box_bottom_right = (int(search_box_regex.group(3)), int(search_box_regex.group(4)))
-
-                    grab_box_text = data[3]
-                    grab_box_regex = re.search("([0-9]+),([0-9]+),([0-9]+),([0-9]+)", grab_box_text)
-
-                    grab_box_top_left = (int(grab_box_regex.group(1)), int(grab_box_regex.group(2)))
-                    grab_box_bottom_right = (int(grab_box_regex.group(3)), int(grab_box_regex.group(4)))
+                expected_value = int(expected_value)
+            except ValueError:
+                # Compared as a number, e.g. 3.5 with an integer data item
+                expected_value = float(expected_value)
 
-                    tolerance = int(data[4])
+        if gdt_operators[operator_sign](gdt_value, expected_value) is False or isinstance(gdt_value, type(None)):
+            is_passed = False
 
-                    try:
-                        match_result = image_comparator.compare_sub_image(search_box_top_left, search_box_bottom_right,
-                                                                          grab_box_top_left, grab_box_bottom_right, tolerance)
+        if isinstance(gdt_value, bool):
+            # format boolean as valid/invalid
+            gdt_value = Utilities.bool_to_validity(gdt_value)
 
-                    except ImageComparatorError as e:
-                        raise TestError(self.test_name, e.message)
+        return is_passed, gdt_value
 
-                elif function_name.upper() == 'PATTERN':
-                    search_box_text = data[2]
-                    box_regex = re.search("([0-9]+),([0-9]+),([0-9]+),([0-9]+)", search_box_text)
-
-                    search_box_top_left = (int(box_regex.group(1)), int(box_regex.group(2)))
-                    search_box_bottom_right = (int(box_regex.group(3)), int(box_regex.group(4)))
+    def handle_expected(self, check, gdt_reading=None):
+        """Input: compiled expected check, and for GDT checks the future of its first reading (gdt_read_checks_async)
+        Returns array [PASS/FAIL, Actual]
+        """
+        step_counter = self.scenario_id
 
-                    tolerance = int(data[3])
+        if isinstance(check, FrameCompareCheck):
+            if check.is_absence:
+                is_absence_message = 'checking for absence'
+            else:
+                is_absence_message = 'checking for presence'
 
-                    try:
-                        match_result = image_comparator.compare_pattern(search_box_top_left, search_box_bottom_right,
-                                                                        tolerance)
+            self.log_write('')
+            self.log_write(f'\tTest Category: Golden Image Verification ({is_absence_message}).')
 
-                    except ImageComparatorError as e:
-                        raise TestError(self.test_name, e.message)
+            result_image_path = f'{self.result_path}/{self.currentsheet}/Scenario_{step_counter}.png'
+            golden_image_path = f'{self.golden_images_path}/{check.golden_image}'
+            output_image_path = f'{self.output_path}/{self.currentsheet}/Step {step_counter}'
+            count = 0
+            while os.path.isfile(output_image_path + ".png"):
+                if count == 0:
+                    output_image_path = output_image_path + f"_{count}"
+                count += 1
+                output_image_path = output_image_path.replace("_" + str(count - 1), "_" + str(count))
+            output_image_path += ".png"
 
-                elif function_name.upper() == 'PATTERN_RDP':
-                    position_text = data[2]
-                    position_regex = re.search("([a-zA-Z]+),([0-9.]+),([a-zA-Z]+),([0-9.]+)", position_text)
+            try:
+                image_comparator = ImageComparator(result_image_path, golden_image_path, output_image_path,
+                                                   check.is_absence, self.log_write)
 
-                    horizontal_indicator = position_regex.group(1)
-                    horizontal_degrees = float(position_regex.group(2))
-                    vertical_indicator = position_regex.group(3)
-                    vertical_degrees = float(position_regex.group(4))
+            except ImageComparatorError as e:
+                raise TestError(self.test_name, e.message)
 
-                    tolerance = int(data[3])
+            self.log_write(f'\t\tVerification method: {check.method}.')
 
-                    try:
-                        match_result = image_comparator.compare_pattern_rdp(horizontal_indicator, horizontal_degrees,
-                                                                            vertical_indicator, vertical_degrees,
-                                                                            tolerance)
+            try:
+                if check.method == 'SUB_IMAGE':
+                    match_result = image_comparator.compare_sub_image(check.search_box[0], check.search_box[1],
+                                                                      check.grab_box[0], check.grab_box[1],
+                                                                      check.tolerance)
 
-                    except ImageComparatorError as e:
-                        raise TestError(self.test_name, e.message)
+                elif check.method == 'PATTERN':
+                    match_result = image_comparator.compare_pattern(check.search_box[0], check.search_box[1],
+                                                                    check.tolerance)
 
                 else:
-                    raise TestError(self.test_name, f'Invalid command: {function_name}.')
-
-            except IndexError:
-                msg = "Invalid Format! FrameCompare(source_file:element_type:position:tolerance)\n"
-                if len(data) > 1:
-                    if data[1].lower() == "sub_image":
-                        msg = "Invalid Format! FrameCompare(source_file:element_type:search_box:grab_box:tolerance)\n"
-                    if data[1].lower() == "pattern":
-                        msg = "Invalid Format! FrameCompare(source_file:element_type:search_box:tolerance)\n"
-                    if data[1].lower() == "pattern_rdp":
-                        msg = "Invalid Format! FrameCompare(source_file:element_type:position:tolerance)\n"
-                raise TestError(self.test_name, msg)
+                    horizontal_indicator, horizontal_degrees, vertical_indicator, vertical_degrees = check.position
+                    match_result = image_comparator.compare_pattern_rdp(horizontal_indicator, horizontal_degrees,
+                                                                        vertical_indicator, vertical_degrees,
+                                                                        check.tolerance)
+
+            except ImageComparatorError as e:
+                raise TestError(self.test_name, e.message)
 
             if match_result:
                 result = 'PASSED'
@@ -1077,68 +1184,66 @@ class TestClass(object):
                 result = 'FAILED'
 
             self.log_write(f'\t\tVerification result: {result}')
-            actual_result_text = f"FRAMECOMPARE({data[0]}) = {result}"
+            actual_result_text = f"FRAMECOMPARE({check.golden_image}) = {result}"
             self.consoleprint(f'VISUAL_TESTING({result_image_path}): {actual_result_text}')
             return [result, actual_result_text]
 
-        if re.findall("^VIDEOPROCESS", function_name.upper()):
+        if isinstance(check, VideoProcessCheck):
+            not_flashing_image = f"{self.golden_images_path}/{check.steady_image}"
+            flashing_image = f"{self.golden_images_path}/{check.flashing_image}"
+
+            result_video_path = f'{self.result_path}/{self.currentsheet}/Scenario_{step_counter}.mp4'
+            uncompressed_video_path = result_video_path.replace(".mp4", ".avi")
+            video_paths = [result_video_path]
+            # Read the capture itself while its compression has not finished. The compression may end and remove it
+            # before it is opened, the compressed video is read then.
+            if self.video_compressor.is_pending(uncompressed_video_path) or not os.path.isfile(result_video_path):
+                video_paths.insert(0, uncompressed_video_path)
+            output_video_path = f'{self.output_path}/{self.currentsheet}/Step {step_counter}.avi'
+
+            # Every verb on the same video and search box is evaluated on one cached frame timeline
+            timeline_key = (result_video_path, check.steady_image, check.flashing_image, check.top_left,
+                            check.bottom_right, check.tolerance)
             try:
-                new_value = function_name[function_name.index('(') + 1:function_name.rindex(')')]
-            except ValueError:
-                raise TestError(self.test_name, "Wrong usage of framecompare, please follow the format.")
-            data = new_value.split(':')
-            if data[0].lower() == "flashing":
-                try:
-                    flash_count = int(data[1])
-                    not_flashing_image = f"{self.golden_images_path}/{data[2]}"
-                    flashing_image = f"{self.golden_images_path}/{data[3]}"
-
-                    search_box = data[4].split(',')
-                    left_corner = (int(search_box[0]), int(search_box[1]))
-                    right_corner = (int(search_box[2]), int(search_box[3]))
-                    tolerance = int(data[5])
-
-                except IndexError:
-                    raise TestError(self.test_name, "Wrong usage of videoprocess(flashing:count:steady_img:flashing_img:search_box:tolerance")
-
-                result_video_path = f'{self.result_path}/{self.currentsheet}/Scenario_{step_counter}.mp4'
-                output_video_path = f'{self.output_path}/{self.currentsheet}/Step {step_counter}.avi'
+                timeline = self.video_timelines.get(timeline_key)
+                if timeline is None:
+                    for video_path in video_paths:
+                        try:
+                            vid2 = VideoComparator(video_path, output_video_path, check.top_left, check.bottom_right,
+                                                   check.tolerance, 0.98, export_timeline=True)
+                        except ImageComparatorError:
+                            if video_path == video_paths[-1]:
+                                raise
+                            continue
+                        result_video_path = video_path
+                        break
+                    timeline = vid2.analyse(not_flashing_image, flashing_image)
+                    self.video_timelines[timeline_key] = timeline
 
-                try:
-                    vid2 = VideoComparator(result_video_path, output_video_path, left_corner, right_corner,
-                                           tolerance, 0.98)
-                    result = vid2.flash_count(not_flashing_image, flashing_image, flash_count)
-                except ImageComparatorError as error:
-                    raise TestError(self.test_name, error.message)
+                if check.method == "flashing":
+                    result = timeline.evaluate(check.method, check.count)
+                else:
+                    result = timeline.evaluate(check.method, check.expected_range)
+            except ImageComparatorError as error:
+                raise TestError(self.test_name, error.message)
 
+            if check.method == "flashing":
                 actual_result_text = f"VIDEOPROCESS = {result[1]}"
-                self.consoleprint(f'VIDEO_PROCESS({result_video_path}): {actual_result_text}')
-                return [result[0], actual_result_text]
+            else:
+                actual_result_text = f"VIDEOPROCESS({check.method}) = {result[1]} {video_process_units[check.method]}"
+            self.consoleprint(f'VIDEO_PROCESS({result_video_path}): {actual_result_text}')
+            return [result[0], actual_result_text]
 
-        if re.findall("^SIM", function_name.upper()):
+        if isinstance(check, SimCheck):
             self.log_write("")
             self.log_write("\tTest Category: SIMValue")
-            try:
-                # Remove the SIM() string
-                new_value = function_name[function_name.index('(') + 1:function_name.rindex(')')]
-            except ValueError:
-                raise TestError(self.test_name, "Wrong usage of SIM data read, please follow the format:\n"
-                                               "SIM(Label=value:Label2=value)")
-            sim_labels = new_value.split(':')  # Split labels by ':'
             scenario_result = "PASSED"
             results_string = "SIMValues: "
             results_string_passed = ''
             results_string_failed = ''
-            self.sleep(100)
-            for data in sim_labels:
+            self.wait_for_settle()
+            for label, unit, expected_value in check.items:
                 current_result = "PASSED"
-                label, expected_value = data.split('=')  # Split label and value [label,value]
-                unit_regex = re.search("(.*)(\[.*\])$", label)
-                try:
-                    label = unit_regex.group(1)
-                    unit = unit_regex.group(2)
-                except AttributeError:
-                    unit = "N/A"
 
                 sim_value = self.SimEngineInterface.get_element_value(label, unit)
                 # Result string to handle multiple values
@@ -1156,15 +1261,9 @@ class TestClass(object):
             self.log_write("\t\tSTAGE RESULT: " + scenario_result)
             return [scenario_result, results_string, results_string_passed, results_string_failed]
 
-        if re.findall("^(GDT_STRUCT|GDT)(_PSP2)?(.*)", function_name.upper()):
-            method_data = re.search("(GDT_STRUCT|GDT)(_PSP2)?\((.*)\)", function_name, re.IGNORECASE)
-            try:
-                method = method_data.group(1)
-                ofp = 1 if method_data.group(2) is not None else 0
-                data_items = method_data.group(3).split(':')  # Split dataitems by ':'
-            except AttributeError:
-                raise TestError(self.test_name, "Wrong usage of GDT struct read, please follow the format:\nGDT(dataitem=value)")
-
+        if isinstance(check, GDTCheck):
+            method = check.method
+            ofp = check.ofp
             self.gdt_connect(ofp)
 
             self.log_write("")
@@ -1176,88 +1275,37 @@ class TestClass(object):
             results_string_failed = ''
 
             if method == "GDT_STRUCT":
-                struct_name = data_items[0]
-                data_items = data_items[1:]
-                results_string = f"GDTVALUES: ;{struct_name};"
-
-            for data in data_items:
+                results_string = f"GDTVALUES: ;{check.struct_name};"
+
+            if gdt_reading is None:
+                gdt_reading = self.gdt_read_checks_async([check])[id(check)]
+            if any(operator_sign == '!=' for dataitem, operator_sign, expected_value in check.items):
+                # A value that must differ is only read once the target had CHECK_TIMEOUT to react to the injection,
+                # an early read still holding the value from before the injection would pass
+                gdt_reading.result()
+                self.wait_for_settle(CHECK_TIMEOUT)
+                comparisons = self.compare_gdt_items(ofp, method, check.items, check.struct_name)
+            else:
+                # Join the first reading, then poll until every expected value is reached, at most CHECK_TIMEOUT,
+                # reading all items in one batch
+                first_comparisons = self.compare_gdt_readings(method, check.items, gdt_reading.result())
+                comparisons = first_comparisons
+                if not all(result[0] for result in comparisons):
+                    comparisons = self.wait_until(
+                        lambda: self.compare_gdt_items(ofp, method, check.items, check.struct_name),
+                        lambda results: all(result[0] for result in results), CHECK_TIMEOUT)
+                # Values already met by the first reading may not have reacted yet (e.g. a value expected to stay
+                # unchanged): the check only passes if they are still met CHECK_TIMEOUT after the last injection
+                if all(result[0] for result in comparisons) and any(result[0] for result in first_comparisons):
+                    self.wait_for_settle(CHECK_TIMEOUT)
+                    comparisons = self.compare_gdt_items(ofp, method, check.items, check.struct_name)
+
+            for (dataitem, operator_sign, expected_value), (is_passed, gdt_value) in zip(check.items, comparisons):
                 current_result = "PASSED"
-
-                data_result = re.search("(.*[^!<>])(!=|<=|>=|<|>|=)(.*)", data)  # Split dataitem, operator, value
-                dataitem = data_result.group(1)
-                operator_sign = data_result.group(2)
-                expected_value = data_result.group(3)
-
-                operator_dict = {
-                    '!=': operator.ne,
-                    '<': operator.lt,
-                    '<=': operator.le,
-                    '>': operator.gt,
-                    '>=': operator.ge,
-                    '=': operator.eq
-                }
-                if operator_sign not in operator_dict:
-                    raise TestError(self.test_name, f"\'{operator_sign}\' is not a valid operator and cannot be used!\nValid operators are: !=, <= ,< ,>= ,>, =")
-
-                self.sleep(1000)
-                gdt_value = None
-
-                if method == "GDT_STRUCT":
-                    gdt_value = self.GDTInterfaces[ofp].read_struct(struct_name, dataitem)
-
-                if method == "GDT_BITVIEW":
-                    gdt_value = self.GDTInterfaces[ofp].read_buffer("Bit_Sequential_Counters", dataitem, "Value")
-
-                if method == "GDT":
-                    if ".validity" in dataitem.lower():
-                        data_item_to_read = dataitem[:dataitem.index('.')]  # Remove .Validity from dataitem string
-                        test_case = "validity"
-                    else:
-                        data_item_to_read = dataitem
-                        test_case = "value"
-                    buffer = None
-                    for ItemType in self.GDTInterfaces[ofp].GDTInterfaceDataType:
-                        try:
-                            gdt_value = self.GDTInterfaces[ofp].read_data_item(ItemType, data_item_to_read)[test_case]
-                            buffer = ItemType
-                            if gdt_value is not None:
-                                break
-                        except:
-                            pass
-
-                if isinstance(gdt_value, bool):
-                    try:
-                        expected_value = Utilities.validity_or_number_to_bool(expected_value)
-                    except ParameterError:
-                        raise TestError(self.test_name, f"The expected value: \"{expected_value}\" cannot be used for validity comparison! value has to be Valid or Invalid.")
-
-                if isinstance(gdt_value, float):
-                    expected_value = float(expected_value)
-                    if method == "GDT":
-                        digits_to_show = 0
-                        if buffer == GDTInterface.GDTInterfaceDataType.DOUBLE:
-                            digits_to_show = 20
-                        if buffer == GDTInterface.GDTInterfaceDataType.NUMBER:
-                            digits_to_show = 7
-
-                        if digits_to_show != 0:
-                            digits = str(gdt_value).split(".")
-                            digits_before_decimal = len(digits[0])
-                            if "-" in digits[0]:
-                                digits_before_decimal -= 1
-                                expected_value = round(expected_value, digits_to_show - digits_before_decimal)
-
-                if isinstance(gdt_value, int):
-                    expected_value = int(expected_value)
-
-                if operator_dict[operator_sign](gdt_value, expected_value) is False or isinstance(gdt_value, type(None)):
+                if not is_passed:
                     current_result = "FAILED"
                     scenario_result = "FAILED"
 
-                if isinstance(gdt_value, bool):
-                    # format boolean as valid/invalid
-                    gdt_value = Utilities.bool_to_validity(gdt_value)
-
                 if current_result == "PASSED":
                     results_string_passed += "%s = %s;" % (dataitem, gdt_value)
                 else:
@@ -1269,9 +1317,14 @@ class TestClass(object):
             self.log_write("\t\tSTAGE RESULT: " + scenario_result)
             return [scenario_result, results_string, results_string_passed, results_string_failed]
 
-        if re.findall("N/A", function_name.upper()):
-            self.log_write("\t\tSTAGE RESULT: N/A")
-            return ["No Auto Run", ""]
+        self.log_write("\t\tSTAGE RESULT: N/A")
+        return ["No Auto Run", ""]
+
+    def results_journal(self):
+        """:return: The journal of the workbook the results are written to, the caller's for a called test"""
+        if self.called:
+            return self.caller.results_journal()
+        return self.result_journal
 
     def write_line(self, row, col, value):
 
@@ -1280,30 +1333,8 @@ class TestClass(object):
         else:
             ws = self.caller.wb[self.test_name]
 
-        # actual = ws.cell(row=row, column=new_column,value=value)
-        color = openpyxl.styles.colors.WHITE
-        if "FAILED" in value:
-            color = "FF0000"
-        elif "PASSED" in value:
-            color = "00b050"
-        elif "No Auto Run" in value:
-            color = "808080"
-        # elif "Pass/Fail" or "Actual" in value: color = "bfbfbf" #4472c4
-        elif "NO VALID LOG" in value:
-            color = "FFFF8A"
-        if "Empty" in value:
-            value = None
-
-        pass_fail = ws.cell(row=row, column=col, value=value)
-        copy_style = ws.cell(row=row, column=col - 1)
-        if copy_style.has_style:
-            pass_fail._style = copy(copy_style._style)
-
-        if color != openpyxl.styles.colors.WHITE:
-            pass_fail.fill = openpyxl.styles.PatternFill('solid', color)
-
-        # strExcelResultFile = '%s/%s/%s_result.xlsx'%(folder,self.testname,self.testname)
-        # self.wb.save(strExcelResultFile)
+        self.results_journal().append("line", sheet=ws.title, row=row, col=col, value=value)
+        ResultJournal.write_line(ws, row, col, value)
 
     def write_actual(self, row, col, value):
         if self.called is False:
@@ -1311,36 +1342,10 @@ class TestClass(object):
         else:
             ws = self.caller.wb[self.test_name]
             # ws = self.ws
-        # Actual column
-        actual = ws.cell(row=row, column=col, value="")
-        copy_style = ws.cell(row=row, column=col - 2)
-        if copy_style.has_style:
-            actual._style = copy(copy_style._style)
-
-        if re.findall("^(!?)FRAMECOMPARE", value.upper()):
-            actual.value = "Step %d.png" % self.scenario_id
-            actual.hyperlink = "./Output/%s/Step %d.png" % (self.currentsheet, self.scenario_id)
-        elif re.findall("^VIDEOPROCESS", value.upper()):
-            actual.value = "Step %d.avi" % self.scenario_id
-            actual.hyperlink = "./Output/%s/Step %d.avi" % (self.currentsheet, self.scenario_id)
-        elif re.findall("^VIDEO", value.upper()):
-            actual.value = "Scenario_%d.mp4" % self.scenario_id
-            actual.hyperlink = "./Results/%s/Scenario_%d.mp4" % (self.currentsheet, self.scenario_id)
-        elif re.findall("^SIMVALUES:", value.upper()):
-            values = value[value.index(':') + 1:].replace(';', '\n').replace('\t', '')
-            actual.value = "SIMValues: " + values
-        elif re.findall("^GDTVALUES:", value.upper()):
-            values = value[value.index(':') + 1:].replace(';', '\n').replace('\t', '')
-            actual.value = "GDTVALUES: " + values
-        elif re.findall("^TEST_CALL", value.upper()):
-            values = value[value.index(':') + 1:]
-            actual.hyperlink = f"#{values}!A1"
-            actual.value = f"Sheet: \"{values}\""
-        else:
-            actual.value = value
 
-            # strExcelResultFile = '%s/%s/%s_result.xlsx'%(folder,self.testname,self.testname)
-            # self.wb.save(strExcelResultFile)
+        self.results_journal().append("actual", sheet=ws.title, row=row, col=col, value=value,
+                                      scenario_id=self.scenario_id, current_sheet=self.currentsheet)
+        ResultJournal.write_actual(ws, row, col, value, self.scenario_id, self.currentsheet)
 
     def log_write(self, line):
         """
@@ -1353,19 +1358,26 @@ class TestClass(object):
         self.consoleprint(string, "red")
 
     def compress_video(self, uncompressed_video_path, compressed_video_path):
-        ffmpeg_process = subprocess.Popen(f'ffmpeg -i \"{uncompressed_video_path}\" '
-            f'-c:v libx264 -preset veryslow -crf 0 \"{compressed_video_path}\"', shell=True,
-            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self.video_compression_log)
-        ffmpeg_process.wait()
-
-        os.remove(uncompressed_video_path)
+        # Compressed in the background, the scenario goes on right away
+        self.video_compressor.submit(uncompressed_video_path, compressed_video_path, self.sleep)
 
     def gdt_connect(self, ofp):
         """
         This method checks if gdt is connected else try to connect
         """
-        if self.GDTInterfaces[ofp].is_connected is False:
-            self.GDTInterfaces[ofp].connect()
+        self.gdt_connect_join(self.gdt_connect_async([ofp]))
+
+    def gdt_connect_async(self, ofps) -> list:
+        """
+        Starts connecting every OFP that is not connected yet, each on its own GDT worker
+        :return: [(ofp, future)] to pass to gdt_connect_join
+        """
+        return [(ofp, self.GDTInterfaces[ofp].submit(self.GDTInterfaces[ofp].connect))
+                for ofp in ofps if self.GDTInterfaces[ofp].is_connected is False]
+
+    def gdt_connect_join(self, connections):
+        for ofp, connection in connections:
+            connection.result()
             if self.GDTInterfaces[ofp].is_connected:
                 self.consoleprint(f"GDT: {self.GDTInterfaces[ofp].connection} Connected successfully.", "#3CB371")
             else:
@@ -1,19 +1,189 @@
 import os
 import sys
+import html
+import threading
+import pythoncom
 from PyQt5.QtWidgets import *
-from PyQt5 import QtGui, QtWidgets, QtCore
+from PyQt5 import QtGui, QtWidgets, QtCore, QtTest
 from functools import partial
 from TestClass import TestClass
 from PKLGenerator import PKLGenerator
 from Utilities import Utilities
 from Exceptions import TestError
 from SVNInterface import SVNInterface
+from ResultsPublisher import results_publisher
 
 folder = Utilities.get_tests_folder()
 projects = Utilities.get_projects_data()
 
+# The console shows the last console_max_lines lines, rendered every console_refresh_time ms. Every line is kept in
+# console_history_file as "level<TAB>color<TAB>text", searched console_filter_delay ms after the last filter keystroke
+console_max_lines = 2000
+console_refresh_time = 50
+console_filter_delay = 300
+console_history_file = os.path.abspath('./ConsoleHistory.txt')
+console_levels = ["All", "Errors", "Passed", "Info"]
+
+
+def console_level(color: str) -> str:
+    """The console colour of a line is its level"""
+    if color.lower() in ("red", "#ff0000", "#fa0000"):
+        return "Errors"
+    if color.lower() in ("green", "#3cb371", "#90ee90", "#7fc97f"):
+        return "Passed"
+    return "Info"
+
+
+def append_html(text_browser, html_lines):
+    """
+    Appends every line as its own block at the end of the text browser, following the end only if it was scrolled to
+    it. A <br> stays in its block, so only blocks are trimmed by the maximum block count of the document.
+    """
+    document = text_browser.document()
+    cursor = QtGui.QTextCursor(document)
+    cursor.movePosition(QtGui.QTextCursor.End)
+    scrollbar = text_browser.verticalScrollBar()
+    current_scroll = scrollbar.value()
+    current_maximum = scrollbar.maximum()
+    # The first line of an empty document goes in its initial block
+    new_block = not document.isEmpty()
+    cursor.beginEditBlock()
+    for line_html in html_lines:
+        if new_block:
+            cursor.insertBlock()
+        cursor.insertHtml(line_html)
+        new_block = True
+    cursor.endEditBlock()
+    if current_scroll == current_maximum:
+        scrollbar.setValue(scrollbar.maximum())
+
 
 # GUI classes
+class TestRunner(QtCore.QThread):
+    """
+    Runs a test off the GUI thread. The test is given the runner as its menu: every update of the menu is a queued
+    signal, a popup blocks the test until it is answered, and pause/resume/stop are events the test waits on.
+    """
+    text_printed = QtCore.pyqtSignal(str, str)
+    scenario_updated = QtCore.pyqtSignal(str, int, bool)
+    status_updated = QtCore.pyqtSignal(str)
+    progress_range_set = QtCore.pyqtSignal(int, int)
+    progress_set = QtCore.pyqtSignal(int)
+    title_set = QtCore.pyqtSignal(str)
+    popup_requested = QtCore.pyqtSignal(str, str, int)
+    test_ended = QtCore.pyqtSignal()
+
+    def __init__(self, menu, test_name, svn_download, svn_results, host_env, instrumented, local, startfrom):
+        super(TestRunner, self).__init__(menu)
+        self.test_name = test_name
+        self.svn_download = svn_download
+        self.svn_results = svn_results
+        self.host_env = host_env
+        self.instrumented = instrumented
+        self.local = local
+        self.startfrom = startfrom
+        self.test = None
+
+        # Set while the test runs, cleared while it is paused
+        self.resumed = threading.Event()
+        self.resumed.set()
+        self.stop_requested = threading.Event()
+        self.popup_answered = threading.Event()
+        self.popup_answer = None
+
+        self.text_printed.connect(menu.onUpdateText)
+        self.scenario_updated.connect(menu.updateScenario)
+        self.status_updated.connect(menu.updateCurrentStatus)
+        self.progress_range_set.connect(menu.progressBar.setRange)
+        self.progress_set.connect(menu.progressBar.setValue)
+        self.title_set.connect(menu.setWindowTitle)
+        self.popup_requested.connect(menu.answerPopup)
+        self.test_ended.connect(menu.testEnded)
+
+    def run(self):
+        # SimEngine is a COM object, created and used on this thread only
+        pythoncom.CoInitialize()
+        try:
+            try:
+                self.test = TestClass(self.test_name, self.svn_download, self.svn_results, _executed=False,
+                                      _host_env=self.host_env, _menu=self, _ci=False, _instrumented=self.instrumented)
+            except TestError as error:
+                self.onUpdateText(error.message, "red")
+                return
+
+            self.test.localRun = self.local
+            self.test.startfrom = self.startfrom
+            if self.local:
+                self.onUpdateText(f'Starting local test run for {self.test.test_name}, manual run: '
+                                  f'{self.test.SVNResults}, host env: {self.test.host_env}, '
+                                  f'instrumented: {self.test.instrumented}\n\n\n')
+            else:
+                print('Starting test run for %s, upload to svn:%s\n\n\n' % (self.test.test_name, self.test.SVNResults))
+                self.onUpdateText(
+                    'Starting test run for %s, upload to svn:%s\n\n\n' % (self.test.test_name, self.test.SVNResults))
+            self.test.run_test()
+        finally:
+            self.test = None
+            pythoncom.CoUninitialize()
+
+    # Menu interface of the test, called from the test thread
+
+    def onUpdateText(self, text, color=""):
+        self.text_printed.emit(text, color)
+
+    def updateScenario(self, status, scenario_id, tab=False):
+        self.scenario_updated.emit(status, scenario_id, bool(tab))
+
+    def updateCurrentStatus(self, status):
+        self.status_updated.emit(status)
+
+    def setProgressRange(self, minimum, maximum):
+        self.progress_range_set.emit(int(minimum), int(maximum))
+
+    def setProgress(self, value):
+        self.progress_set.emit(int(value))
+
+    def setWindowTitle(self, title):
+        self.title_set.emit(title)
+
+    def testEnded(self):
+        self.test_ended.emit()
+
+    def popup(self, title, text, style=0):
+        # A stopped test is answered No at once, the GUI is waiting for it to end and shows no more popups
+        self.popup_answered.clear()
+        if self.stop_requested.is_set():
+            return QMessageBox.No
+        self.popup_requested.emit(title, text, style)
+        while not self.popup_answered.wait(0.1):
+            if self.stop_requested.is_set():
+                return QMessageBox.No
+        return self.popup_answer
+
+    def waitWhilePaused(self):
+        self.resumed.wait()
+        if self.stop_requested.is_set():
+            raise KeyboardInterrupt
+
+    # Called from the GUI thread
+
+    def setPopupAnswer(self, answer):
+        self.popup_answer = answer
+        self.popup_answered.set()
+
+    def setPaused(self, paused):
+        if paused:
+            self.resumed.clear()
+        else:
+            self.resumed.set()
+
+    def stop(self):
+        """The test is stopped (cleared and ended) at its next step"""
+        self.stop_requested.set()
+        self.resumed.set()
+        self.setPopupAnswer(QMessageBox.No)
+
+
 class TestMenu(QDialog):
     def __init__(self, _local, parent=None):
         super(TestMenu, self).__init__(parent)
@@ -35,6 +205,7 @@ class TestMenu(QDialog):
             self.dark_style = True
 
         self.stepid = 0
+        self.runner = None
         #self.parent = parent
         ##############################
         side_layout = QGroupBox("Test Information:")
@@ -56,8 +227,32 @@ class TestMenu(QDialog):
 
         self.consoleText = QLabel("Test Output:")
         self.consoleOutput = QTextBrowser()
+        self.consoleOutput.document().setMaximumBlockCount(console_max_lines)
         # self.textEdit.setReadOnly(True)
 
+        self.consoleFilter = QLineEdit()
+        self.consoleFilter.setPlaceholderText("Search the whole output...")
+        self.consoleLevel = QComboBox()
+        self.consoleLevel.addItems(console_levels)
+        console_filter_layout = QHBoxLayout()
+        console_filter_layout.addWidget(self.consoleFilter)
+        console_filter_layout.addWidget(self.consoleLevel)
+
+        # Console lines and scenario results waiting for the next refresh: [(text, color)] and [html]
+        self.pending_console_lines = list()
+        self.pending_scenarios = list()
+        self.console_history = open(console_history_file, 'w', encoding='utf-8')
+        self.consoleTimer = QtCore.QTimer(self)
+        self.consoleTimer.timeout.connect(self.flushConsole)
+        self.consoleTimer.start(console_refresh_time)
+        # The whole history is searched once the filter text stopped changing
+        self.consoleFilterTimer = QtCore.QTimer(self)
+        self.consoleFilterTimer.setSingleShot(True)
+        self.consoleFilterTimer.setInterval(console_filter_delay)
+        self.consoleFilterTimer.timeout.connect(self.applyConsoleFilter)
+        self.consoleFilter.textChanged.connect(self.consoleFilterTimer.start)
+        self.consoleLevel.currentIndexChanged.connect(self.applyConsoleFilter)
+
         layout = QVBoxLayout()
         layout.addWidget(self.testProgress)
         layout.addWidget(self.progressBar)
@@ -65,6 +260,7 @@ class TestMenu(QDialog):
         layout.addWidget(self.currentStatusIMG)
         layout.addWidget(self.consoleText)
         layout.addWidget(self.consoleOutput)
+        layout.addLayout(console_filter_layout)
         layout.addStretch(1)
         side_layout.setLayout(layout)
 
@@ -173,18 +369,54 @@ class TestMenu(QDialog):
         ##############################
 
     def onUpdateText(self, text, color=""):
-        cursor = self.consoleOutput.textCursor()
-        cursor.movePosition(QtGui.QTextCursor.End)
-        scrollbar = self.consoleOutput.verticalScrollBar()
-        current_scroll = scrollbar.value()
-        current_maximum = scrollbar.maximum()
-        if color != '':
-            text = text.replace('\n', '<br>')
-            cursor.insertHtml('''<b><span style="color: {};">{}</span></b><br>'''.format(color, text))
-        else:
-            cursor.insertText(text + "\n")
-        if current_scroll == current_maximum:
-            scrollbar.setValue(scrollbar.maximum())
+        # Rendered by flushConsole
+        self.pending_console_lines.append((text, color))
+
+    def flushConsole(self):
+        """Writes the lines printed since the last refresh to the history file and renders them in one edit"""
+        if len(self.pending_console_lines) > 0:
+            lines, self.pending_console_lines = self.pending_console_lines, list()
+            for text, color in lines:
+                self.console_history.write(f"{console_level(color)}\t{color}\t{text.replace(chr(10), chr(11))}\n")
+            self.console_history.flush()
+            self.appendConsole([(text, color) for text, color in lines if self.matchesConsoleFilter(text, color)])
+
+        if len(self.pending_scenarios) > 0:
+            scenarios, self.pending_scenarios = self.pending_scenarios, list()
+            append_html(self.resultList, scenarios)
+
+    def appendConsole(self, lines):
+        if len(lines) == 0:
+            return
+        # One block per line of text, the console keeps the last console_max_lines blocks
+        console_html = list()
+        for text, color in lines:
+            for line in text.split('\n'):
+                if color != '':
+                    console_html.append('''<b><span style="color: {};">{}</span></b>'''.format(color, html.escape(line)))
+                else:
+                    console_html.append('''<span style="white-space: pre-wrap;">{}</span>'''.format(html.escape(line)))
+        append_html(self.consoleOutput, console_html)
+
+    def matchesConsoleFilter(self, text, color):
+        level = self.consoleLevel.currentText()
+        if level != "All" and console_level(color) != level:
+            return False
+        return self.consoleFilter.text().lower() in text.lower()
+
+    def applyConsoleFilter(self):
+        """Renders the last matching lines of the whole history"""
+        self.consoleFilterTimer.stop()
+        self.flushConsole()
+        lines = list()
+        with open(console_history_file, 'r', encoding='utf-8') as history:
+            for line in history:
+                level, color, text = line.rstrip('\n').split('\t', 2)
+                text = text.replace(chr(11), chr(10))
+                if self.matchesConsoleFilter(text, color):
+                    lines.append((text, color))
+        self.consoleOutput.clear()
+        self.appendConsole(lines[-console_max_lines:])
 
     def updateCurrentStatus(self, status):
         if status == "FAILED":
@@ -204,13 +436,6 @@ class TestMenu(QDialog):
         return self.currentStatusIMG.text()
 
     def updateScenario(self, status, scenario_id, tab=False):
-
-        cursor = self.resultList.textCursor()
-        cursor.movePosition(QtGui.QTextCursor.End)
-        scrollbar = self.resultList.verticalScrollBar()
-        current_scroll = scrollbar.value()
-        current_maximum = scrollbar.maximum()
-
         if tab:
             tab = "&nbsp;&nbsp;&nbsp;&nbsp;&nbsp;"
         else:
@@ -228,12 +453,9 @@ class TestMenu(QDialog):
         else:
             scenario = ""
 
-        cursor.insertHtml(f'<b><span style="color: {color};font-size:10pt">{tab}{scenario} {status}</span></b><br>')
-
-        if current_scroll == current_maximum:
-            scrollbar.setValue(scrollbar.maximum())
-
-        # self.resultList.insertText(scenario)
+        # Rendered by flushConsole
+        self.pending_scenarios.append(
+            f'<b><span style="color: {color};font-size:10pt">{tab}{scenario} {status}</span></b>')
 
     def runTest(self):
         _testname = self.testlist[self.testList.currentRow()]
@@ -243,12 +465,22 @@ class TestMenu(QDialog):
 
         testname = _testname
 
-        try:
-            self.test = TestClass(testname, self.svn_download, svn_results,
-                                  _executed=False, _host_env=_host_env, _menu=self, _ci=False, _instrumented=instrumented)
-        except TestError as error:
-            self.onUpdateText(error.message, "red")
-            return None
+        if not self.local:
+            testfolder = "%s/%s" % (folder, testname)
+            if os.path.exists(testfolder):
+                answer = QMessageBox.critical(self, Utilities.get_current_version(),
+                                              "Test folder already exists!!!\n\nDo you want to override test data?",
+                                              QMessageBox.Yes | QMessageBox.No)
+                if answer != QMessageBox.Yes:
+                    QMessageBox.information(self, Utilities.get_current_version(),
+                                            "Test run was cancelled.\nUse local run if you dont want to override test data.",
+                                            QMessageBox.Ok)
+                    return None
+
+        # The test runs on its own thread, the menu stays responsive
+        self.runner = TestRunner(self, testname, self.svn_download, svn_results, _host_env, instrumented, self.local,
+                                 self.runScenarioBox.value())
+        self.runner.finished.connect(self.testEnded)
 
         self.testList.setEnabled(False)
         self.runButton.setEnabled(False)
@@ -271,35 +503,13 @@ class TestMenu(QDialog):
         # self.testList.takeItem(0)
         self.text.setText("Scenarios Result:")
 
-        self.test.localRun = self.local
+        self.runner.start()
 
-        self.test.startfrom = self.runScenarioBox.value()
-        if self.local:
-            text_print = f'Starting local test run for {self.test.test_name}, manual run: {self.test.SVNResults}, ' \
-                         f'host env: {self.test.host_env}, instrumented: {self.test.instrumented}\n\n\n'
-            self.test.consoleprint(text_print)
-            # self.hide()
-
-            self.test.run_test()
-        else:
-            testfolder = "%s/%s" % (folder, self.test.test_name)
-            answer = QMessageBox.Yes
-            if os.path.exists(testfolder):
-                answer = QMessageBox.critical(self, Utilities.get_current_version(),
-                                              "Test folder already exists!!!\n\nDo you want to override test data?",
-                                              QMessageBox.Yes | QMessageBox.No)
-
-            if answer == QMessageBox.Yes:
-                print('Starting test run for %s, upload to svn:%s\n\n\n' % (self.test.test_name, self.test.SVNResults))
-                self.onUpdateText(
-                    'Starting test run for %s, upload to svn:%s\n\n\n' % (self.test.test_name, self.test.SVNResults))
-                # self.hide()
-                self.test.run_test()
-            else:
-                QMessageBox.information(self, Utilities.get_current_version(),
-                                        "Test run was cancelled.\nUse local run if you dont want to override test data.",
-                                        QMessageBox.Ok)
-                pass
+    def testEnded(self):
+        self.setWindowTitle(Utilities.get_current_version())
+        self.pauseButton.setEnabled(False)
+        # Re-enable menu buttons
+        self.backButton.setEnabled(True)
 
     def pause_test(self):
         paused = self.pauseButton.isChecked()
@@ -307,6 +517,15 @@ class TestMenu(QDialog):
             self.pauseButton.setText("Pause")
         else:
             self.pauseButton.setText("Resume")
+        if self.runner is not None:
+            # The button is checked while the test runs
+            self.runner.setPaused(not paused)
+
+    def answerPopup(self, title, text, style):
+        # Popups requested just before a stop are not shown, the test already got its answer
+        if self.runner.stop_requested.is_set():
+            return
+        self.runner.setPopupAnswer(self.popup(title, text, style))
 
     def popup(self, title, text, style=0):
         if style == 0:  # Yes/No
@@ -333,8 +552,14 @@ class TestMenu(QDialog):
         choice = QMessageBox.question(self, Utilities.get_current_version(), "Are you sure you want to exit?",
                                       QMessageBox.Yes | QMessageBox.No)
         if choice == QMessageBox.Yes:
-            if hasattr(self, 'test'):
-                self.test.clear_injections()
+            if self.runner is not None and self.runner.isRunning():
+                # The test clears its injections on its own thread when it stops, the GUI keeps processing its
+                # signals meanwhile
+                self.runner.stop()
+                while self.runner.isRunning():
+                    QtTest.QTest.qWait(100)
+            # Results uploads still running in the background
+            results_publisher().drain(QtTest.QTest.qWait)
             sys.exit(0)
         else:
             event.ignore()
@@ -831,7 +1056,10 @@ def run_with_gui():
 
     def exception_hook(exctype, value, traceback):
         if menu is not None:
-            menu.menu.onUpdateText("\n\nERROR WHILE RUNNING\n%s, %s,%s" % (exctype, value, traceback))
+            if getattr(menu.menu, 'runner', None) is not None and menu.menu.runner.isRunning():
+                menu.menu.runner.onUpdateText("\n\nERROR WHILE RUNNING\n%s, %s,%s" % (exctype, value, traceback))
+            else:
+                menu.menu.onUpdateText("\n\nERROR WHILE RUNNING\n%s, %s,%s" % (exctype, value, traceback))
 
         print(exctype, value, traceback)
         sys._excepthook(exctype, value, traceback)
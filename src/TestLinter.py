@@ -0,0 +1,104 @@
+import os
+import openpyxl
+
+from Utilities import Utilities
+from ScenarioCompiler import ScenarioCompiler, Step, FrameCompareCheck, VideoProcessCheck
+
+
+class TestLinter:
+    """Validates test workbooks without a rig attached: compiles every sheet, resolves CALL_TEST recursively and checks
+    that every referenced golden image exists."""
+
+    def __init__(self, tests_folder=None):
+        if tests_folder is None:
+            tests_folder = Utilities.get_tests_folder()
+        self.tests_folder = tests_folder
+        self.errors = list()
+        self.linted_tests = set()
+
+    def lint(self, test_name: str) -> list:
+        self._lint_test(test_name, [])
+        return self.errors
+
+    def lint_all(self) -> list:
+        for test_name in sorted(os.listdir(self.tests_folder)):
+            if os.path.isdir(f'{self.tests_folder}/{test_name}'):
+                self._lint_test(test_name, [])
+        return self.errors
+
+    def _lint_test(self, test_name: str, call_stack: list):
+        if test_name in call_stack:
+            self.errors.append(f'{call_stack[-1]}: Recursive CALL_TEST: {" -> ".join(call_stack + [test_name])}')
+            return
+        if test_name in self.linted_tests:
+            return
+        self.linted_tests.add(test_name)
+
+        for called_test in self._compile_test(test_name):
+            self._lint_test(called_test, call_stack + [test_name])
+
+    def _compile_test(self, test_name: str) -> list:
+        """Compiles a single test and returns the names of the tests it calls"""
+        test_path = f'{self.tests_folder}/{test_name}'
+        excel_file = f'{test_path}/{test_name}.xlsx'
+        golden_images_path = f'{test_path}/{Utilities.get_golden_images_folder()}'
+        called_tests = list()
+
+        if not os.path.isfile(excel_file):
+            self.errors.append(f'{test_name}: There is no excel file inside the test folder or excel file does not '
+                               f'match test folder name.')
+            return called_tests
+
+        try:
+            wb = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+        except Exception as error:
+            self.errors.append(f'{test_name}: Could not open {excel_file}: {error}')
+            return called_tests
+
+        try:
+            sheetnames = wb.sheetnames
+            if len(sheetnames) > 1 and "Scenarios" not in sheetnames:
+                self.errors.append(f"{test_name}: Sheet 'Scenarios' was not found. Sheet names: {sheetnames}")
+
+            compiler = ScenarioCompiler()
+            if "Actions" in sheetnames:
+                compiler.actions = ScenarioCompiler.read_actions(wb["Actions"])
+
+            for sheet in sheetnames:
+                if sheet != "Preconditions" and "Scenarios" not in sheet and len(sheetnames) != 1:
+                    continue
+
+                compiled_sheet = compiler.compile_sheet(wb[sheet])
+                if compiled_sheet.hash_tag == [0, 0]:
+                    self.errors.append(f"{test_name}: {sheet}: Cannot find the symbol '#' to determinate where to read "
+                                       f"excel")
+
+                for compiled_row in compiled_sheet.rows:
+                    for step in compiled_row.steps:
+                        if step.step_type == Step.StepType.CALL_TEST:
+                            if step.argument == "":
+                                self.errors.append(f'{test_name}: {sheet}: Missing test name in {step.raw}')
+                            else:
+                                called_tests.append(step.argument)
+
+                        if step.step_type == Step.StepType.EXPECTED:
+                            for golden_image in TestLinter._golden_images(step):
+                                if not os.path.isfile(f'{golden_images_path}/{golden_image}'):
+                                    self.errors.append(f'{test_name}: {sheet}: Golden image file does not exist: '
+                                                       f'{golden_images_path}/{golden_image}')
+
+            self.errors += [f'{test_name}: {error}' for error in compiler.errors]
+        finally:
+            wb.close()
+
+        return called_tests
+
+    @staticmethod
+    def _golden_images(expected_step) -> list:
+        golden_images = list()
+        for check in expected_step.checks:
+            if isinstance(check, FrameCompareCheck):
+                golden_images.append(check.golden_image)
+            if isinstance(check, VideoProcessCheck):
+                golden_images += [check.steady_image, check.flashing_image]
+        return golden_images
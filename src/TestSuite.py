@@ -0,0 +1,177 @@
+import os
+import time
+import queue
+import fnmatch
+import multiprocessing
+
+from Utilities import Utilities
+from Exceptions import TestError
+from SVNInterface import SVNInterface
+from RigSession import RigSession
+from TestClass import TestClass
+from ResultsPublisher import results_publisher
+
+
+def run_on_rig(rig_profile, suite, tests_queue, results_queue):
+    """Worker process of a parallel suite: runs the tests taken from the queue on one rig until the queue is empty"""
+    Utilities.set_rig_profile(rig_profile)
+    session = RigSession(suite.host_env)
+    try:
+        while True:
+            try:
+                test_name = tests_queue.get_nowait()
+            except queue.Empty:
+                break
+            results_queue.put(suite.run_test(session, test_name))
+    finally:
+        session.close()
+        suite.drain_uploads()
+
+
+class TestSuite:
+    """Runs many tests in a single rig session per rig, only the injections are cleared between tests. With several
+    rig profiles, each rig runs in its own process and takes the longest remaining test (by the last summary) first."""
+
+    def __init__(self, test_patterns: list, svn_download=False, svn_commit=False, host_env=False, ci=False,
+                 instrumented=False, rigs=None):
+        self.test_patterns = test_patterns
+        self.svn_download = svn_download
+        self.svn_commit = svn_commit
+        self.host_env = host_env
+        self.ci = ci
+        self.instrumented = instrumented
+        self.rigs = rigs if rigs is not None else list()
+        self.summary_file = os.path.abspath(f'{Utilities.get_tests_folder()}/SuiteSummary.csv')
+        # [(test name, result, {scenario result: count}, seconds)]
+        self.results = list()
+
+    def tests(self) -> list:
+        """:return: The tests matching the names or glob patterns, in the order of the patterns"""
+        if self.svn_download:
+            available_tests = [test[:len(test) - 1] for test in SVNInterface("").list()]  # Remove '/' from test name
+        else:
+            tests_folder = Utilities.get_tests_folder()
+            available_tests = sorted(test for test in os.listdir(tests_folder)
+                                     if os.path.isdir(f'{tests_folder}/{test}'))
+
+        tests = list()
+        for pattern in self.test_patterns:
+            for test in fnmatch.filter(available_tests, pattern):
+                if test not in tests:
+                    tests.append(test)
+        return tests
+
+    def run(self) -> bool:
+        """:return: Whether every test ran and passed all of its scenarios"""
+        tests = self.tests()
+        if len(tests) == 0:
+            print(f'No tests match {" ".join(self.test_patterns)}')
+            return False
+        tests = self.longest_first(tests)
+
+        if len(self.rigs) > 1:
+            self.run_parallel(tests)
+        else:
+            if len(self.rigs) == 1:
+                Utilities.set_rig_profile(self.rigs[0])
+            session = RigSession(self.host_env)
+            try:
+                for index, test_name in enumerate(tests):
+                    print(f'\n[{index + 1}/{len(tests)}]', end='')
+                    self.results.append(self.run_test(session, test_name))
+            finally:
+                session.close()
+            self.drain_uploads()
+
+        # Merged in the order of the tests
+        self.results.sort(key=lambda result: tests.index(result[0]))
+        print(self.summary())
+        self.save_summary(self.summary_file)
+        return all(result == "PASSED" for test_name, result, scenario_results, duration in self.results)
+
+    def run_parallel(self, tests: list):
+        """Runs the tests on every rig at once, one worker process per rig"""
+        manager = multiprocessing.Manager()
+        tests_queue = manager.Queue()
+        results_queue = manager.Queue()
+        for test_name in tests:
+            tests_queue.put(test_name)
+
+        workers = [multiprocessing.Process(target=run_on_rig, args=(rig, self, tests_queue, results_queue),
+                                           name=rig)
+                   for rig in self.rigs]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        while not results_queue.empty():
+            self.results.append(results_queue.get())
+        # Tests left behind by rigs that could not open their session
+        ran_tests = [result[0] for result in self.results]
+        self.results += [(test_name, "ERROR", dict(), 0.0) for test_name in tests if test_name not in ran_tests]
+        manager.shutdown()
+
+    def run_test(self, session, test_name: str) -> tuple:
+        """:return: (test name, PASSED/FAILED/ERROR, {scenario result: count}, seconds)"""
+        rig = Utilities.get_rig_profile()
+        print(f'Starting test run for \"{test_name}\"' + (f' on {rig}' if rig is not None else ''))
+        start_time = time.monotonic()
+        scenario_results = dict()
+        try:
+            test = TestClass(test_name, self.svn_download, self.svn_commit, _executed=True,
+                             _host_env=self.host_env, _ci=self.ci, _instrumented=self.instrumented,
+                             _session=session)
+            test.run_test()
+            scenario_results = test.scenario_results
+            if test.passed is False:
+                result = "ERROR"
+            elif scenario_results.get("FAILED", 0) > 0:
+                result = "FAILED"
+            else:
+                result = "PASSED"
+        except TestError as error:
+            print(error.message)
+            result = "ERROR"
+        return test_name, result, scenario_results, time.monotonic() - start_time
+
+    @staticmethod
+    def drain_uploads():
+        """Waits for the results uploads still running in the background"""
+        if results_publisher().pending_count() > 0:
+            print("Waiting for the results uploads to end...")
+        for error in results_publisher().drain():
+            print(error)
+
+    def longest_first(self, tests: list) -> list:
+        """Sorts the tests by their duration in the last summary, tests that never ran first"""
+        durations = dict()
+        if os.path.isfile(self.summary_file):
+            with open(self.summary_file, 'r') as f:
+                for line in f.readlines()[1:]:
+                    values = line.strip().split(',')
+                    try:
+                        durations[values[0]] = float(values[-1])
+                    except (IndexError, ValueError):
+                        continue
+        return sorted(tests, key=lambda test_name: -durations.get(test_name, float('inf')))
+
+    def summary(self) -> str:
+        lines = ["", "=" * 80, "SUITE SUMMARY", "=" * 80]
+        for test_name, result, scenario_results, duration in self.results:
+            lines.append(f'{test_name:<50} {result:<7} passed: {scenario_results.get("PASSED", 0):<4} '
+                         f'failed: {scenario_results.get("FAILED", 0):<4} {duration:.0f}s')
+        counts = {result: 0 for result in ("PASSED", "FAILED", "ERROR")}
+        for test_name, result, scenario_results, duration in self.results:
+            counts[result] += 1
+        lines.append("-" * 80)
+        lines.append(f'{len(self.results)} tests: {counts["PASSED"]} passed, {counts["FAILED"]} failed, '
+                     f'{counts["ERROR"]} errors')
+        return "\n".join(lines)
+
+    def save_summary(self, summary_file: str):
+        with open(summary_file, 'w') as f:
+            f.write("Test,Result,Passed scenarios,Failed scenarios,Duration (s)\n")
+            for test_name, result, scenario_results, duration in self.results:
+                f.write(f'{test_name},{result},{scenario_results.get("PASSED", 0)},'
+                        f'{scenario_results.get("FAILED", 0)},{duration:.1f}\n')
@@ -11,9 +11,13 @@ config_file = XMLInterface(configuration_file)
 gdt_interface_lib_dir = './lib/GdtInterfaceLib/bin/Debug/'
 gdt_interface_lib_path = './lib/GdtInterfaceLib/bin/Debug/GdtInterfaceLib'
 gdt_interface_connection = 'OFP_SR1', 'OFP_SR2'
+gdt_type_registry_folder = './GdtTypes'
 host_socket_tx_conf = ('127.0.0.1', 36981)
 host_socket_rx_conf = ('127.0.0.1', 36982)
 host_screenshot_path = 'J:/host_screenshot.tga'
+sim_engine_prog_id = 'SimControl.SimScript'
+# Rig profile (RIGS in ConnectionsConfig.xml) driven by this process, None for the defaults above
+rig_profile = None
 projects = {
             "ATR": {
                 "gdt_project": "ATR.gdt",
@@ -93,6 +97,10 @@ class Utilities:
     def get_tests_folder() -> str:
         return tests_folder
 
+    @staticmethod
+    def get_golden_images_folder() -> str:
+        return golden_images_folder
+
     @staticmethod
     def get_svn_path_attach() -> str:
         if "TESTPATH" in config_file.svn_path:
@@ -142,19 +150,63 @@ class Utilities:
 
     @staticmethod
     def get_gdt_interface_connection() -> str:
-        return gdt_interface_connection
+        connections = Utilities.get_rig_value("GDT_CONNECTIONS", None)
+        if connections is None:
+            return gdt_interface_connection
+        return tuple(connection.strip() for connection in connections.split(','))
+
+    @staticmethod
+    def get_gdt_type_registry_folder() -> str:
+        return gdt_type_registry_folder
+
+    @staticmethod
+    def get_gdt_project_file(connection: str) -> str:
+        if connection in config_file.connections and "GDT_CLUSTER_FILE" in config_file.connections[connection]:
+            return config_file.connections[connection]["GDT_CLUSTER_FILE"]
+        else:
+            return connection
 
     @staticmethod
     def get_host_socket_rx_conf():
-        return host_socket_rx_conf
+        return (Utilities.get_rig_value("HOST_IP", host_socket_rx_conf[0]),
+                int(Utilities.get_rig_value("HOST_RX_PORT", host_socket_rx_conf[1])))
 
     @staticmethod
     def get_host_socket_tx_conf():
-        return host_socket_tx_conf
+        return (Utilities.get_rig_value("HOST_IP", host_socket_tx_conf[0]),
+                int(Utilities.get_rig_value("HOST_TX_PORT", host_socket_tx_conf[1])))
 
     @staticmethod
     def get_host_screenshot_path() -> str:
-        return host_screenshot_path
+        return Utilities.get_rig_value("HOST_SCREENSHOT_PATH", host_screenshot_path)
+
+    @staticmethod
+    def get_sim_engine_prog_id() -> str:
+        return Utilities.get_rig_value("SIM_ENGINE", sim_engine_prog_id)
+
+    @staticmethod
+    def get_rig_profiles() -> list:
+        return list(config_file.rigs)
+
+    @staticmethod
+    def get_rig_profile():
+        return rig_profile
+
+    @staticmethod
+    def set_rig_profile(profile) -> None:
+        """Selects the rig profile driven by this process, None for the default rig"""
+        global rig_profile
+        if profile is not None and profile not in config_file.rigs:
+            raise ParameterError('rig_profile', f'There is no rig profile {profile} in {configuration_file}. '
+                                                f'Rig profiles: {", ".join(config_file.rigs)}')
+        rig_profile = profile
+
+    @staticmethod
+    def get_rig_value(key: str, default):
+        """:return: The value of the active rig profile, default if there is none or it does not set the value"""
+        if rig_profile is not None and config_file.rigs[rig_profile].get(key) is not None:
+            return config_file.rigs[rig_profile][key]
+        return default
 
     @staticmethod
     def get_config_file():
@@ -188,3 +240,10 @@ class Utilities:
     @staticmethod
     def set_dark_mode(dark_mode: bool):
         config_file.set_general_data("DARK_MODE", dark_mode)
+
+    @staticmethod
+    def get_video_compression_preset() -> str:
+        if "VIDEO_COMPRESSION" in config_file.general:
+            return config_file.general["VIDEO_COMPRESSION"].lower()
+        else:
+            return "lossless"
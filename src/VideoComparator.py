@@ -1,66 +1,405 @@
 import cv2 as cv
 import numpy as np
+import sys
+import time
+import hashlib
+from enum import Enum
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from Exceptions import ImageComparatorError
 from ImageComparator import ImageComparator
 import os
 
+# Videos with less than two chunks of frames are analysed in the calling process
+min_frames_per_chunk = 150
+threshold_epsilon = 1e-5
+
+
+class VideoTimeline:
+    """Per frame result of a VIDEOPROCESS analysis: frame index, timestamp, score of each template and the resolved
+    flashing state. Every VIDEOPROCESS verb is evaluated on it, so a video is decoded only once."""
+    dtype = np.dtype([('frame', np.int32), ('time', np.float64), ('steady_score', np.float32),
+                      ('flashing_score', np.float32), ('flashing', np.bool_)])
+
+    def __init__(self, frames, fps):
+        self.frames = frames
+        self.fps = fps
+
+    @staticmethod
+    def from_scores(frame_scores: list, states: list, fps: float):
+        frames = np.zeros(len(frame_scores), dtype=VideoTimeline.dtype)
+        frames['frame'] = np.arange(len(frame_scores))
+        frames['time'] = frames['frame'] / fps if fps > 0 else np.nan
+        if len(frame_scores) > 0:
+            scores = np.array(frame_scores, dtype=np.float32)
+            frames['steady_score'] = scores[:, 0]
+            frames['flashing_score'] = scores[:, 1]
+        frames['flashing'] = states
+        return VideoTimeline(frames, fps)
+
+    def save(self, path: str):
+        """Writes the timeline as path.npy and path.csv"""
+        np.save(f'{path}.npy', self.frames)
+        np.savetxt(f'{path}.csv', self.frames, fmt=('%d', '%.4f', '%.6f', '%.6f', '%d'), delimiter=',',
+                   header=','.join(self.frames.dtype.names), comments='')
+
+    def evaluate(self, method: str, expected):
+        """
+        :param method: VIDEOPROCESS verb (flashing, frequency, dutycycle or latency)
+        :param expected: Flash count for flashing, (minimum, maximum) for the other verbs
+        :return: PASSED/FAILED and the measured value
+        """
+        if method == "flashing":
+            actual = self.flash_count()
+            return ('PASSED' if actual == expected else 'FAILED'), actual
+
+        if method == "frequency":
+            actual = self.frequency()
+        elif method == "dutycycle":
+            actual = self.duty_cycle()
+        elif method == "latency":
+            actual = self.latency()
+        else:
+            raise ImageComparatorError(f'Unknown videoprocess command: {method}')
+
+        if actual is not None and expected[0] <= actual <= expected[1]:
+            return 'PASSED', actual
+        return 'FAILED', actual
+
+    def flash_count(self) -> int:
+        return len(self._flash_starts())
+
+    def frequency(self) -> float:
+        """:return: Flashes per second between the first and the last flash start"""
+        starts = self._times(self._flash_starts())
+        if len(starts) < 2:
+            return 0.0
+        return round((len(starts) - 1) / (starts[-1] - starts[0]), 3)
+
+    def duty_cycle(self) -> float:
+        """:return: Percentage of frames in the flashing state, over whole flash periods when there are two or more"""
+        starts = self._flash_starts()
+        states = self.frames['flashing']
+        if len(starts) >= 2:
+            states = states[starts[0]:starts[-1]]
+        if len(states) == 0:
+            return 0.0
+        return round(100.0 * np.count_nonzero(states) / len(states), 2)
+
+    def latency(self):
+        """:return: Seconds from the start of the video to the first flash, None if it never flashes"""
+        starts = self._times(self._flash_starts())
+        if len(starts) == 0:
+            return None
+        return round(float(starts[0]), 3)
+
+    def _flash_starts(self):
+        states = self.frames['flashing']
+        return np.flatnonzero(states & ~np.concatenate(([False], states[:-1])))
+
+    def _times(self, frame_indexes):
+        if not self.fps > 0:
+            raise ImageComparatorError('Video frame rate is unknown, cannot compute a time based result.')
+        return self.frames['time'][frame_indexes]
+
 
 class VideoComparator:
-    def __init__(self, reference_video_path: str, output_result__path: str, top_left, bottom_right, tolerance, threshold=0.99):
+    class OutputMode(Enum):
+        NONE = 0  # No annotated output video
+        STATE_CHANGES = 1  # Only the frames where the flashing state changes
+        ALL_FRAMES = 2  # Every frame of the reference video
+
+    def __init__(self, reference_video_path: str, output_result__path: str, top_left, bottom_right, tolerance, threshold=0.99,
+                 output_mode=OutputMode.STATE_CHANGES, workers=None, export_timeline=False):
         if os.path.isfile(reference_video_path) is False:
             raise ImageComparatorError(f'Reference video file does not exist: {reference_video_path}')
+        self._reference_video_path = reference_video_path
         self._video = cv.VideoCapture(reference_video_path)
+        if not self._video.isOpened():
+            raise ImageComparatorError(f'Could not open reference video file: {reference_video_path}')
         self._output_result__path = output_result__path
+        self._output_mode = output_mode
+        self._export_timeline = export_timeline
+
+        # Number of analysis processes, one per CPU by default
+        self._workers = workers if workers is not None else (os.cpu_count() or 1)
 
         self._top_left = top_left
         self._bottom_right = bottom_right
 
         self._tolerance = tolerance
 
+        # Search box expanded by the tolerance, the only part of each frame that is matched
+        self._search_top_left = (top_left[0] - tolerance, top_left[1] - tolerance)
+        self._search_bottom_right = (bottom_right[0] + tolerance, bottom_right[1] + tolerance)
+
         self._threshold = threshold
-        self._threshold_epsilon = 1e-5
         self._transparent_color = (0, 0, 255)
 
     def flash_count(self, golden_image, golden_image2, times):
-        flashing = False
-        count = 0
-        fourcc = cv.VideoWriter_fourcc(*'XVID')
-        width = int(self._video.get(3))
-        height = int(self._video.get(4))
-        fps = self._video.get(cv.CAP_PROP_FPS)
-        out = cv.VideoWriter(self._output_result__path, fourcc, fps, (width, height))
+        """
+        Counts how many times the steady image (golden_image) disappears from the search box. The disappearance ends
+        when the flashing image (golden_image2) is gone again.
+        :return: PASSED/FAILED, the flash count and the frame timeline
+        """
+        timeline = self.analyse(golden_image, golden_image2)
+        result, count = timeline.evaluate("flashing", times)
+        return result, count, timeline
+
+    def analyse(self, golden_image, golden_image2) -> VideoTimeline:
+        """
+        Builds the frame timeline of the video. Both templates are matched against the search box only, in a single
+        pass over the decoded frames. Long videos are split in frame ranges scored by a process pool.
+        """
+        golden_img = ImageComparator(None, golden_image, None, True, None, self._threshold)
+        golden_img2 = ImageComparator(None, golden_image2, None, True, None, self._threshold)
+        templates = ((golden_img._open_golden_image_file(), golden_img._golden_template.mask),
+                     (golden_img2._open_golden_image_file(), golden_img2._golden_template.mask))
 
-        golden_img = ImageComparator(None, golden_image, None, True, self._threshold)
-        golden_img2 = ImageComparator(None, golden_image2, None, True, self._threshold)
-        while self._video.isOpened():
+        try:
             ret, frame = self._video.read()
             if ret:
-                golden_img._reference_image_path = frame
-                is_match = golden_img.compare_pattern(self._top_left, self._bottom_right, self._tolerance)
-                if is_match:
-                    self._draw_rectangle(frame, (255, 0, 0), 2)
-                    if not flashing:
-                        flashing = True
-                        count += 1
-                else:
-                    golden_img2._reference_image_path = frame
-                    is_match = golden_img2.compare_pattern(self._top_left, self._bottom_right, self._tolerance)
-                    if is_match:
-                        self._draw_rectangle(frame, (150, 0, 0), 0)
-                        if flashing:
-                            flashing = False
-                out.write(frame)
-                if cv.waitKey(1) & 0xFF == ord('q'):
-                    break
+                golden_img._check_crop_bounds(frame, self._reference_video_path, self._search_top_left,
+                                              self._search_bottom_right)
+                roi = VideoComparator._crop_search_box(frame, self._search_top_left, self._search_bottom_right)
+                golden_img._check_golden_image_fits(roi, templates[0][0])
+                golden_img2._check_golden_image_fits(roi, templates[1][0])
             else:
-                break
-        self._video.release()
-        out.release()
-        cv.destroyAllWindows()
-        if count == times:
-            return 'PASSED', count
-        return 'FAILED', count
+                frame = None
+
+            fps = self._video.get(cv.CAP_PROP_FPS)
+
+            frame_scores = None
+            if frame is not None and self._output_mode != VideoComparator.OutputMode.ALL_FRAMES:
+                frame_scores = self._score_frames_parallel(templates)
+
+            if frame_scores is None:
+                frame_scores, states = self._analyse_sequential(frame, templates)
+            else:
+                states = self._analyse_merged(frame, frame_scores)
+        finally:
+            self._video.release()
+
+        timeline = VideoTimeline.from_scores(frame_scores, states, fps)
+        if self._export_timeline:
+            timeline.save(f'{os.path.splitext(self._output_result__path)[0]}_timeline')
+        return timeline
+
+    def _analyse_sequential(self, frame, templates):
+        flashing = False
+        frame_scores = list()
+        states = list()
+        out = None
+        if frame is not None and self._output_mode != VideoComparator.OutputMode.NONE:
+            out = self._open_output_video(frame)
+
+        try:
+            while frame is not None:
+                scores = VideoComparator._score_frame(frame, self._search_top_left, self._search_bottom_right,
+                                                      templates)
+                absences = self._absences(scores)
+                flashing, state_changed = VideoComparator._next_state(flashing, absences)
+                frame_scores.append(scores)
+                states.append(flashing)
+
+                if out is not None and (state_changed or self._output_mode == VideoComparator.OutputMode.ALL_FRAMES):
+                    self._draw_absences(frame, absences)
+                    out.write(frame)
+
+                ret, frame = self._video.read()
+                if not ret:
+                    frame = None
+        finally:
+            if out is not None:
+                out.release()
+
+        return frame_scores, states
+
+    def _analyse_merged(self, first_frame, frame_scores) -> list:
+        # Same state machine as the sequential pass, fed with the per frame results in frame order
+        flashing = False
+        states = list()
+        changed_frames = list()
+        for index, scores in enumerate(frame_scores):
+            absences = self._absences(scores)
+            flashing, state_changed = VideoComparator._next_state(flashing, absences)
+            states.append(flashing)
+            if state_changed:
+                changed_frames.append((index, absences))
+
+        if self._output_mode == VideoComparator.OutputMode.STATE_CHANGES and len(changed_frames) > 0:
+            out = self._open_output_video(first_frame)
+            try:
+                # Seeking is not frame exact for every codec, so the changed frames are taken in one forward pass:
+                # the video is already past the first frame, frames in between are only grabbed
+                position = 1
+                for index, absences in changed_frames:
+                    if index == 0:
+                        frame = first_frame
+                    else:
+                        while position <= index and self._video.grab():
+                            position += 1
+                        if position <= index:
+                            break
+                        ret, frame = self._video.retrieve()
+                        if not ret:
+                            continue
+                    self._draw_absences(frame, absences)
+                    out.write(frame)
+            finally:
+                out.release()
+
+        return states
+
+    def _score_frames_parallel(self, templates):
+        """
+        :return: Per frame scores of both templates, or None when the video is too short to split or a frame range
+        could not be decoded exactly (the caller then falls back to a sequential pass)
+        """
+        frame_total = int(self._video.get(cv.CAP_PROP_FRAME_COUNT))
+        chunks = min(self._workers, frame_total // min_frames_per_chunk)
+        if chunks < 2:
+            return None
+
+        chunk_size = -(-frame_total // chunks)
+        starts = list(range(0, frame_total, chunk_size))
+        overlap = 1
+        try:
+            with ProcessPoolExecutor(max_workers=len(starts)) as executor:
+                # Every range but the first also reads the last frame of the previous range: a seek that landed on
+                # another frame (e.g. the nearest keyframe) does not decode the same boundary frame. The last range
+                # reads up to the end of the video, in case the frame count is an estimate.
+                futures = [executor.submit(VideoComparator._score_frame_range, self._reference_video_path,
+                                           start - overlap if start > 0 else 0,
+                                           (chunk_size + overlap if start > 0 else chunk_size)
+                                           if start != starts[-1] else None,
+                                           self._search_top_left, self._search_bottom_right, templates)
+                           for start in starts]
+                results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            return None
+
+        frame_scores = list()
+        previous_digest = None
+        for start, (result, first_digest, last_digest) in zip(starts, results):
+            if start > 0:
+                # The boundary frame must be the last frame of the previous range
+                if len(result) == 0 or first_digest != previous_digest or result[0] != frame_scores[-1]:
+                    return None
+                result = result[overlap:]
+            if start != starts[-1] and len(result) != chunk_size:
+                return None
+            frame_scores += result
+            previous_digest = last_digest
+        return frame_scores
+
+    @staticmethod
+    def _score_frame_range(video_path, start_frame, frame_count, search_top_left, search_bottom_right, templates):
+        """
+        Process pool worker: scores frame_count frames from start_frame (up to the end if frame_count is None)
+        :return: The frame scores and the digests of the first and last decoded frames
+        """
+        video = cv.VideoCapture(video_path)
+        frame_scores = list()
+        first_digest, last_digest = None, None
+        try:
+            if start_frame > 0:
+                video.set(cv.CAP_PROP_POS_FRAMES, start_frame)
+
+            while frame_count is None or len(frame_scores) < frame_count:
+                ret, frame = video.read()
+                if not ret:
+                    break
+                frame_scores.append(VideoComparator._score_frame(frame, search_top_left, search_bottom_right,
+                                                                 templates))
+                last_digest = hashlib.blake2b(frame.tobytes(), digest_size=16).digest()
+                if first_digest is None:
+                    first_digest = last_digest
+        finally:
+            video.release()
+
+        return frame_scores, first_digest, last_digest
+
+    @staticmethod
+    def _score_frame(frame, search_top_left, search_bottom_right, templates) -> tuple:
+        """:return: Best match score of each template in the search box"""
+        roi = VideoComparator._crop_search_box(frame, search_top_left, search_bottom_right)
+        return tuple(VideoComparator._match_score(roi, template) for template in templates)
+
+    def _absences(self, scores) -> tuple:
+        """:return: For each template score, whether the template is absent from the search box"""
+        return tuple(not ((score >= self._threshold) and (score >= 0.0 - threshold_epsilon) and
+                          (score <= 1.0 + threshold_epsilon)) for score in scores)
+
+    @staticmethod
+    def _next_state(flashing: bool, absences: tuple):
+        """:return: New flashing state and whether it changed"""
+        steady_absent, flashing_absent = absences
+        if steady_absent:
+            if not flashing:
+                return True, True
+        elif flashing_absent:
+            if flashing:
+                return False, True
+        return flashing, False
+
+    @staticmethod
+    def _crop_search_box(frame, search_top_left, search_bottom_right):
+        # A view into the decoded frame, matchTemplate does not need a contiguous copy
+        return frame[search_top_left[1]:search_bottom_right[1], search_top_left[0]:search_bottom_right[0]]
+
+    @staticmethod
+    def _match_score(roi, template) -> float:
+        golden_image, mask = template
+        res = cv.matchTemplate(roi, golden_image, cv.TM_CCORR_NORMED, mask=mask)
+
+        # Eliminate infinities and NaNs.
+        res[np.logical_or(np.isinf(res), np.isnan(res))] = 0.0
+
+        return cv.minMaxLoc(res)[1]
+
+    def _open_output_video(self, frame):
+        fourcc = cv.VideoWriter_fourcc(*'XVID')
+        height, width = frame.shape[:2]
+        fps = self._video.get(cv.CAP_PROP_FPS)
+        return cv.VideoWriter(self._output_result__path, fourcc, fps, (width, height))
+
+    def _draw_absences(self, frame, absences):
+        steady_absent, flashing_absent = absences
+        if steady_absent:
+            self._draw_rectangle(frame, (255, 0, 0), 2)
+        elif flashing_absent:
+            self._draw_rectangle(frame, (150, 0, 0), 0)
 
     def _draw_rectangle(self, frame, color, size):
-        cv.rectangle(frame, (self._top_left[0] - self._tolerance, self._top_left[1] - self._tolerance),
-                     (self._bottom_right[0] + self._tolerance, self._bottom_right[1] + self._tolerance), color, size)
+        cv.rectangle(frame, self._search_top_left, self._search_bottom_right, color, size)
+
+    @staticmethod
+    def cmd_execute():
+        """Benchmark: analyses a recorded video sequentially and in parallel, the results must be identical"""
+        lst_arguments = sys.argv
+        script_name = lst_arguments[0]
+        if len(lst_arguments) != 7:
+            return print(f"Usage: python {script_name} [video] [steady golden image] [flashing golden image] "
+                         f"[x1,y1,x2,y2] [tolerance] [expected flashes]")
+
+        video_path, golden_image, golden_image2, box, tolerance, times = lst_arguments[1:]
+        x1, y1, x2, y2 = (int(value) for value in box.split(','))
+        results = dict()
+        for mode, workers in (("sequential", 1), ("parallel", None)):
+            comparator = VideoComparator(video_path, "", (x1, y1), (x2, y2), int(tolerance),
+                                         output_mode=VideoComparator.OutputMode.NONE, workers=workers)
+            start_time = time.monotonic()
+            result, count, timeline = comparator.flash_count(golden_image, golden_image2, int(times))
+            duration = time.monotonic() - start_time
+            results[mode] = (result, count, timeline.frames['flashing'].tolist())
+            print(f"{mode}: {result}, {count} flashes over {len(timeline.frames)} frames in {duration:.2f}s")
+
+        if results["sequential"] != results["parallel"]:
+            print("The parallel analysis differs from the sequential analysis!")
+            sys.exit(1)
+        print("The parallel and sequential analyses are identical.")
+
+
+if __name__ == "__main__":
+    VideoComparator.cmd_execute()
@@ -0,0 +1,131 @@
+import os
+import queue
+import subprocess
+import threading
+import time
+from Exceptions import ParameterError
+
+# ffmpeg encoder arguments per compression preset (configured by VIDEO_COMPRESSION in the GENERAL settings)
+video_compression_presets = {
+    "lossless": "-c:v libx264 -preset veryslow -crf 0",
+    "archive": "-c:v libx264 -preset slow -crf 18",
+    "fast": "-c:v libx264 -preset veryfast -crf 23"
+}
+max_pending_videos = 4
+
+
+class VideoCompressor:
+    """Compresses recorded videos with ffmpeg on a background thread, so the test goes on while the previous captures
+    are compressed. Uncompressed videos are removed once their compression succeeded. The thread is started by the
+    first submit and stopped by drain."""
+
+    def __init__(self, log_file, preset="lossless", max_pending=max_pending_videos):
+        if preset not in video_compression_presets:
+            raise ParameterError('preset', f'Unknown video compression preset: {preset}. '
+                                           f'Available presets: {", ".join(video_compression_presets)}')
+        self._ffmpeg_arguments = video_compression_presets[preset]
+        self._log_file = log_file
+
+        self._queue = queue.Queue(max_pending)
+        self._pending = set()
+        self._leftovers = list()
+        self._errors = list()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, uncompressed_video_path, compressed_video_path, wait_function=None):
+        """
+        Queues a video for compression. When the queue is full, waits for a free slot with wait_function(ms)
+        """
+        if wait_function is None:
+            wait_function = VideoCompressor._sleep
+
+        with self._lock:
+            self._pending.add(uncompressed_video_path)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="VideoCompressor", daemon=True)
+                self._worker.start()
+        while True:
+            try:
+                self._queue.put((uncompressed_video_path, compressed_video_path), block=False)
+                return
+            except queue.Full:
+                wait_function(500)
+
+    def is_pending(self, uncompressed_video_path) -> bool:
+        with self._lock:
+            return uncompressed_video_path in self._pending
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def drain(self, wait_function=None) -> list:
+        """
+        Waits for every queued video to be compressed
+        :return: Error messages of the failed compressions
+        """
+        if wait_function is None:
+            wait_function = VideoCompressor._sleep
+
+        while self.pending_count() > 0:
+            wait_function(500)
+
+        # Nothing is queued anymore, the worker is stopped until the next submit
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+
+        # Uncompressed videos that were still open (e.g. by VIDEOPROCESS) when their compression ended
+        with self._lock:
+            leftovers, self._leftovers = self._leftovers, list()
+            errors, self._errors = self._errors, list()
+        for uncompressed_video_path in leftovers:
+            try:
+                os.remove(uncompressed_video_path)
+            except OSError as error:
+                errors.append(f'Could not remove {uncompressed_video_path}: {error}')
+        return errors
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            uncompressed_video_path, compressed_video_path = item
+            try:
+                self._compress(uncompressed_video_path, compressed_video_path)
+            finally:
+                with self._lock:
+                    self._pending.discard(uncompressed_video_path)
+                self._queue.task_done()
+
+    def _compress(self, uncompressed_video_path, compressed_video_path):
+        try:
+            ffmpeg_process = subprocess.Popen(f'ffmpeg -y -i \"{uncompressed_video_path}\" '
+                                              f'{self._ffmpeg_arguments} \"{compressed_video_path}\"', shell=True,
+                                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._log_file)
+            return_code = ffmpeg_process.wait()
+        except OSError as error:
+            with self._lock:
+                self._errors.append(f'Could not compress {uncompressed_video_path}: {error}')
+            return
+
+        if return_code != 0:
+            # Keep the uncompressed video, it is still the only copy of the capture
+            with self._lock:
+                self._errors.append(f'Could not compress {uncompressed_video_path}: ffmpeg exited with {return_code}')
+            return
+
+        try:
+            os.remove(uncompressed_video_path)
+        except OSError:
+            with self._lock:
+                self._leftovers.append(uncompressed_video_path)
+
+    @staticmethod
+    def _sleep(milliseconds):
+        time.sleep(milliseconds / 1000)
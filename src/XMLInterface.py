@@ -12,6 +12,7 @@ class XMLInterface:
         self.connections = self.load_connections()
         self.svn_user = self.load_user_password()
         self.general = self.load_general_data()
+        self.rigs = self.load_rigs()
 
     def load_svn_paths(self):
         svn_path = dict()
@@ -28,6 +29,14 @@ class XMLInterface:
                 connections[connection.tag][ofp_sr.tag] = ofp_sr.text
         return connections
 
+    def load_rigs(self):
+        rigs = dict()
+        for rig in self.root.findall("./RIGS/"):
+            rigs[rig.tag] = dict()
+            for value in rig:
+                rigs[rig.tag][value.tag] = value.text
+        return rigs
+
     def load_user_password(self):
         user_data = dict()
         for svn in self.root.findall("./SVNUSER"):
@@ -86,6 +95,14 @@ class XMLInterface:
         for tag, text in self.general.items():
             ET.SubElement(svn, tag).text = text
 
+        # Save rig profiles
+        if len(self.rigs) > 0:
+            rigs = ET.SubElement(root, "RIGS")
+            for key, value in self.rigs.items():
+                rig = ET.SubElement(rigs, key)
+                for tag, text in value.items():
+                    ET.SubElement(rig, tag).text = text
+
         # Save xml
         tree = ET.ElementTree(root)
         tree.write(self.configuration_file)